@@ -0,0 +1,15 @@
+from index import app as flask_app, PORT
+from src.utils.asgi import create_asgi_app
+import uvicorn
+
+"""
+Async serving mode: the async routes run on the event loop, the rest of the API on the Flask app.
+    python asgi.py
+    uvicorn asgi:app --host 0.0.0.0 --port 5002
+"""
+
+app = create_asgi_app(flask_app)
+
+if __name__ == "__main__":
+    print(f"🚀 Running ASGI app with Uvicorn at port: {PORT}...")
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,496 @@
+"""
+API load-test benchmark.
+
+Drives every endpoint registered under /api against the in-memory storage backend, seeded at realistic
+data sizes, and reports latency percentiles plus storage round trips, documents read and documents written
+per request. Outbound calls of the bookmark enrichment (page fetch and LLM) are replaced by canned results,
+and the enrichment itself is measured separately as `background:enrichment`.
+
+Usage (from the repository root):
+    python -m benchmarks.api_benchmark
+    python -m benchmarks.api_benchmark --bookmarks 5000 --tags 300 --directories 30 --iterations 100
+    python -m benchmarks.api_benchmark --only bookmark_routes --json
+    python -m benchmarks.api_benchmark --latency-ms 20
+"""
+import os
+
+# Must be set before the app (and with it the global storage client) is imported
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("ADMIN_TOKEN", "benchmark-admin-token")
+os.environ.setdefault("PROFILE_DIR", os.path.join(__import__("tempfile").mkdtemp(), "profiles"))
+os.environ.setdefault("THUMBNAIL_DIR", os.path.join(__import__("tempfile").mkdtemp(), "thumbnails"))
+# Every seeded bookmark is on example.com and page fetches are canned, the content refresh need not pace them
+os.environ.setdefault("REFRESH_HOST_INTERVAL_SECONDS", "0")
+os.environ.setdefault("REFRESH_RATE_PER_SECOND", "100000")
+os.environ.setdefault("REENRICH_HOST_INTERVAL_SECONDS", "0")
+os.environ.setdefault("REENRICH_RATE_PER_SECOND", "100000")
+
+import argparse
+import cProfile
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import index
+import src.services.routes.bookmark_routes as bookmark_routes
+import src.services.routes.directory_routes as directory_routes
+import src.services.routes.tag_routes as tag_routes
+import src.utils.tagGeneration.fetch_page_content as fetch_page_content_module
+import src.utils.tagGeneration.generate_tags as generate_tags_module
+import src.utils.thumbnails as thumbnails_module
+from firebase_admin import firestore
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_MODEL, BOOKMARK_COLLECTION, BOOKMARK_ID_PREFIX, BOOKMARK_CONTENT_MODEL, LINK_STATUS
+from src.models.directory_model import DIRECTORY_MODEL, DIRECTORY_COLLECTION, DIRECTORY_ID_PREFIX, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.models.tag_model import TAG_MODEL, TAG_COLLECTION, TAG_CREATOR
+from src.models.user_model import USER_MODEL, USER_COLLECTION
+from src.utils.routes_util import get_id, get_tag_id, bookmark_content_ref, directory_path_field
+from src.utils.profiling import list_profiles, save_profile
+from src.jobs.reenrichment import create_reenrichment_job
+
+BACKGROUND_ENRICHMENT = "background:enrichment"
+
+
+def fake_fetch_page_content(url, *args, **kwargs):
+    page_content = fetch_page_content_module.create_page_content(
+        title=f"Title of {url}", content="benchmark page content " * 40, image=f"{url}/image.png")
+    page_content.update({"status": 200, "etag": '"benchmark"'})
+    return page_content
+
+
+def fake_generate_tags(*args, **kwargs):
+    return ["benchmark", "python", "machine_learning", "reading_list", "news"]
+
+
+FAKE_IMAGE_HASH = "0" * 64
+
+
+def fake_create_thumbnails(image_url, *args, **kwargs):
+    store = thumbnails_module.get_thumbnail_store()
+    for size in thumbnails_module.THUMBNAIL_SIZES:
+        if not store.exists(FAKE_IMAGE_HASH, size):
+            store.write(FAKE_IMAGE_HASH, size, b"benchmark thumbnail")
+    return FAKE_IMAGE_HASH
+
+
+class DeferredThreads:
+    """Replaces `threading` in the routes so background work runs after, not during, the measured request."""
+    def __init__(self):
+        self.pending = []
+
+    def Thread(self, target, args=(), kwargs=None, daemon=None):
+        deferred = self
+
+        class _Thread:
+            def start(self):
+                deferred.pending.append((target, args, kwargs or {}))
+        return _Thread()
+
+
+def disable_outbound_calls():
+    # The routes import these functions on first use, patching their modules is enough
+    fetch_page_content_module.fetch_page_content = fake_fetch_page_content
+    generate_tags_module.generate_tags = fake_generate_tags
+    thumbnails_module.create_thumbnails = fake_create_thumbnails
+    deferred_threads = DeferredThreads()
+    bookmark_routes.threading = deferred_threads
+    tag_routes.threading = deferred_threads
+    directory_routes.threading = deferred_threads
+    return deferred_threads
+
+
+def now():
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+class Fixtures:
+    """Seeds users with bookmarks, tags and directories directly into the storage, bypassing the API."""
+    def __init__(self, bookmarks, tags, directories, users, seed):
+        self.random = random.Random(seed)
+        self.sizes = (bookmarks, tags, directories)
+        self.user_ids = [f"benchmark-user-{user_number}" for user_number in range(users)]
+        self.user_id = self.user_ids[0]
+        self.tag_ids = []
+        self.tag_names = []
+        self.directory_ids = []
+        self.bookmark_ids = []
+        self.names = {}  # {tag or directory ID: name}
+        self.directories = {}  # {directory ID: directory}
+        for user_id in self.user_ids:
+            self.seed_user(user_id)
+
+    def commit(self, writes):
+        batch = db.batch()
+        for count, (ref, data) in enumerate(writes, start=1):
+            batch.set(ref, data)
+            if count % 500 == 0:
+                batch.commit()
+                batch = db.batch()
+        batch.commit()
+
+    def seed_user(self, user_id):
+        bookmark_count, tag_count, directory_count = self.sizes
+        time_now = now()
+        writes = [(db.collection(USER_COLLECTION).document(user_id), self.user(user_id))]
+
+        tags = [self.tag(user_id, f"tag_{tag_number}") for tag_number in range(tag_count)]
+        # Half of the directories are nested in one created before
+        directories = []
+        for directory_number in range(directory_count):
+            parent = self.random.choice(directories) if directories and self.random.random() < 0.5 else None
+            directories.append(self.directory(user_id, f"Directory {directory_number}", parent))
+        writes += [(db.collection(TAG_COLLECTION).document(tag["tagId"]), tag) for tag in tags]
+        writes += [(db.collection(DIRECTORY_COLLECTION).document(d["directoryId"]), d) for d in directories]
+
+        bookmarks = []
+        for age in range(bookmark_count):
+            bookmark = self.bookmark(user_id, [tag["tagId"] for tag in tags], [d["directoryId"] for d in directories])
+            bookmark["createdAt"] = bookmark["updatedAt"] = time_now - age
+            bookmarks.append(bookmark)
+        writes += [write for b in bookmarks for write in self.writes_of(b)]
+        self.commit(writes)
+
+        if user_id == self.user_id:
+            self.tag_ids = [tag["tagId"] for tag in tags]
+            self.tag_names = [tag["tagName"] for tag in tags]
+            self.directory_ids = [d["directoryId"] for d in directories]
+            self.bookmark_ids = [b["bookmarkId"] for b in bookmarks]
+
+    def user(self, user_id):
+        user = USER_MODEL.copy()
+        user.update({"userId": user_id, "name": "Benchmark", "email": f"{user_id}@example.com",
+                     "createdAt": now(), "updatedAt": now()})
+        return user
+
+    def tag(self, user_id, tag_name):
+        tag = TAG_MODEL.copy()
+        tag.update({"tagId": get_tag_id(user_id, tag_name), "tagName": tag_name, "creator": TAG_CREATOR.SERVICE.value,
+                    "userId": user_id, "createdAt": now(), "updatedAt": now(), "isDeleted": False})
+        self.names[tag["tagId"]] = tag_name
+        return tag
+
+    def directory(self, user_id, name, parent=None):
+        directory = DIRECTORY_MODEL.copy()
+        directory.update({"directoryId": get_id(DIRECTORY_ID_PREFIX), "userId": user_id, "name": name,
+                          "parentId": parent["directoryId"] if parent else None, "ancestors": directory_path_field(parent),
+                          "createdAt": now(), "updatedAt": now(), "isDeleted": False})
+        self.names[directory["directoryId"]] = name
+        self.directories[directory["directoryId"]] = directory
+        return directory
+
+    def bookmark(self, user_id, tag_ids, directory_ids):
+        bookmark = BOOKMARK_MODEL.copy()
+        bookmark_id = get_id(BOOKMARK_ID_PREFIX)
+        bookmark.update({
+            "bookmarkId": bookmark_id,
+            "userId": user_id,
+            "url": f"https://example.com/{bookmark_id}",
+            "title": f"Bookmark {bookmark_id}",
+            "notes": "some notes" if self.random.random() < 0.2 else "",
+            "tags": self.random.sample(tag_ids, min(len(tag_ids), self.random.randint(0, 5))),
+            "directoryId": self.random.choice(directory_ids + [DEFAULT_DIRECTORY_NAME_AND_ID]) if directory_ids else DEFAULT_DIRECTORY_NAME_AND_ID,
+            "createdAt": now(),
+            "updatedAt": now(),
+            "isFavorite": self.random.random() < 0.1,
+            "linkStatus": LINK_STATUS.OK.value,
+            # A tenth of the bookmarks are due for the content refresh
+            "nextCheckAt": now() + (-60 if self.random.random() < 0.1 else 24 * 60 * 60),
+        })
+        # A tenth of the bookmarks were written before the names were denormalized, the content moved out and
+        # directories nested
+        if self.random.random() < 0.1:
+            del bookmark["tagNames"], bookmark["directoryName"], bookmark["directoryPath"]
+            bookmark.update(self.content())
+        else:
+            bookmark["tagNames"] = [self.names[tag_id] for tag_id in bookmark["tags"]]
+            bookmark["directoryName"] = self.names.get(bookmark["directoryId"], DEFAULT_DIRECTORY_NAME_AND_ID)
+            bookmark["directoryPath"] = directory_path_field(self.directories.get(bookmark["directoryId"]))
+        return bookmark
+
+    def content(self):
+        content = BOOKMARK_CONTENT_MODEL.copy()
+        content.update({"fetchedContent": "benchmark page content " * 40, "generatedTags": []})
+        return content
+
+    def writes_of(self, bookmark):
+        """Writes of a bookmark document and its content subdocument."""
+        writes = [(db.collection(BOOKMARK_COLLECTION).document(bookmark["bookmarkId"]), bookmark)]
+        if "fetchedContent" not in bookmark:
+            writes.append((bookmark_content_ref(bookmark["bookmarkId"]), self.content()))
+        return writes
+
+    # Helpers creating fresh documents for destructive endpoints
+    def new_bookmark(self):
+        bookmark = self.bookmark(self.user_id, self.tag_ids, self.directory_ids)
+        self.commit(self.writes_of(bookmark))
+        return bookmark["bookmarkId"]
+
+    def deleted_bookmark(self):
+        bookmark = self.bookmark(self.user_id, self.tag_ids, self.directory_ids)
+        bookmark.update({"isDeleted": True, "deletedAt": now()})
+        self.commit(self.writes_of(bookmark))
+        return bookmark["bookmarkId"]
+
+    def new_tag(self, bookmarks=0):
+        tag = self.tag(self.user_id, f"tag_{uuid.uuid4().hex[:8]}")
+        db.collection(TAG_COLLECTION).document(tag["tagId"]).set(tag)
+        # Optionally add it to some of the user's bookmarks
+        references = [db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
+                      for bookmark_id in self.sample(self.bookmark_ids, bookmarks)]
+        batch = db.batch()
+        for snapshot in (db.get_all(references) if references else []):
+            fields = {"tags": firestore.ArrayUnion([tag["tagId"]])}
+            if "tagNames" in snapshot.to_dict():
+                fields["tagNames"] = firestore.ArrayUnion([tag["tagName"]])
+            batch.update(snapshot.reference, fields)
+        batch.commit()
+        return tag["tagId"]
+
+    def new_directory(self):
+        directory = self.directory(self.user_id, f"Directory {uuid.uuid4().hex[:8]}")
+        db.collection(DIRECTORY_COLLECTION).document(directory["directoryId"]).set(directory)
+        return directory["directoryId"]
+
+    def new_user(self):
+        user_id = f"benchmark-user-{uuid.uuid4().hex[:8]}"
+        db.collection(USER_COLLECTION).document(user_id).set(self.user(user_id))
+        return user_id
+
+    def reenrichment_job(self):
+        return create_reenrichment_job({"userId": self.user_id}, refetch=False)["jobId"]
+
+    def profile(self):
+        profiles = list_profiles()
+        if profiles:
+            return profiles[0]["profileId"]
+        profile = cProfile.Profile()
+        profile.enable()
+        profile.disable()
+        return save_profile([profile], "benchmark", 0, time.time(), {})
+
+    def thumbnail(self):
+        return fake_create_thumbnails(None)
+
+    def sample(self, values, count):
+        return self.random.sample(values, min(count, len(values)))
+
+
+class Endpoint:
+    """
+    How to call one Flask endpoint. `prepare(fixtures)` runs before the measured request (its storage
+    operations are not counted) and returns (path, json_body). `headers` sends the userId header, `admin`
+    the adminToken header.
+    """
+    def __init__(self, endpoint, method, prepare, headers=True, admin=False):
+        self.endpoint = endpoint
+        self.method = method
+        self.prepare = prepare
+        self.headers = headers
+        self.admin = admin
+
+
+def endpoints():
+    return [
+        # User APIs
+        Endpoint("api.user_routes.create_user", "POST", lambda f: ("/api/user/create", {"userId": f"benchmark-user-{uuid.uuid4().hex[:8]}", "name": "New"}), headers=False),
+        Endpoint("api.user_routes.get_user", "GET", lambda f: (f"/api/user/{f.user_id}", None), headers=False),
+        Endpoint("api.user_routes.update_user", "PUT", lambda f: (f"/api/user/{f.user_id}", {"name": "Renamed"}), headers=False),
+        Endpoint("api.user_routes.delete_user", "DELETE", lambda f: (f"/api/user/{f.new_user()}", None), headers=False),
+
+        # Bookmark APIs
+        Endpoint("api.bookmark_routes.create_bookmark", "POST", lambda f: ("/api/bookmark/create", {"url": f"https://example.com/{uuid.uuid4()}"})),
+        Endpoint("api.bookmark_routes.export_bookmarks", "GET", lambda f: (f"/api/bookmark/export?format={f.random.choice(['ndjson', 'csv', 'html'])}", None)),
+        Endpoint("api.bookmark_routes.get_bookmark", "GET", lambda f: (f"/api/bookmark/get/{f.random.choice(f.bookmark_ids)}", None)),
+        Endpoint("api.bookmark_routes.batch_get_bookmarks", "POST", lambda f: ("/api/bookmark/batch-get", {"bookmarkIds": f.sample(f.bookmark_ids, 100)})),
+        Endpoint("api.bookmark_routes.update_bookmark", "POST", lambda f: (f"/api/bookmark/update/{f.new_bookmark()}", {"title": "Updated", "tags": f.sample(f.tag_names, 3) + ["brand_new_tag"], "directoryId": f.random.choice(f.directory_ids)})),
+        Endpoint("api.bookmark_routes.delete_bookmark", "DELETE", lambda f: (f"/api/bookmark/delete/{f.new_bookmark()}", None)),
+        Endpoint("api.bookmark_routes.toggle_favorite", "POST", lambda f: (f"/api/bookmark/favorite/{f.random.choice(f.bookmark_ids)}", None)),
+        Endpoint("api.bookmark_routes.batch_update_bookmarks", "POST", lambda f: ("/api/bookmark/batch", {"operations": [
+            {"bookmarkId": f.new_bookmark(), "action": "update", "directoryId": f.random.choice(f.directory_ids)} for _ in range(50)
+        ] + [{"bookmarkId": f.new_bookmark(), "action": "addTags", "tags": f.sample(f.tag_names, 1)} for _ in range(50)]})),
+        Endpoint("api.bookmark_routes.fetch_all_bookmarks", "GET", lambda f: ("/api/bookmark/all", None)),
+        Endpoint("api.bookmark_routes.filter_bookmarks_by_tags", "GET", lambda f: (
+            f"/api/bookmark/filter-by-tags?match_type=OR&tags={','.join(f.sample(f.tag_ids, 3))}&exclude={f.random.choice(f.tag_ids)}&limit=50", None)),
+        Endpoint("api.bookmark_routes.get_bookmarks_by_tagId", "GET", lambda f: (f"/api/bookmark/tag/{f.random.choice(f.tag_ids)}", None)),
+        Endpoint("api.bookmark_routes.get_bookmarks_by_directoryId", "GET", lambda f: (
+            f"/api/bookmark/directory/{f.random.choice(f.directory_ids)}?includeDescendants={f.random.choice(['true', 'false'])}", None)),
+        Endpoint("api.bookmark_routes.get_bookmarks_by_filterType", "GET", lambda f: (
+            f"/api/bookmark/filter/{f.random.choice(['all', 'favorite', 'with_notes', 'without_tags', 'uncategorized'])}", None)),
+
+        # Tag APIs
+        Endpoint("api.tags_routes.create_tag", "POST", lambda f: ("/api/tag/create", {"tagName": f"tag_{uuid.uuid4().hex[:8]}"})),
+        Endpoint("api.tags_routes.get_tag", "GET", lambda f: (f"/api/tag/get/{f.random.choice(f.tag_ids)}", None)),
+        Endpoint("api.tags_routes.batch_get_tags", "POST", lambda f: ("/api/tag/batch-get", {"tagIds": f.sample(f.tag_ids, 100)})),
+        Endpoint("api.tags_routes.get_all_tags", "GET", lambda f: ("/api/tag/all", None)),
+        Endpoint("api.tags_routes.update_tag", "POST", lambda f: (f"/api/tag/update/{f.new_tag()}", {"tagName": f"renamed_{uuid.uuid4().hex[:8]}"})),
+        Endpoint("api.tags_routes.delete_tag", "DELETE", lambda f: (f"/api/tag/delete/{f.new_tag()}", None)),
+        Endpoint("api.tags_routes.merge_tags", "POST", lambda f: ("/api/tag/merge", {"sourceTagIds": [f.new_tag(bookmarks=50), f.new_tag(bookmarks=50)], "targetTagId": f.random.choice(f.tag_ids)})),
+        Endpoint("api.tags_routes.generated_ai_tags", "POST", lambda f: ("/api/tag/generate", {"bookmarkId": f.new_bookmark()})),
+
+        # Directory APIs
+        Endpoint("api.directory_routes.create_directory", "POST", lambda f: ("/api/directory/create", {"name": f"Directory {uuid.uuid4().hex[:8]}"})),
+        Endpoint("api.directory_routes.rename_directory", "POST", lambda f: (f"/api/directory/rename/{f.new_directory()}", {"name": "Renamed"})),
+        Endpoint("api.directory_routes.move_directory", "POST", lambda f: (f"/api/directory/move/{f.new_directory()}", {"parentId": f.random.choice(f.directory_ids)})),
+        Endpoint("api.directory_routes.batch_get_directories", "POST", lambda f: ("/api/directory/batch-get", {"directoryIds": f.directory_ids})),
+        Endpoint("api.directory_routes.get_all_directories", "GET", lambda f: ("/api/directory/all", None)),
+        Endpoint("api.directory_routes.delete_directory", "DELETE", lambda f: (f"/api/directory/delete/{f.new_directory()}", {"moveBookmarks": True})),
+
+        # Trash APIs
+        Endpoint("api.trash_routes.get_trash", "GET", lambda f: ("/api/trash?limit=50", None)),
+        Endpoint("api.trash_routes.restore_from_trash", "POST", lambda f: ("/api/trash/restore", {"bookmarkIds": [f.deleted_bookmark() for _ in range(20)]})),
+
+        # Sync APIs
+        Endpoint("api.sync_routes.sync", "GET", lambda f: (f"/api/sync?since={now() - 60}", None)),
+
+        # Event APIs, timeout=0: measures the poll itself, not the wait for events
+        Endpoint("api.event_routes.poll_events", "GET", lambda f: ("/api/events/poll?timeout=0", None)),
+
+        # Thumbnail APIs
+        Endpoint("api.thumbnail_routes.get_thumbnail", "GET", lambda f: (f"/api/thumbnail/{f.thumbnail()}/small", None), headers=False),
+
+        # Metrics APIs
+        Endpoint("api.metrics_routes.get_metrics", "GET", lambda f: ("/api/metrics", None), headers=False, admin=True),
+
+        # Admin APIs
+        Endpoint("api.admin_routes.get_profiles", "GET", lambda f: ("/api/admin/profiles", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.get_profile", "GET", lambda f: (f"/api/admin/profiles/{f.profile()}?format=text", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_content_refresh_job", "POST", lambda f: ("/api/admin/jobs/content-refresh?limit=20", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_bookmark_names_backfill", "POST", lambda f: ("/api/admin/jobs/backfill-bookmark-names", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_tag_id_migration", "POST", lambda f: ("/api/admin/jobs/migrate-tag-ids", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_bookmark_content_migration", "POST", lambda f: ("/api/admin/jobs/migrate-bookmark-content", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_directory_paths_backfill", "POST", lambda f: ("/api/admin/jobs/backfill-directory-paths", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_directory_paths_repair", "POST", lambda f: ("/api/admin/jobs/repair-directory-paths", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_updated_at_backfill", "POST", lambda f: ("/api/admin/jobs/backfill-updated-at?collection=tags", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_trash_purge", "POST", lambda f: ("/api/admin/jobs/purge-trash", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.start_reenrichment_job", "POST", lambda f: ("/api/admin/jobs/reenrichment", {"filter": {"userId": f.user_id}}), headers=False, admin=True),
+        Endpoint("api.admin_routes.run_reenrichment", "POST", lambda f: ("/api/admin/jobs/reenrichment/run", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.get_reenrichment_progress", "GET", lambda f: (f"/api/admin/jobs/reenrichment/{f.reenrichment_job()}", None), headers=False, admin=True),
+        Endpoint("api.admin_routes.cancel_reenrichment_job", "POST", lambda f: (f"/api/admin/jobs/reenrichment/{f.reenrichment_job()}/cancel", None), headers=False, admin=True),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+
+class Measurements:
+    def __init__(self):
+        self.latencies = []
+        self.stats = []
+        self.errors = 0
+
+    def add(self, latency, stats, ok=True):
+        self.latencies.append(latency)
+        self.stats.append(stats)
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        average = lambda key: sum(stats[key] for stats in self.stats) / count if count else 0
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "p50Ms": percentile(latencies, 0.50) * 1000,
+            "p95Ms": percentile(latencies, 0.95) * 1000,
+            "p99Ms": percentile(latencies, 0.99) * 1000,
+            "roundTrips": average("roundTrips"),
+            "documentsRead": average("documentsRead"),
+            "documentsWritten": average("documentsWritten"),
+        }
+
+
+def read_response(response):
+    # Streamed responses (e.g. exports) are only produced as they are read
+    response.get_data()
+    return response
+
+
+def measure(call):
+    db.reset_stats()
+    start = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - start
+    return result, elapsed, db.stats.snapshot()
+
+
+def run(args):
+    deferred_threads = disable_outbound_calls()
+    print(f"Seeding {args.users} user(s) with {args.bookmarks} bookmarks, {args.tags} tags and {args.directories} directories each...",
+          file=sys.stderr)
+    fixtures = Fixtures(args.bookmarks, args.tags, args.directories, args.users, args.seed)
+    # Seeding runs without latency, only the measured requests (and their preparation) pay it
+    db.set_latency(args.latency_ms / 1000)
+    client = index.app.test_client()
+
+    specs = [spec for spec in endpoints() if not args.only or args.only in spec.endpoint]
+    registered = {rule.endpoint for rule in index.app.url_map.iter_rules() if rule.rule.startswith("/api")}
+    missing = registered - {spec.endpoint for spec in endpoints()}
+    if missing:
+        print(f"⚠️  Endpoints without a benchmark spec: {', '.join(sorted(missing))}", file=sys.stderr)
+
+    results = {}
+    enrichment = Measurements()
+    for spec in specs:
+        measurements = Measurements()
+        for _ in range(args.iterations):
+            path, body = spec.prepare(fixtures)
+            headers = {"userId": fixtures.user_id} if spec.headers else {}
+            if spec.admin:
+                headers["adminToken"] = os.environ["ADMIN_TOKEN"]
+            response, elapsed, stats = measure(
+                lambda: read_response(client.open(path, method=spec.method, json=body, headers=headers))
+            )
+            measurements.add(elapsed, stats, ok=response.status_code < 400)
+        results[spec.endpoint] = measurements.summary()
+
+        # Enrichment started by create_bookmark runs here, outside of the measured requests
+        if deferred_threads.pending:
+            for target, target_args, target_kwargs in deferred_threads.pending:
+                _, elapsed, stats = measure(lambda: target(*target_args, **target_kwargs))
+                enrichment.add(elapsed, stats)
+            deferred_threads.pending = []
+            results[BACKGROUND_ENRICHMENT] = enrichment.summary()
+
+    return results
+
+
+def print_table(results):
+    header = f"{'endpoint':<58}{'req':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'trips':>8}{'reads':>9}{'writes':>8}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, summary in results.items():
+        print(f"{endpoint:<58}{summary['requests']:>6}{summary['errors']:>5}"
+              f"{summary['p50Ms']:>9.2f}{summary['p95Ms']:>9.2f}{summary['p99Ms']:>9.2f}"
+              f"{summary['roundTrips']:>8.1f}{summary['documentsRead']:>9.1f}{summary['documentsWritten']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint against the in-memory storage backend.")
+    parser.add_argument("--bookmarks", type=int, default=2000, help="bookmarks per seeded user")
+    parser.add_argument("--tags", type=int, default=150, help="tags per seeded user")
+    parser.add_argument("--directories", type=int, default=15, help="directories per seeded user")
+    parser.add_argument("--users", type=int, default=3, help="seeded users, requests are made as the first one")
+    parser.add_argument("--iterations", type=int, default=30, help="requests per endpoint")
+    parser.add_argument("--only", help="only run endpoints whose name contains this string")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated datastore round trip latency")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
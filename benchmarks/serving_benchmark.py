@@ -0,0 +1,181 @@
+"""
+Serving throughput benchmark: waitress (index.py) vs the ASGI mode (asgi.py, uvicorn).
+
+Each server runs in its own process on the in-memory storage backend, seeded like api_benchmark.py, with a
+simulated datastore round trip latency so requests are I/O bound like against Firestore. The seeded data is
+small by default: the in-memory store scans and copies documents on the CPU, which Firestore does not.
+The same read-heavy request mix is then sent at increasing concurrency levels, and throughput and latency
+percentiles are reported.
+
+Usage (from the repository root):
+    python -m benchmarks.serving_benchmark
+    python -m benchmarks.serving_benchmark --concurrency 10,100,1000 --requests 3000 --latency-ms 20 --bookmarks 100 --json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import subprocess
+import sys
+import time
+
+SERVERS = ("waitress", "uvicorn")
+DEFAULT_PATHS = "/api/bookmark/all,/api/bookmark/filter/favorite,/api/directory/all,/api/sync"
+
+
+def serve(args):
+    """Child process: seed the in-memory storage and serve the app until killed."""
+    # Seeds the storage through the same fixtures as the API benchmark
+    from benchmarks.api_benchmark import Fixtures, disable_outbound_calls
+    from src.utils.init import db
+
+    disable_outbound_calls()
+    fixtures = Fixtures(args.bookmarks, args.tags, args.directories, 1, args.seed)
+    db.set_latency(args.latency_ms / 1000)
+    print(f"READY {fixtures.user_id}", flush=True)
+
+    # Waitress warns on every queued request, which is the point of the benchmark
+    logging.getLogger("waitress").setLevel(logging.ERROR)
+    if args.serve == "waitress":
+        import index
+        from waitress import serve as waitress_serve
+        from src.utils.init import WAITRESS_THREADS
+        # Same settings as index.py
+        waitress_serve(index.app, host="127.0.0.1", port=args.port, threads=WAITRESS_THREADS, _quiet=True)
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, args):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serving_benchmark", "--serve", server, "--port", str(port),
+         "--bookmarks", str(args.bookmarks), "--tags", str(args.tags), "--directories", str(args.directories),
+         "--latency-ms", str(args.latency_ms), "--seed", str(args.seed)],
+        stdout=subprocess.PIPE, text=True
+    )
+    for line in process.stdout:
+        if line.startswith("READY "):
+            return process, port, line.split()[1]
+    raise RuntimeError(f"{server} exited before being ready")
+
+
+async def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+async def load(port, user_id, paths, concurrency, total_requests):
+    import httpx
+
+    latencies = []
+    errors = 0
+    next_request = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal next_request, errors
+            while next_request < total_requests:
+                path = paths[next_request % len(paths)]
+                next_request += 1
+                started_at = time.perf_counter()
+                try:
+                    response = await client.get(path, headers={"userId": user_id})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started_at)
+                errors += 0 if ok else 1
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "throughput": round(total_requests / elapsed, 1),
+        "p50": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run(args):
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    results = {}
+    for server in args.servers.split(","):
+        print(f"Starting {server}...", file=sys.stderr)
+        process, port, user_id = start_server(server, args)
+        try:
+            asyncio.run(wait_until_listening(port))
+            # Warm up, e.g. the lazily created storage clients
+            asyncio.run(load(port, user_id, paths, 4, 20))
+            results[server] = {}
+            for concurrency in [int(value) for value in args.concurrency.split(",")]:
+                results[server][concurrency] = asyncio.run(load(port, user_id, paths, concurrency, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+def print_table(results):
+    print(f"{'server':<10} {'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    print("-" * 60)
+    for server, levels in results.items():
+        for concurrency, result in levels.items():
+            print(f"{server:<10} {concurrency:>11} {result['throughput']:>9.1f} {result['p50']:>9.1f} "
+                  f"{result['p99']:>9.1f} {result['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", default=",".join(SERVERS), help="servers to compare, among waitress,uvicorn")
+    parser.add_argument("--concurrency", default="10,100,500", help="comma separated in-flight request levels")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--paths", default=DEFAULT_PATHS, help="comma separated GET paths, requested in turn")
+    parser.add_argument("--bookmarks", type=int, default=20, help="bookmarks of the seeded user")
+    parser.add_argument("--tags", type=int, default=5, help="tags of the seeded user")
+    parser.add_argument("--directories", type=int, default=3, help="directories of the seeded user")
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated datastore round trip latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--serve", choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
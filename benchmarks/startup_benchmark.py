@@ -0,0 +1,111 @@
+"""
+Cold start benchmark.
+
+Imports the app (`index`) in fresh interpreters, as a serverless cold start does, and reports the import time,
+the resident memory after import, and the time of the first request. Fails (exit code 1) when a threshold is
+exceeded, or when a module that should only load on first use (scraping, LLM, Firestore client creation) was
+imported at startup.
+
+The first request runs against the in-memory storage backend, so no credentials are needed.
+
+Usage (from the repository root):
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --runs 10 --max-import-ms 800 --max-rss-mb 120 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules loaded lazily, on the paths that need them. Importing them at startup is a cold start regression.
+LAZY_MODULES = (
+    "bs4",
+    "lxml",
+    "PIL",
+    "src.utils.tagGeneration.fetch_page_content",
+    "src.utils.tagGeneration.generate_tags",
+    "src.utils.storage.memory_store",
+)
+
+# Runs in the child interpreter. Prints one JSON line with the measurements.
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started_at = time.perf_counter()
+import index
+import_seconds = time.perf_counter() - started_at
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+loaded = [name for name in {lazy_modules!r} if name in sys.modules]
+
+client = index.app.test_client()
+started_at = time.perf_counter()
+client.post("/api/user/create", json={{"userId": "startup-benchmark-user", "name": "Startup"}})
+first_request_seconds = time.perf_counter() - started_at
+
+print(json.dumps({{
+    "importMs": import_seconds * 1000,
+    "rssMb": rss_kb / 1024,
+    "firstRequestMs": first_request_seconds * 1000,
+    "eagerlyLoaded": loaded,
+}}))
+"""
+
+
+def run_once():
+    environment = dict(os.environ, STORAGE_BACKEND="memory")
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT.format(lazy_modules=LAZY_MODULES)],
+        capture_output=True, text=True, env=environment, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args):
+    # The first run warms the bytecode cache, like a deployed image would have it
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    return {
+        "runs": args.runs,
+        "importMs": {"median": statistics.median(r["importMs"] for r in runs), "max": max(r["importMs"] for r in runs)},
+        "rssMb": {"median": statistics.median(r["rssMb"] for r in runs), "max": max(r["rssMb"] for r in runs)},
+        "firstRequestMs": {"median": statistics.median(r["firstRequestMs"] for r in runs)},
+        "eagerlyLoaded": sorted({name for r in runs for name in r["eagerlyLoaded"]}),
+    }
+
+
+def check(results, args):
+    failures = []
+    if args.max_import_ms and results["importMs"]["median"] > args.max_import_ms:
+        failures.append(f"import time {results['importMs']['median']:.0f} ms > {args.max_import_ms} ms")
+    if args.max_rss_mb and results["rssMb"]["median"] > args.max_rss_mb:
+        failures.append(f"RSS after import {results['rssMb']['median']:.1f} MB > {args.max_rss_mb} MB")
+    if results["eagerlyLoaded"]:
+        failures.append(f"modules loaded at startup instead of on first use: {', '.join(results['eagerlyLoaded'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--max-import-ms", type=float, default=1000, help="median import time threshold, 0 to disable")
+    parser.add_argument("--max-rss-mb", type=float, default=150, help="median RSS after import threshold, 0 to disable")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import time      median {results['importMs']['median']:8.1f} ms   max {results['importMs']['max']:8.1f} ms")
+        print(f"RSS after import median {results['rssMb']['median']:8.1f} MB   max {results['rssMb']['max']:8.1f} MB")
+        print(f"first request    median {results['firstRequestMs']['median']:8.1f} ms")
+
+    failures = check(results, args)
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
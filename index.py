@@ -1,5 +1,5 @@
 from flask_cors import CORS
-from src.utils.init import create_app
+from src.utils.init import create_app, WAITRESS_THREADS
 from src.services.routes import api_blueprint
 from waitress import serve
 import os
@@ -10,7 +10,7 @@ ON_VERCEL = os.getenv("VERCEL") == "1"
 app = create_app()
 
 # Enable CORS for all origins
-CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], expose_headers=["ETag", "Server-Timing"])
 
 PORT = 5002
 
@@ -19,8 +19,8 @@ app.register_blueprint(api_blueprint, url_prefix="/api")
 
 if __name__ == "__main__":
     if ON_VERCEL:
-        print(f"🚀 Running Flask app with Waitress at port: {PORT}...")
-        serve(app, host="0.0.0.0", port=PORT)
+        print(f"🚀 Running Flask app with Waitress at port: {PORT}, {WAITRESS_THREADS} threads...")
+        serve(app, host="0.0.0.0", port=PORT, threads=WAITRESS_THREADS)
     else:
         print(f"🚀 Running Flask app on local...")
         app.run(debug=True)
\ No newline at end of file
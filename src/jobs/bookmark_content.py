@@ -0,0 +1,71 @@
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION, BOOKMARK_CONTENT_MODEL
+from src.utils.metrics import background_job
+from src.utils.routes_util import bookmark_content_ref, BATCH_WRITE_LIMIT
+from src.jobs.bookmark_names import commit_or_raise
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS
+
+"""
+Moves the heavy enrichment data of bookmarks written before it was kept in their content subdocument
+(bookmarks/{bookmarkId}/content/enrichment, see BOOKMARK_CONTENT_MODEL) out of the bookmark documents.
+
+Until a bookmark is migrated its content is read from the bookmark (see `bookmark_content`), and the next write of
+its content moves it. Run through /admin/jobs/migrate-bookmark-content, a checkpointed scan (see
+src/jobs/checkpointed_scan.py) advanced by each call.
+"""
+
+MIGRATION_PAGE_SIZE = 500
+MIGRATION_JOB = "bookmark_content_migration"
+
+
+@background_job("bookmark_content_migration")
+def migrate_bookmark_content(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Move the content fields of the bookmarks to their content subdocument, advanced from its checkpoint within the
+    time budget. Returns the scan job, the count of moved bookmarks is its "moved" outcome.
+    """
+    def migrate_page(snapshots):
+        moves = []
+        moved = 0
+        for snapshot in snapshots:
+            content_fields = snapshot.to_dict()
+            if not content_fields:
+                continue
+            # Merged into the subdocument: a field written there since was removed from the bookmark. The bookmark
+            # must not have changed since it was read, or these values would overwrite newer content.
+            moves.append([
+                ("update", snapshot.reference, {field: firestore.DELETE_FIELD for field in content_fields},
+                 db.write_option(last_update_time=snapshot.update_time)),
+                ("merge", bookmark_content_ref(snapshot.id), content_fields)
+            ])
+            # Both writes of a bookmark are in the same batch
+            if len(moves) * 2 >= BATCH_WRITE_LIMIT:
+                moved += commit_moves(moves)
+                moves = []
+        moved += commit_moves(moves)
+        return len(snapshots), {"moved": moved}
+
+    bookmarks_query = db.collection(BOOKMARK_COLLECTION).select(list(BOOKMARK_CONTENT_MODEL))
+    return run_checkpointed_scan(MIGRATION_JOB, bookmarks_query, MIGRATION_PAGE_SIZE, migrate_page, budget_seconds)
+
+
+def commit_moves(moves):
+    """
+    Commit the writes moving the content of a page of bookmarks. If one of them was written since it was read,
+    the batch fails and each bookmark is committed on its own: those written since are skipped, their content is
+    moved by their next content write or the next run. Returns the count of moved bookmarks.
+    """
+    try:
+        commit_or_raise([write for move in moves for write in move])
+        return len(moves)
+    except FailedPrecondition:
+        moved = 0
+        for move in moves:
+            try:
+                commit_or_raise(move)
+                moved += 1
+            except FailedPrecondition:
+                continue
+        return moved
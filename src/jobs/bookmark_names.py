@@ -0,0 +1,175 @@
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.utils.concurrency import run_concurrently
+from src.utils.metrics import background_job
+from src.utils.routes_util import bump_data_version, commit_writes, fetch_name_maps, fetch_tag_name_map, \
+    has_bookmark_names, tag_names_field, BATCH_WRITE_LIMIT
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS
+
+"""
+Keeps the tag and directory names denormalized on bookmarks (`tagNames`, `directoryName`) up to date, so listings
+read bookmarks without joining them to the user's tags and directories.
+
+Writes to a bookmark set its names along with its tags or directory. Renaming a tag or a directory changes many
+bookmarks: the route renames the tag or directory document and the bookmarks are rewritten in the background, in
+batches (`propagate_tag_rename`, `propagate_directory_rename`), then the user's data version is bumped so
+listings are fetched again. Until then listings show the previous name.
+
+The names written are read after the bookmarks, and each write has a precondition on the bookmark read (see
+`rewrite_names`). A bookmark written since, by the user or by the rewrite of a later rename, is read again with the
+names and rewritten: whichever rewrite commits last has read the current names, so two quick renames can not leave
+the older name behind, and tag edits made meanwhile are not overwritten.
+
+Bookmarks written before the names were denormalized are resolved through the name maps by the listings, and
+rewritten with their names by `backfill_bookmark_names` (/admin/jobs/backfill-bookmark-names), a checkpointed scan
+advanced by each call (see src/jobs/checkpointed_scan.py).
+
+These rewrites do not change `updatedAt`: delta-sync clients resolve names from their tags and directories.
+"""
+
+BACKFILL_PAGE_SIZE = 500
+BACKFILL_JOB = "bookmark_names_backfill"
+# Rounds of rewrites of the bookmarks written since they were read, before giving up
+RENAME_ATTEMPTS = 5
+
+
+def bookmark_tag_names(bookmark, tag_map):
+    return tag_names_field([tag_map[tag_id] for tag_id in bookmark.get("tags", []) if tag_id in tag_map])
+
+
+def commit_or_raise(writes):
+    errors = [error for error in commit_writes(writes, BATCH_WRITE_LIMIT) if error is not None]
+    if errors:
+        raise errors[0]
+
+
+def commit_conditional_writes(writes):
+    """
+    Commit writes having a precondition, in batches. A batch failing its preconditions is committed again one write
+    at a time. Returns the references of the documents written since they were read, documents deleted since are
+    left out.
+    """
+    conflicts = []
+    for write, error in zip(writes, commit_writes(writes, BATCH_WRITE_LIMIT)):
+        if error is None:
+            continue
+        if not isinstance(error, (FailedPrecondition, NotFound)):
+            raise error
+        single_error = commit_writes([write])[0]
+        if isinstance(single_error, FailedPrecondition):
+            conflicts.append(write[1])
+        elif single_error is not None and not isinstance(single_error, NotFound):
+            raise single_error
+    return conflicts
+
+
+def rewrite_names(snapshots, read_names, names_fields):
+    """
+    Rewrite the denormalized names of the bookmarks of `snapshots`. `read_names(snapshots)` reads the current names,
+    after the bookmarks, and `names_fields(bookmark, names)` returns the fields to write, None if they are right.
+    Each write is conditioned on the bookmark read, those written since are read again and rewritten, at most
+    RENAME_ATTEMPTS times. Returns the count of rewritten bookmarks.
+    """
+    rewritten = 0
+    for attempt in range(RENAME_ATTEMPTS):
+        names = read_names(snapshots)
+        writes = []
+        for snapshot in snapshots:
+            bookmark = snapshot.to_dict()
+            fields = names_fields(bookmark, names) if bookmark else None
+            if fields is not None:
+                writes.append(("update", snapshot.reference, fields, db.write_option(last_update_time=snapshot.update_time)))
+        conflicts = commit_conditional_writes(writes)
+        rewritten += len(writes) - len(conflicts)
+        if not conflicts:
+            return rewritten
+        snapshots = list(db.get_all(conflicts))
+    raise RuntimeError(f"{len(snapshots)} bookmarks kept changing, names not rewritten after {RENAME_ATTEMPTS} attempts")
+
+
+@background_job("tag_rename")
+def propagate_tag_rename(user_id, tag_id):
+    """Rewrite the tag names of the user's bookmarks having `tag_id`, after the tag was renamed."""
+    def tag_names_fields(bookmark, tag_map):
+        # Recomputed from every tag of the bookmark, a name may be shared by several tags
+        tag_names = bookmark_tag_names(bookmark, tag_map)
+        if "tagNames" not in bookmark or bookmark["tagNames"] == tag_names:
+            return None
+        return {"tagNames": tag_names}
+
+    try:
+        bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", user_id)\
+            .where("tags", "array_contains", tag_id)\
+            .select(["tags", "tagNames"])
+        rewritten = rewrite_names(list(bookmarks_query.stream()), lambda snapshots: fetch_tag_name_map(user_id),
+                                  tag_names_fields)
+        bump_data_version(user_id)
+        print(f"✅ Renamed tag {tag_id} on {rewritten} bookmarks")
+    except Exception as e:
+        print(f"❌ Error propagating the rename of tag {tag_id}: {str(e)}")
+
+
+@background_job("directory_rename")
+def propagate_directory_rename(user_id, directory_id):
+    """
+    Rewrite the directory name of the user's bookmarks in `directory_id`, after the directory was renamed, with the
+    name it has when they are written.
+    """
+    def read_directory_name(snapshots):
+        directory = db.collection(DIRECTORY_COLLECTION).document(directory_id).get().to_dict()
+        return directory["name"] if directory else None
+
+    def directory_name_fields(bookmark, name):
+        # Moved out of the directory since it was read, or the directory was purged
+        if name is None or bookmark.get("directoryId") != directory_id or bookmark.get("directoryName") == name:
+            return None
+        return {"directoryName": name}
+
+    try:
+        bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", user_id)\
+            .where("directoryId", "==", directory_id)\
+            .select(["directoryId", "directoryName"])
+        rewritten = rewrite_names(list(bookmarks_query.stream()), read_directory_name, directory_name_fields)
+        bump_data_version(user_id)
+        print(f"✅ Renamed directory {directory_id} on {rewritten} bookmarks")
+    except Exception as e:
+        print(f"❌ Error propagating the rename of directory {directory_id}: {str(e)}")
+
+
+def read_users_name_maps(snapshots):
+    """{user ID: (tag_map, directory_map)} of the users of the bookmarks of `snapshots`."""
+    user_ids = list({snapshot.to_dict()["userId"] for snapshot in snapshots if snapshot.exists})
+    return dict(zip(user_ids, run_concurrently(*(lambda user_id=user_id: fetch_name_maps(user_id) for user_id in user_ids))))
+
+
+def backfill_names_fields(bookmark, name_maps):
+    if has_bookmark_names(bookmark):
+        return None
+    tag_map, directory_map = name_maps[bookmark["userId"]]
+    return {
+        "tagNames": bookmark_tag_names(bookmark, tag_map),
+        "directoryName": directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+    }
+
+
+@background_job("bookmark_names_backfill")
+def backfill_bookmark_names(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Write the names of the bookmarks that do not carry them yet, advanced from its checkpoint within the time budget.
+    Returns the scan job, the count of rewritten bookmarks is its "rewritten" outcome.
+    """
+    def backfill_page(snapshots):
+        legacy = [snapshot for snapshot in snapshots if not has_bookmark_names(snapshot.to_dict())]
+        # The name maps of the page's users are read after the page, see `rewrite_names`
+        rewritten = rewrite_names(legacy, read_users_name_maps, backfill_names_fields) if legacy else 0
+        for user_id in {snapshot.to_dict()["userId"] for snapshot in legacy}:
+            bump_data_version(user_id)
+        return len(snapshots), {"rewritten": rewritten}
+
+    bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+        .select(["userId", "tags", "directoryId", "tagNames", "directoryName"])
+    return run_checkpointed_scan(BACKFILL_JOB, bookmarks_query, BACKFILL_PAGE_SIZE, backfill_page, budget_seconds)
@@ -0,0 +1,117 @@
+import os
+import time
+from datetime import datetime, timezone
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from src.utils.init import db
+from src.models.job_model import JOB_COLLECTION, JOB_MODEL, JOB_ID_PREFIX, JOB_STATUS
+from src.utils.resilience import deadline_scope
+
+"""
+Checkpointed scans, for the migrations and backfills walking a whole collection (/admin/jobs/...).
+
+A scan reads the documents of a query in document ID order, a page at a time, and does not fit in one serverless
+run: each call advances it within a time budget (SCAN_JOB_BUDGET_SECONDS) and returns. After each page the job
+document of the scan (jobs/job-<type>, see JOB_MODEL) records its cursor, the ID of the last document processed
+with all the ones before it, so the next call resumes from there, like the re-enrichment jobs
+(src/jobs/reenrichment.py). Once the end is reached the job is completed, and the next call starts a new pass over
+the collection: the scans skip what is already migrated, a new pass only catches documents written the old way
+since. A run holds a lease on the job, so calls made concurrently do not process the same documents.
+"""
+
+# Below the 60 seconds a serverless function may run
+SCAN_JOB_BUDGET_SECONDS = float(os.getenv("SCAN_JOB_BUDGET_SECONDS", "50"))
+# No page is started with less than this left of the budget
+SCAN_MIN_PAGE_SECONDS = 5
+# A crashed run holds its job until then
+SCAN_LEASE_SECONDS = int(SCAN_JOB_BUDGET_SECONDS) + 30
+
+
+def scan_job_id(job_type):
+    return f"{JOB_ID_PREFIX}-{job_type}"
+
+
+def new_scan_job(job_type, now):
+    job = JOB_MODEL.copy()
+    job.update({
+        "jobId": scan_job_id(job_type),
+        "type": job_type,
+        "status": JOB_STATUS.RUNNING.value,
+        "filter": {},
+        "options": {},
+        "outcomes": {},
+        "createdAt": now,
+        "updatedAt": now
+    })
+    return job
+
+
+def claim_scan_job(job_ref, job_type, now):
+    """
+    Take the lease of the scan, starting a new pass if it is not running. Returns the job, None if another run
+    holds it.
+    """
+    snapshot = job_ref.get()
+    job = snapshot.to_dict()
+    if job and job.get("leaseUntil", 0) > now:
+        return None
+    if not job or job["status"] != JOB_STATUS.RUNNING.value:
+        job = new_scan_job(job_type, now)
+    job["leaseUntil"] = now + SCAN_LEASE_SECONDS
+    job["lastError"] = ""
+    try:
+        if snapshot.exists:
+            job_ref.update(job, option=db.write_option(last_update_time=snapshot.update_time))
+        else:
+            job_ref.create(job)
+    except (FailedPrecondition, AlreadyExists):
+        # Taken by a concurrent run
+        return None
+    return job
+
+
+def run_checkpointed_scan(job_type, query, page_size, process_page, budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Advance the scan `job_type` of the documents of `query` from its checkpoint, within the time budget.
+
+    `process_page(snapshots)` processes a page and returns (count of its first snapshots processed, {outcome:
+    count}); the snapshots after those are processed again by the next run. Returns the job, with `completed` if
+    the pass reached the end of the query, or None if another run holds it.
+    """
+    started_at = time.monotonic()
+    job_ref = db.collection(JOB_COLLECTION).document(scan_job_id(job_type))
+    job = claim_scan_job(job_ref, job_type, int(datetime.now(timezone.utc).timestamp()))
+    if job is None:
+        return None
+    elapsed_before = job["elapsedSeconds"]
+    released = {"leaseUntil": 0}
+
+    try:
+        with deadline_scope(budget_seconds) as scan_deadline:
+            page_query = query.order_by("__name__").limit(page_size)
+            while scan_deadline.remaining() >= SCAN_MIN_PAGE_SECONDS:
+                page = page_query.start_after({"__name__": job["cursor"]}) if job["cursor"] else page_query
+                snapshots = list(page.stream())
+                if not snapshots:
+                    job["status"] = released["status"] = JOB_STATUS.COMPLETED.value
+                    job["completedAt"] = released["completedAt"] = int(datetime.now(timezone.utc).timestamp())
+                    break
+
+                done, outcomes = process_page(snapshots)
+                for outcome, count in outcomes.items():
+                    job["outcomes"][outcome] = job["outcomes"].get(outcome, 0) + count
+                if done:
+                    job["processed"] += done
+                    job["cursor"] = snapshots[done - 1].id
+                job["elapsedSeconds"] = round(elapsed_before + time.monotonic() - started_at, 3)
+                job["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
+                job_ref.update({field: job[field] for field in ("cursor", "processed", "outcomes", "elapsedSeconds", "updatedAt")})
+                if done < len(snapshots):
+                    break
+    except Exception as e:
+        job["lastError"] = released["lastError"] = str(e)
+        print(f"❌ Error running {job_type}: {str(e)}")
+    finally:
+        job["elapsedSeconds"] = released["elapsedSeconds"] = round(elapsed_before + time.monotonic() - started_at, 3)
+        job["leaseUntil"] = 0
+        job_ref.update(released)
+    return {**job, "completed": job["status"] == JOB_STATUS.COMPLETED.value}
@@ -0,0 +1,307 @@
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION, LINK_STATUS
+from src.models.tag_model import TAG_COLLECTION
+from src.utils.concurrency import run_concurrently
+from src.utils.metrics import background_job, CONTENT_REFRESH_CHECKS
+from src.utils.rate_limit import TokenBucket, HostSpacing
+from src.utils.resilience import deadline_scope, current_deadline, DeadlineExceeded
+from src.utils.routes_util import bump_data_version, commit_writes, update_bookmark_fields
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS
+
+"""
+Content refresh: revalidates bookmarked pages so their content, image and generated tags follow the page.
+
+Bookmarks are due once `nextCheckAt` has passed, and are checked most overdue first. A check is a conditional
+request with the validators (ETag, Last-Modified) stored by the previous fetch, so an unchanged page costs a 304
+without a body. A page that is fetched again is only re-processed (tag generation, thumbnails) when what is
+extracted from it (`contentHash`) changed. 404 and 410 are recorded as `linkStatus` "gone".
+
+The interval between two checks of a page doubles while it does not change, from MIN_REFRESH_INTERVAL_SECONDS to
+MAX_REFRESH_INTERVAL_SECONDS, and goes back to the minimum when it changes. Favorites are checked twice as often.
+
+One run checks at most REFRESH_BATCH_SIZE bookmarks within REFRESH_JOB_BUDGET_SECONDS, REFRESH_CONCURRENCY at a
+time, at most REFRESH_RATE_PER_SECOND checks per second and one per REFRESH_HOST_INTERVAL_SECONDS per host. What
+is not checked stays due for the next run. Runs are triggered by the scheduler through /admin/jobs/content-refresh.
+
+The user's edits are kept: the title is only filled in when it is empty and new generated tags are stored as
+suggestions (`generatedTags`), the bookmark tags are not changed. A check is only written if the bookmark did not
+change since the run read it, an edit or a delete in between defers it.
+"""
+
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "100"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "8"))
+REFRESH_RATE_PER_SECOND = float(os.getenv("REFRESH_RATE_PER_SECOND", "5"))
+REFRESH_HOST_INTERVAL_SECONDS = float(os.getenv("REFRESH_HOST_INTERVAL_SECONDS", "2"))
+# Below the 60 seconds a serverless function may run
+REFRESH_JOB_BUDGET_SECONDS = float(os.getenv("REFRESH_JOB_BUDGET_SECONDS", "50"))
+# No check is started with less than this left of the budget
+REFRESH_MIN_CHECK_SECONDS = 5
+
+MIN_REFRESH_INTERVAL_SECONDS = 24 * 60 * 60
+MAX_REFRESH_INTERVAL_SECONDS = 30 * 24 * 60 * 60
+# Delay before checking again a page that could not be fetched or processed
+REFRESH_RETRY_SECONDS = 60 * 60
+
+GONE_STATUSES = (404, 410)
+REFRESH_TAG_COUNT = 5
+
+BACKFILL_PAGE_SIZE = 500
+REFRESH_BACKFILL_JOB = "content_refresh_backfill"
+
+_rate_limiter = TokenBucket(REFRESH_RATE_PER_SECOND, burst=REFRESH_CONCURRENCY)
+_host_spacing = HostSpacing(REFRESH_HOST_INTERVAL_SECONDS)
+
+
+def now_timestamp():
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def schedule_fields(bookmark, interval, now):
+    """Fields scheduling the next check of `bookmark` in `interval` seconds (half of it for favorites)."""
+    delay = interval // 2 if bookmark.get("isFavorite") else interval
+    return {"refreshInterval": interval, "lastCheckedAt": now, "nextCheckAt": now + delay}
+
+
+def next_refresh_interval(bookmark, changed):
+    if changed:
+        return MIN_REFRESH_INTERVAL_SECONDS
+    interval = bookmark.get("refreshInterval") or MIN_REFRESH_INTERVAL_SECONDS
+    return min(interval * 2, MAX_REFRESH_INTERVAL_SECONDS)
+
+
+def link_status(status):
+    """LINK_STATUS value of a page fetched with HTTP `status` (None if the fetch failed)."""
+    if status in (200, 304):
+        return LINK_STATUS.OK.value
+    if status in GONE_STATUSES:
+        return LINK_STATUS.GONE.value
+    return LINK_STATUS.ERROR.value
+
+
+def fetched_page_fields(page_content, content_hash):
+    """Fields recording a page fetched in full, to revalidate it later."""
+    return {
+        "fetchedContent": page_content["content"],
+        "contentEtag": page_content["etag"],
+        "contentLastModified": page_content["lastModified"],
+        "contentHash": content_hash,
+    }
+
+
+def enrichment_refresh_fields(page_content, now):
+    """Refresh fields set by the enrichment of a new bookmark (see `async_process_bookmark_creation`)."""
+    from src.utils.tagGeneration.fetch_page_content import hash_page_content
+
+    fields = {"linkStatus": link_status(page_content["status"])}
+    fields.update(schedule_fields({}, MIN_REFRESH_INTERVAL_SECONDS, now))
+    if page_content["status"] == 200:
+        fields.update(fetched_page_fields(page_content, hash_page_content(page_content)))
+    else:
+        # Not fetched, the first check makes up for it
+        fields["nextCheckAt"] = now + REFRESH_RETRY_SECONDS
+    return fields
+
+
+def out_of_budget(error):
+    """Whether `error` is the deadline of the whole run (not of one call) passing"""
+    deadline = current_deadline()
+    return isinstance(error, DeadlineExceeded) and deadline is not None and deadline.remaining() == 0
+
+
+@background_job("content_refresh")
+def run_content_refresh(batch_size=REFRESH_BATCH_SIZE):
+    """Check the bookmarks that are due, returns the count of checks per outcome."""
+    outcomes = {}
+    with deadline_scope(REFRESH_JOB_BUDGET_SECONDS) as job_deadline:
+        # Deletes also clear `nextCheckAt`, the filter keeps bookmarks deleted before that out of the batch.
+        # Needs a composite index on (isDeleted, nextCheckAt).
+        due = db.collection(BOOKMARK_COLLECTION) \
+            .where("isDeleted", "==", False) \
+            .where("nextCheckAt", "<=", now_timestamp()) \
+            .order_by("nextCheckAt") \
+            .limit(batch_size) \
+            .stream()
+        pending = list(due)
+
+        while pending and job_deadline.remaining() >= REFRESH_MIN_CHECK_SECONDS:
+            # Next bookmarks whose host was not called too recently, the others wait for a later round
+            round_, waiting = [], []
+            for snapshot in pending:
+                host = urlparse(snapshot.to_dict()["url"]).hostname or ""
+                if len(round_) < REFRESH_CONCURRENCY and _host_spacing.try_reserve(host):
+                    round_.append(snapshot)
+                else:
+                    waiting.append(snapshot)
+            pending = waiting
+            if not round_:
+                time.sleep(min(REFRESH_HOST_INTERVAL_SECONDS, job_deadline.remaining()))
+                continue
+
+            results = run_concurrently(*[
+                lambda snapshot=snapshot: refresh_bookmark_or_defer(snapshot) for snapshot in round_
+            ])
+            for outcome in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    if pending:
+        outcomes["deferred"] = outcomes.get("deferred", 0) + len(pending)
+    for outcome, count in outcomes.items():
+        CONTENT_REFRESH_CHECKS.inc(count, outcome=outcome)
+    return outcomes
+
+
+def refresh_bookmark_or_defer(snapshot):
+    # Bookmarks not checked in this run stay due for the next one
+    if not _rate_limiter.acquire(timeout=max(current_deadline().remaining() - REFRESH_MIN_CHECK_SECONDS, 0)):
+        return "deferred"
+    try:
+        return refresh_bookmark(snapshot)
+    except Exception as e:
+        if out_of_budget(e):
+            return "deferred"
+        print(f"❌ Error refreshing {snapshot.id}: {str(e)}")
+        return "error"
+
+
+def refresh_bookmark(snapshot):
+    """
+    Revalidate one bookmarked page. Returns the outcome: "not_modified", "unchanged" (fetched in full, same
+    extracted content), "changed", "gone", "error" or "deferred" (written since it was read).
+    """
+    # Imported on first use, like in the enrichment
+    from src.utils.tagGeneration.fetch_page_content import fetch_page_content, hash_page_content
+    from src.utils.tagGeneration.generate_tags import generate_tags
+    from src.utils.thumbnails import create_thumbnails
+
+    bookmark = snapshot.to_dict()
+    url = bookmark["url"]
+    now = now_timestamp()
+
+    try:
+        page_content = fetch_page_content(
+            url,
+            etag=bookmark.get("contentEtag") or None,
+            last_modified=bookmark.get("contentLastModified") or None
+        )
+    except Exception as e:
+        if out_of_budget(e):
+            raise
+        print(f"⚠️ Could not refresh {url}: {str(e)}")
+        page_content = {"status": None}
+
+    status = page_content["status"]
+    fields = {"linkStatus": link_status(status)}
+    if status == 304:
+        outcome = "not_modified"
+        fields.update(schedule_fields(bookmark, next_refresh_interval(bookmark, changed=False), now))
+    elif status in GONE_STATUSES:
+        outcome = "gone"
+        fields.update(schedule_fields(bookmark, MAX_REFRESH_INTERVAL_SECONDS, now))
+    elif status != 200:
+        outcome = "error"
+        fields.update(schedule_fields(bookmark, bookmark.get("refreshInterval") or MIN_REFRESH_INTERVAL_SECONDS, now))
+        fields["nextCheckAt"] = now + REFRESH_RETRY_SECONDS
+    else:
+        content_hash = hash_page_content(page_content)
+        changed = content_hash != bookmark.get("contentHash")
+        outcome = "changed" if changed else "unchanged"
+        fields.update(schedule_fields(bookmark, next_refresh_interval(bookmark, changed), now))
+        if changed:
+            try:
+                fields.update(process_changed_page(bookmark, page_content, generate_tags, create_thumbnails))
+            except Exception as e:
+                if out_of_budget(e):
+                    raise
+                # The validators are not stored, so the page is fetched and processed in full next time
+                print(f"⚠️ Could not process the new content of {url}: {str(e)}")
+                outcome = "error"
+                fields["nextCheckAt"] = now + REFRESH_RETRY_SECONDS
+                fields["refreshInterval"] = bookmark.get("refreshInterval") or MIN_REFRESH_INTERVAL_SECONDS
+            else:
+                fields.update(fetched_page_fields(page_content, content_hash))
+        else:
+            # Same content, but the validators may have changed
+            fields.update(fetched_page_fields(page_content, content_hash))
+
+    # Only what clients show makes the bookmark updated (and the user's listings refetched)
+    visible = outcome == "changed" or fields["linkStatus"] != bookmark.get("linkStatus")
+    if visible:
+        fields["updatedAt"] = now
+    try:
+        # Computed from the snapshot read when the run started: a bookmark edited or deleted since is not
+        # overwritten, it is checked again by a later run if it is still due
+        update_bookmark_fields(snapshot.reference, fields, option=db.write_option(last_update_time=snapshot.update_time))
+    except (FailedPrecondition, NotFound):
+        return "deferred"
+    if visible:
+        bump_data_version(bookmark["userId"])
+    return outcome
+
+
+def process_changed_page(bookmark, page_content, generate_tags, create_thumbnails):
+    """Bookmark fields derived from the new content of its page. Raises if tags can not be generated."""
+    user_tags = [tag.to_dict() for tag in db.collection(TAG_COLLECTION).where("userId", "==", bookmark["userId"]).stream()]
+    user_tags = [tag for tag in user_tags if not tag.get("isDeleted")]
+
+    def create_thumbnails_if_new():
+        if page_content["image"] == bookmark.get("imageUrl"):
+            return bookmark.get("thumbnailHash", "")
+        if not page_content["image"]:
+            return ""
+        try:
+            return create_thumbnails(page_content["image"])
+        except Exception as e:
+            print(f"⚠️ No thumbnail for {page_content['image']}: {str(e)}")
+            return ""
+
+    generated_tags, thumbnail_hash = run_concurrently(
+        lambda: generate_tags(REFRESH_TAG_COUNT, bookmark["url"], page_content["title"], page_content["content"], user_tags),
+        create_thumbnails_if_new
+    )
+    fields = {
+        "imageUrl": page_content["image"],
+        "thumbnailHash": thumbnail_hash,
+        "generatedTags": generated_tags,
+        "tagsGeneratedAt": now_timestamp(),
+    }
+    if not bookmark.get("title"):
+        fields["title"] = page_content["title"]
+    return fields
+
+
+@background_job("content_refresh_backfill")
+def backfill_refresh_schedule(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Schedule the bookmarks created before the content refresh (without `nextCheckAt`). Their first checks are
+    spread over MIN_REFRESH_INTERVAL_SECONDS rather than all due at once. Advanced from its checkpoint within the
+    time budget, see src/jobs/checkpointed_scan.py. Returns the scan job, the count of scheduled bookmarks is its
+    "scheduled" outcome.
+    """
+    now = now_timestamp()
+
+    def schedule_page(snapshots):
+        writes = []
+        for snapshot in snapshots:
+            bookmark = snapshot.to_dict()
+            if bookmark.get("nextCheckAt") or bookmark.get("isDeleted"):
+                continue
+            # Stable spread, a re-run schedules a bookmark at the same time
+            offset = zlib.crc32(snapshot.id.encode()) % MIN_REFRESH_INTERVAL_SECONDS
+            writes.append(("update", snapshot.reference, {
+                "nextCheckAt": now + offset,
+                "refreshInterval": MIN_REFRESH_INTERVAL_SECONDS,
+                "linkStatus": bookmark.get("linkStatus") or LINK_STATUS.UNKNOWN.value,
+            }))
+        errors = [error for error in commit_writes(writes) if error is not None]
+        if errors:
+            raise errors[0]
+        return len(snapshots), {"scheduled": len(writes)}
+
+    bookmarks_query = db.collection(BOOKMARK_COLLECTION).select(["nextCheckAt", "linkStatus", "isDeleted"])
+    return run_checkpointed_scan(REFRESH_BACKFILL_JOB, bookmarks_query, BACKFILL_PAGE_SIZE, schedule_page, budget_seconds)
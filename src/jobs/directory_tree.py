@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from google.api_core.exceptions import FailedPrecondition
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.utils.metrics import background_job
+from src.utils.resilience import deadline_scope
+from src.utils.routes_util import bump_data_version, directory_path_field, get_documents
+from src.jobs.bookmark_names import commit_conditional_writes, commit_or_raise
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS, SCAN_MIN_PAGE_SECONDS
+
+"""
+Keeps the materialized paths of nested directories up to date. A directory stores the IDs of its ancestors
+(`ancestors`, root first) and a bookmark the path of its directory (`directoryPath`, see `directory_path_field`),
+so a subtree, its directories or its bookmarks, is one `array_contains` query.
+
+Moving a directory (/directory/move) writes its `parentId` at once, and rewrites the paths of its descendants and of
+their bookmarks in the background, in batches (`move_directory_subtree`), then bumps the user's data version. The
+`parentId` links are the truth: paths are derived from them when the rewrite is written, not from what they were
+when the move was requested, and each write has a precondition on the document read. A rewrite racing with another
+move (or with a bookmark update) fails its precondition and starts over from the current links, so the last one to
+commit writes the current paths. The move marks the directory (`pathsDirtyAt`) and the rewrite clears the marks of
+the directories it rewrote: a rewrite that gave up, or whose run was cut short, is run again by
+`repair_directory_paths` (/admin/jobs/repair-directory-paths, scheduled in vercel.json). Like the denormalized names, these rewrites do not change `updatedAt`: delta-sync
+clients derive the paths from the directories' `parentId`.
+
+Bookmarks written before paths were stored get them from `backfill_directory_paths`
+(/admin/jobs/backfill-directory-paths), a checkpointed scan (see src/jobs/checkpointed_scan.py) advanced by each call.
+"""
+
+BACKFILL_PAGE_SIZE = 500
+BACKFILL_JOB = "directory_paths_backfill"
+# Rewrites started over after a conflicting write, before giving up
+MOVE_ATTEMPTS = 5
+# Directories moved longer ago than this and still marked are repaired, the rewrite of a recent move may be running
+REPAIR_DELAY_SECONDS = 300
+REPAIR_BATCH_SIZE = 50
+
+
+def read_directories(user_id):
+    """Snapshots of the user's directories, including deleted ones, by ID."""
+    directories_query = db.collection(DIRECTORY_COLLECTION)\
+        .where("userId", "==", user_id)\
+        .select(["parentId", "ancestors", "isDeleted"])
+    return {snapshot.id: snapshot for snapshot in directories_query.stream()}
+
+
+def directory_chains(directories):
+    """
+    Ancestors of each directory of `directories` (by ID, see `read_directories`), root first, following the
+    current `parentId` links rather than the stored paths, which may wait for the rewrite of a move.
+    """
+    parents = {directory_id: snapshot.to_dict().get("parentId") for directory_id, snapshot in directories.items()}
+
+    def chain(directory_id):
+        path = []
+        parent_id = parents[directory_id]
+        # Stops at a parent that was purged, or at a cycle left by concurrent moves
+        while parent_id in parents and parent_id != directory_id and parent_id not in path:
+            path.append(parent_id)
+            parent_id = parents[parent_id]
+        return path[::-1]
+
+    return {directory_id: chain(directory_id) for directory_id in parents}
+
+
+def subtree_height(directory_id, chains, directories):
+    """Levels in the subtree of `directory_id`, 1 for a directory without live descendants."""
+    depths = [len(chain) - chain.index(directory_id) for descendant_id, chain in chains.items()
+              if directory_id in chain and not directories[descendant_id].to_dict().get("isDeleted")]
+    return 1 + max(depths, default=0)
+
+
+@background_job("directory_move")
+def move_directory_subtree(user_id, directory_id):
+    """
+    Rewrite the paths of `directory_id` and under it from the current `parentId` links, after it was moved.
+    Returns the count of bookmarks rewritten.
+    """
+    for attempt in range(MOVE_ATTEMPTS):
+        try:
+            return rewrite_subtree_paths(user_id, directory_id)
+        except FailedPrecondition:
+            # A concurrent move or bookmark update, read the links again
+            continue
+    raise RuntimeError(f"Directory {directory_id} kept changing, paths not rewritten after {MOVE_ATTEMPTS} attempts")
+
+
+def rewrite_subtree_paths(user_id, directory_id):
+    directories = read_directories(user_id)
+    if directory_id not in directories:
+        return 0
+    chains = directory_chains(directories)
+
+    # Every document is written, even if its path did not change, so a concurrent rewrite that read the links
+    # before this one fails its precondition instead of writing paths older than these
+    subtree = [subtree_id for subtree_id, chain in chains.items() if subtree_id == directory_id or directory_id in chain]
+    writes = [("update", directories[subtree_id].reference, {"ancestors": chains[subtree_id], "pathsDirtyAt": None},
+               db.write_option(last_update_time=directories[subtree_id].update_time))
+              for subtree_id in subtree]
+
+    # Bookmarks written before paths were stored can only be in the moved directory itself
+    bookmarks_query = db.collection(BOOKMARK_COLLECTION).where("userId", "==", user_id)
+    bookmarks = {}
+    for snapshot in bookmarks_query.where("directoryPath", "array_contains", directory_id).select(["directoryId"]).stream():
+        bookmarks[snapshot.id] = snapshot
+    for snapshot in bookmarks_query.where("directoryId", "==", directory_id).select(["directoryId"]).stream():
+        bookmarks.setdefault(snapshot.id, snapshot)
+    for snapshot in bookmarks.values():
+        bookmark_directory_id = snapshot.to_dict().get("directoryId")
+        path = chains[bookmark_directory_id] + [bookmark_directory_id] if bookmark_directory_id in chains else []
+        writes.append(("update", snapshot.reference, {"directoryPath": path},
+                       db.write_option(last_update_time=snapshot.update_time)))
+
+    commit_or_raise(writes)
+    bump_data_version(user_id)
+    return len(bookmarks)
+
+
+def move_directory_in_background(user_id, directory_id):
+    try:
+        moved = move_directory_subtree(user_id, directory_id)
+        print(f"✅ Moved directory {directory_id}, {moved} bookmarks rewritten")
+    except Exception as e:
+        print(f"❌ Error moving directory {directory_id}, left to the scheduled repair: {str(e)}")
+
+
+@background_job("directory_paths_repair")
+def repair_directory_paths(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Rewrite the paths under the directories whose rewrite did not complete after they were moved, oldest move first,
+    within the time budget. Returns the count of directories per outcome, those failing again stay marked.
+    """
+    cutoff = int(datetime.now(timezone.utc).timestamp()) - REPAIR_DELAY_SECONDS
+    outcomes = {"repaired": 0, "failed": 0}
+    dirty_query = db.collection(DIRECTORY_COLLECTION)\
+        .where("pathsDirtyAt", "<=", cutoff)\
+        .order_by("pathsDirtyAt")\
+        .limit(REPAIR_BATCH_SIZE)\
+        .select(["userId"])
+    with deadline_scope(budget_seconds) as repair_deadline:
+        for snapshot in dirty_query.stream():
+            if repair_deadline.remaining() < SCAN_MIN_PAGE_SECONDS:
+                break
+            try:
+                move_directory_subtree(snapshot.to_dict()["userId"], snapshot.id)
+                outcomes["repaired"] += 1
+            except Exception as e:
+                outcomes["failed"] += 1
+                print(f"❌ Error repairing the paths under directory {snapshot.id}: {str(e)}")
+    return outcomes
+
+
+@background_job("directory_paths_backfill")
+def backfill_directory_paths(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Write the paths of the bookmarks that do not have one yet, advanced from its checkpoint within the time budget.
+    Returns the scan job, the count of rewritten bookmarks is its "rewritten" outcome.
+    """
+    def backfill_page(snapshots):
+        legacy = [snapshot for snapshot in snapshots if "directoryPath" not in snapshot.to_dict()]
+        rewritten = write_bookmark_paths(legacy) if legacy else 0
+        for user_id in {snapshot.to_dict()["userId"] for snapshot in legacy}:
+            bump_data_version(user_id)
+        return len(snapshots), {"rewritten": rewritten}
+
+    bookmarks_query = db.collection(BOOKMARK_COLLECTION).select(["userId", "directoryId", "directoryPath"])
+    return run_checkpointed_scan(BACKFILL_JOB, bookmarks_query, BACKFILL_PAGE_SIZE, backfill_page, budget_seconds)
+
+
+def write_bookmark_paths(snapshots):
+    """
+    Write the paths of a page of bookmarks, reading their directories with one multi-document read. A bookmark
+    written since it was read is skipped, its write sets its path. Returns the count of rewritten bookmarks.
+    """
+    directory_ids = {snapshot.to_dict().get("directoryId") for snapshot in snapshots}
+    directories = get_documents([(DIRECTORY_COLLECTION, directory_id) for directory_id in directory_ids
+                                 if directory_id and directory_id != DEFAULT_DIRECTORY_NAME_AND_ID])
+    writes = []
+    for snapshot in snapshots:
+        directory = directories.get((DIRECTORY_COLLECTION, snapshot.to_dict().get("directoryId")))
+        writes.append(("update", snapshot.reference, {"directoryPath": directory_path_field(directory)},
+                       db.write_option(last_update_time=snapshot.update_time)))
+    return len(writes) - len(commit_conditional_writes(writes))
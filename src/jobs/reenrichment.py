@@ -0,0 +1,299 @@
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.job_model import JOB_COLLECTION, JOB_MODEL, JOB_ID_PREFIX, JOB_STATUS
+from src.utils.concurrency import run_concurrently
+from src.utils.metrics import background_job
+from src.utils.rate_limit import TokenBucket, HostSpacing
+from src.utils.resilience import deadline_scope, current_deadline
+from src.utils.routes_util import bump_data_version, fetch_bookmark_content, get_id, stream_pages, update_bookmark_fields
+from src.jobs.content_refresh import fetched_page_fields, now_timestamp, out_of_budget
+
+"""
+Bulk re-enrichment: fetches the pages of existing bookmarks again and generates their tags again, to apply a change
+of the extraction rules (`remove_unwanted_elements`) or of the tag prompt (`generate_prompt`) to them.
+
+A job (/admin/jobs/reenrichment) covers every bookmark, or those matching equality filters (REENRICH_FILTERS). It
+is advanced in runs of REENRICH_JOB_BUDGET_SECONDS, triggered by the scheduler through
+/admin/jobs/reenrichment/run. Bookmarks are read in document ID order, REENRICH_PAGE_SIZE at a time, and processed
+REENRICH_CONCURRENCY at a time, at most REENRICH_RATE_PER_SECOND per second and one per
+REENRICH_HOST_INTERVAL_SECONDS per host.
+
+After each page the job document records its cursor, the ID of the last bookmark processed with all the ones before
+it, so a run that crashes or runs out of time is resumed from there by the next one: at most a page is processed
+twice, which only regenerates the same fields. A run holds a lease on the job, so runs started concurrently do not
+process the same bookmarks.
+
+Like the content refresh, new tags are stored as suggestions (`generatedTags`), the bookmark tags are not changed.
+"""
+
+JOB_TYPE = "reenrichment"
+
+REENRICH_PAGE_SIZE = int(os.getenv("REENRICH_PAGE_SIZE", "50"))
+REENRICH_CONCURRENCY = int(os.getenv("REENRICH_CONCURRENCY", "4"))
+REENRICH_RATE_PER_SECOND = float(os.getenv("REENRICH_RATE_PER_SECOND", "2"))
+REENRICH_HOST_INTERVAL_SECONDS = float(os.getenv("REENRICH_HOST_INTERVAL_SECONDS", "2"))
+# Below the 60 seconds a serverless function may run
+REENRICH_JOB_BUDGET_SECONDS = float(os.getenv("REENRICH_JOB_BUDGET_SECONDS", "50"))
+# No bookmark is started with less than this left of the budget
+REENRICH_MIN_BOOKMARK_SECONDS = 5
+# A crashed run holds its job until then
+JOB_LEASE_SECONDS = int(REENRICH_JOB_BUDGET_SECONDS) + 30
+
+REENRICH_TAG_COUNT = 5
+# Fields a job may filter bookmarks on, with equality
+REENRICH_FILTERS = ("userId", "directoryId", "linkStatus", "isFavorite")
+
+COUNT_PAGE_SIZE = 1000
+# Users whose tags are kept during a run, bookmarks are read in document ID order across users
+CACHED_USER_TAGS = 64
+
+_rate_limiter = TokenBucket(REENRICH_RATE_PER_SECOND, burst=REENRICH_CONCURRENCY)
+_host_spacing = HostSpacing(REENRICH_HOST_INTERVAL_SECONDS)
+
+
+def matching_bookmarks(filters):
+    """Query of the live bookmarks matching a job's filters. Needs composite indexes with the filtered fields."""
+    query = db.collection(BOOKMARK_COLLECTION).where("isDeleted", "==", False)
+    for field, value in sorted(filters.items()):
+        query = query.where(field, "==", value)
+    return query
+
+
+def create_reenrichment_job(filters, refetch=True, regenerate=True):
+    """Create a job re-enriching the bookmarks matching `filters`, advanced by the next runs. Returns the job."""
+    if not isinstance(filters, dict):
+        raise ValueError("filter must be an object")
+    unknown = sorted(set(filters) - set(REENRICH_FILTERS))
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(unknown)}, must be among: {', '.join(REENRICH_FILTERS)}")
+    if not all(isinstance(value, (str, bool)) for value in filters.values()):
+        raise ValueError("Filter values must be strings or booleans")
+    if not refetch and not regenerate:
+        raise ValueError("At least one of refetch and regenerate must be true")
+
+    total = sum(1 for _ in stream_pages(matching_bookmarks(filters).select([]), COUNT_PAGE_SIZE))
+    time_now = now_timestamp()
+    job = JOB_MODEL.copy()
+    job.update({
+        "jobId": get_id(JOB_ID_PREFIX),
+        "type": JOB_TYPE,
+        "status": JOB_STATUS.RUNNING.value,
+        "filter": filters,
+        "options": {"refetch": bool(refetch), "regenerate": bool(regenerate)},
+        "total": total,
+        "outcomes": {},
+        "createdAt": time_now,
+        "updatedAt": time_now
+    })
+    db.collection(JOB_COLLECTION).document(job["jobId"]).set(job)
+    return job
+
+
+def job_progress(job, now=None):
+    """
+    The job with its `throughput`, bookmarks processed per second of running time, and `etaSeconds`, the time
+    left at the pace since the job was created, runs and the pauses between them included (None until known).
+    """
+    now = now or now_timestamp()
+    throughput = job["processed"] / job["elapsedSeconds"] if job["elapsedSeconds"] else 0
+    eta = None
+    if job["status"] != JOB_STATUS.RUNNING.value:
+        eta = 0
+    elif job["processed"] and now > job["createdAt"]:
+        pace = job["processed"] / (now - job["createdAt"])
+        eta = round(max(job["total"] - job["processed"], 0) / pace)
+    return {**job, "throughput": round(throughput, 3), "etaSeconds": eta}
+
+
+def claim_job(job_ref, now):
+    """Take the lease of a running job. Returns the job, None if it is not running or another run holds it."""
+    snapshot = job_ref.get()
+    job = snapshot.to_dict()
+    if not job or job["status"] != JOB_STATUS.RUNNING.value or job.get("leaseUntil", 0) > now:
+        return None
+    try:
+        job_ref.update({"leaseUntil": now + JOB_LEASE_SECONDS}, option=db.write_option(last_update_time=snapshot.update_time))
+    except FailedPrecondition:
+        # Taken by a concurrent run
+        return None
+    return job
+
+
+@background_job("reenrichment")
+def run_reenrichment_job(job_id, budget_seconds=REENRICH_JOB_BUDGET_SECONDS):
+    """
+    Advance a job from its checkpoint, within the time budget. Returns its progress (see `job_progress`), None if
+    it is not running or another run holds it.
+    """
+    started_at = time.monotonic()
+    job_ref = db.collection(JOB_COLLECTION).document(job_id)
+    job = claim_job(job_ref, now_timestamp())
+    if job is None:
+        return None
+    elapsed_before = job["elapsedSeconds"]
+    user_tags = OrderedDict()  # {user ID: tags}
+    released = {"leaseUntil": 0}
+
+    try:
+        with deadline_scope(budget_seconds) as job_deadline:
+            page_query = matching_bookmarks(job["filter"]).order_by("__name__").limit(REENRICH_PAGE_SIZE)
+            while job_deadline.remaining() >= REENRICH_MIN_BOOKMARK_SECONDS:
+                # Cancelled since the run started
+                if job_ref.get().to_dict()["status"] != JOB_STATUS.RUNNING.value:
+                    break
+                query = page_query.start_after({"__name__": job["cursor"]}) if job["cursor"] else page_query
+                snapshots = list(query.stream())
+                if not snapshots:
+                    job["status"] = released["status"] = JOB_STATUS.COMPLETED.value
+                    job["completedAt"] = released["completedAt"] = now_timestamp()
+                    break
+
+                outcomes = reenrich_page(snapshots, job["options"], user_tags)
+                # The bookmarks after the first one not processed are processed again by the next run
+                done = next((index for index, outcome in enumerate(outcomes) if outcome is None), len(outcomes))
+                for outcome in outcomes[:done]:
+                    job["outcomes"][outcome] = job["outcomes"].get(outcome, 0) + 1
+                if done:
+                    job["processed"] += done
+                    job["cursor"] = snapshots[done - 1].id
+                job["elapsedSeconds"] = round(elapsed_before + time.monotonic() - started_at, 3)
+                job["updatedAt"] = now_timestamp()
+                job_ref.update({field: job[field] for field in ("cursor", "processed", "outcomes", "elapsedSeconds", "updatedAt")})
+
+                for user_id in {snapshot.to_dict()["userId"] for snapshot, outcome in zip(snapshots, outcomes) if outcome == "updated"}:
+                    bump_data_version(user_id)
+                if done < len(snapshots):
+                    break
+    except Exception as e:
+        job["lastError"] = released["lastError"] = str(e)
+        print(f"❌ Error running re-enrichment job {job_id}: {str(e)}")
+    finally:
+        job["elapsedSeconds"] = released["elapsedSeconds"] = round(elapsed_before + time.monotonic() - started_at, 3)
+        job["leaseUntil"] = 0
+        job_ref.update(released)
+    return job_progress(job)
+
+
+def run_reenrichment_jobs(budget_seconds=REENRICH_JOB_BUDGET_SECONDS):
+    """Advance the running jobs, oldest first, within the time budget. Returns the progress of the jobs advanced."""
+    started_at = time.monotonic()
+    jobs_query = db.collection(JOB_COLLECTION)\
+        .where("type", "==", JOB_TYPE)\
+        .where("status", "==", JOB_STATUS.RUNNING.value)
+    jobs = sorted((snapshot.to_dict() for snapshot in jobs_query.stream()), key=lambda job: job["createdAt"])
+
+    progress = []
+    for job in jobs:
+        remaining = budget_seconds - (time.monotonic() - started_at)
+        if remaining < REENRICH_MIN_BOOKMARK_SECONDS:
+            break
+        job_progress_ = run_reenrichment_job(job["jobId"], remaining)
+        if job_progress_ is not None:
+            progress.append(job_progress_)
+    return progress
+
+
+def reenrich_page(snapshots, options, user_tags):
+    """Re-enrich a page of bookmarks, returns their outcomes in order, None for those not processed in time."""
+    outcomes = [None] * len(snapshots)
+    pending = list(range(len(snapshots)))
+    while pending and current_deadline().remaining() >= REENRICH_MIN_BOOKMARK_SECONDS:
+        # Next bookmarks whose host was not called too recently, the others wait for a later round
+        round_, waiting = [], []
+        for index in pending:
+            host = urlparse(snapshots[index].to_dict()["url"]).hostname or ""
+            # Hosts are only called when pages are fetched again
+            if len(round_) < REENRICH_CONCURRENCY and (not options["refetch"] or _host_spacing.try_reserve(host)):
+                round_.append(index)
+            else:
+                waiting.append(index)
+        pending = waiting
+        if not round_:
+            time.sleep(min(REENRICH_HOST_INTERVAL_SECONDS, current_deadline().remaining()))
+            continue
+
+        # Read on this thread, the cache is not shared with the calls
+        round_tags = {}
+        if options["regenerate"]:
+            round_tags = {user_id: cached_user_tags(user_id, user_tags)
+                          for user_id in {snapshots[index].to_dict()["userId"] for index in round_}}
+        results = run_concurrently(*[
+            lambda index=index: reenrich_bookmark_or_defer(snapshots[index], options, round_tags) for index in round_
+        ])
+        for index, outcome in zip(round_, results):
+            outcomes[index] = outcome
+    return outcomes
+
+
+def reenrich_bookmark_or_defer(snapshot, options, round_tags):
+    # None: not processed in this run
+    if not _rate_limiter.acquire(timeout=max(current_deadline().remaining() - REENRICH_MIN_BOOKMARK_SECONDS, 0)):
+        return None
+    try:
+        return reenrich_bookmark(snapshot, options, round_tags.get(snapshot.to_dict()["userId"], []))
+    except Exception as e:
+        if out_of_budget(e):
+            return None
+        print(f"❌ Error re-enriching {snapshot.id}: {str(e)}")
+        return "error"
+
+
+def cached_user_tags(user_id, user_tags):
+    """The user's live tags, read once per run for the users of the last CACHED_USER_TAGS bookmarks."""
+    if user_id in user_tags:
+        user_tags.move_to_end(user_id)
+        return user_tags[user_id]
+    tags = [tag.to_dict() for tag in db.collection(TAG_COLLECTION).where("userId", "==", user_id).stream()]
+    user_tags[user_id] = [tag for tag in tags if not tag.get("isDeleted")]
+    if len(user_tags) > CACHED_USER_TAGS:
+        user_tags.popitem(last=False)
+    return user_tags[user_id]
+
+
+def reenrich_bookmark(snapshot, options, user_tags):
+    """
+    Fetch the page of a bookmark again and/or generate its tags again, per the job `options`, with the user's live
+    tags. Returns the outcome:
+    "updated" (its title or generated tags changed), "unchanged", "skipped" (edited or deleted meanwhile) or "error".
+    """
+    # Imported on first use, like in the enrichment
+    from src.utils.tagGeneration.fetch_page_content import fetch_page_content, hash_page_content
+    from src.utils.tagGeneration.generate_tags import generate_tags
+
+    bookmark = snapshot.to_dict()
+    content = fetch_bookmark_content(snapshot.id, bookmark)
+    title = bookmark.get("title", "")
+    page_text = content["fetchedContent"]
+    fields = {}
+
+    if options["refetch"]:
+        page_content = fetch_page_content(bookmark["url"])
+        if page_content["status"] != 200:
+            print(f"⚠️ Could not fetch {bookmark['url']} again: HTTP {page_content['status']}")
+            return "error"
+        fields.update(fetched_page_fields(page_content, hash_page_content(page_content)))
+        if not title:
+            title = fields["title"] = page_content["title"]
+        page_text = page_content["content"]
+
+    if options["regenerate"]:
+        fields["generatedTags"] = generate_tags(REENRICH_TAG_COUNT, bookmark["url"], title, page_text,
+                                                user_tags)
+        fields["tagsGeneratedAt"] = now_timestamp()
+
+    # Only what clients show makes the bookmark updated (and the user's listings refetched)
+    changed = "title" in fields or fields.get("generatedTags", content["generatedTags"]) != content["generatedTags"]
+    if changed:
+        fields["updatedAt"] = now_timestamp()
+    try:
+        # Fetching and generating take seconds: a bookmark edited, deleted or purged since it was read is left as is
+        update_bookmark_fields(snapshot.reference, fields, option=db.write_option(last_update_time=snapshot.update_time))
+    except (FailedPrecondition, NotFound):
+        return "skipped"
+    return "updated" if changed else "unchanged"
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.utils.metrics import background_job
+from src.utils.routes_util import bump_data_version
+from src.jobs.bookmark_names import commit_conditional_writes
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS
+
+"""
+Stamps the documents written before every write set an integer `updatedAt` (the model default is "", and some were
+written without it) with the time of the backfill.
+
+Delta sync (/sync?since=<token>) and the trash purge query `updatedAt` as a number: a tag or directory without one
+is never returned as changed, so a client missing it, or its deletion, never gets it, and its tombstone is never
+purged. Once stamped, the document is returned once more to the clients syncing, which is harmless since sync is
+idempotent. Run through /admin/jobs/backfill-updated-at, a checkpointed scan (see src/jobs/checkpointed_scan.py)
+per collection advanced by each call.
+"""
+
+BACKFILL_PAGE_SIZE = 500
+# Collections returned by /sync
+SYNCED_COLLECTIONS = (TAG_COLLECTION, DIRECTORY_COLLECTION, BOOKMARK_COLLECTION)
+
+
+def has_sync_timestamp(document):
+    updated_at = document.get("updatedAt")
+    return isinstance(updated_at, (int, float)) and not isinstance(updated_at, bool)
+
+
+@background_job("updated_at_backfill")
+def backfill_updated_at(collection, budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Stamp the documents of `collection` (one of SYNCED_COLLECTIONS) without a numeric `updatedAt`, advanced from
+    its checkpoint within the time budget. Returns the scan job, the count of stamped documents is its "stamped"
+    outcome.
+    """
+    if collection not in SYNCED_COLLECTIONS:
+        raise ValueError(f"Invalid collection: {collection}. Must be one of {', '.join(SYNCED_COLLECTIONS)}")
+
+    def stamp_page(snapshots):
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        legacy = [snapshot for snapshot in snapshots if not has_sync_timestamp(snapshot.to_dict())]
+        # A document written since it was read got its timestamp from that write
+        writes = [("update", snapshot.reference, {"updatedAt": time_now},
+                   db.write_option(last_update_time=snapshot.update_time)) for snapshot in legacy]
+        stamped = len(writes) - len(commit_conditional_writes(writes))
+        for user_id in {snapshot.to_dict().get("userId") for snapshot in legacy} - {None}:
+            bump_data_version(user_id)
+        return len(snapshots), {"stamped": stamped}
+
+    documents_query = db.collection(collection).select(["userId", "updatedAt"])
+    return run_checkpointed_scan(f"updated_at_backfill_{collection}", documents_query, BACKFILL_PAGE_SIZE,
+                                 stamp_page, budget_seconds)
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION, TAG_CREATOR
+from src.models.user_model import USER_COLLECTION
+from src.utils.concurrency import run_concurrently
+from src.utils.metrics import background_job
+from src.utils.resilience import current_deadline
+from src.utils.routes_util import bump_data_version, get_tag_id, normalize_tag_name
+from src.jobs.bookmark_names import commit_or_raise, propagate_tag_rename
+from src.jobs.checkpointed_scan import run_checkpointed_scan, SCAN_JOB_BUDGET_SECONDS, SCAN_MIN_PAGE_SECONDS
+
+"""
+Moves bookmarks from tags to another tag, when a tag gets a new ID: tag IDs are derived from the user and the
+normalized tag name (see `get_tag_id`), so renaming a tag moves it to the ID of its new name, merging it into the
+tag already there if any.
+
+Merging tags (/tag/merge) moves their bookmarks the same way.
+
+`migrate_tag_ids` (/admin/jobs/migrate-tag-ids) moves the tags created before IDs were derived from names, merging
+the tags whose names only differ in case or spacing ("ML" and "ml") and duplicates created by concurrent requests.
+It is a checkpointed scan of the users (see src/jobs/checkpointed_scan.py), advanced by each call.
+"""
+
+# Users are migrated one at a time, a page is cut short when the time budget runs out
+USERS_PAGE_SIZE = 50
+TAG_MIGRATION_JOB = "tag_id_migration"
+
+
+def find_tag_references(user_id, tag_ids, limit=None):
+    """
+    The user's bookmarks having any of `tag_ids`, without duplicates, with their `tagNames`. With `limit`, at most
+    `limit` bookmarks are read per tag: the result is complete only while it has fewer than `limit` bookmarks.
+    """
+    def query(tag_id):
+        bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", user_id)\
+            .where("tags", "array_contains", tag_id)\
+            .select(["tagNames"])
+        if limit is not None:
+            bookmarks_query = bookmarks_query.limit(limit)
+        return list(bookmarks_query.stream())
+
+    snapshots = {}
+    for tag_snapshots in run_concurrently(*(lambda tag_id=tag_id: query(tag_id) for tag_id in tag_ids)):
+        for snapshot in tag_snapshots:
+            snapshots.setdefault(snapshot.reference.path, snapshot)
+    return list(snapshots.values())
+
+
+@background_job("tag_move")
+def move_tag_references(user_id, from_tags, to_tag_id, to_tag_name, snapshots=None):
+    """
+    Replace the tags of `from_tags` ({tag ID: tag name}) with `to_tag_id` in the tags of the user's bookmarks, and
+    their names. `snapshots` are the bookmarks to move, found with `find_tag_references` if not given. Returns the
+    count of bookmarks moved.
+
+    Written as array transforms in chunked batches, in two passes adding the new tag then removing the old ones, so
+    tags added or removed by the user meanwhile are kept.
+    """
+    if snapshots is None:
+        snapshots = find_tag_references(user_id, list(from_tags))
+    time_now = int(datetime.now(timezone.utc).timestamp())
+    # Duplicates of one name share it, it is already right
+    removed_names = [name for name in dict.fromkeys(from_tags.values()) if name != to_tag_name]
+
+    additions, removals = [], []
+    for snapshot in snapshots:
+        has_names = "tagNames" in snapshot.to_dict()
+        added = {"tags": firestore.ArrayUnion([to_tag_id]), "updatedAt": time_now}
+        removed = {"tags": firestore.ArrayRemove(list(from_tags))}
+        if has_names:
+            added["tagNames"] = firestore.ArrayUnion([to_tag_name])
+            if removed_names:
+                removed["tagNames"] = firestore.ArrayRemove(removed_names)
+        additions.append(("update", snapshot.reference, added))
+        removals.append(("update", snapshot.reference, removed))
+    commit_or_raise(additions)
+    commit_or_raise(removals)
+
+    if snapshots:
+        bump_data_version(user_id)
+    return len(snapshots)
+
+
+def move_tag_in_background(user_id, from_tags, to_tag_id, to_tag_name, renamed_tag=False, snapshots=None):
+    """
+    Move the bookmarks of renamed or merged tags. `renamed_tag` if the tag moved to got a new name too, its other
+    bookmarks are then rewritten with it.
+    """
+    try:
+        moved = move_tag_references(user_id, from_tags, to_tag_id, to_tag_name, snapshots)
+        print(f"✅ Moved {moved} bookmarks from tags {', '.join(from_tags)} to {to_tag_id}")
+        if renamed_tag:
+            propagate_tag_rename(user_id, to_tag_id)
+    except Exception as e:
+        print(f"❌ Error moving bookmarks from tags {', '.join(from_tags)} to {to_tag_id}: {str(e)}")
+
+
+@background_job("tag_merge")
+def merge_tags(user_id, from_tags, to_tag_id, to_tag_name, snapshots=None):
+    """
+    Move the bookmarks of the tags of `from_tags` ({tag ID: tag name}) to `to_tag_id`, then delete those tags.
+    Returns the count of bookmarks moved.
+    """
+    moved = move_tag_references(user_id, from_tags, to_tag_id, to_tag_name, snapshots)
+    # The tombstones let delta-sync clients drop the merged tags
+    time_now = int(datetime.now(timezone.utc).timestamp())
+    commit_or_raise([("update", db.collection(TAG_COLLECTION).document(from_tag_id), {"isDeleted": True, "updatedAt": time_now})
+                     for from_tag_id in from_tags])
+    bump_data_version(user_id)
+    return moved
+
+
+def merge_tags_in_background(user_id, from_tags, to_tag_id, to_tag_name, snapshots=None):
+    try:
+        moved = merge_tags(user_id, from_tags, to_tag_id, to_tag_name, snapshots)
+        print(f"✅ Merged tags {', '.join(from_tags)} into {to_tag_id}, {moved} bookmarks moved")
+    except Exception as e:
+        print(f"❌ Error merging tags {', '.join(from_tags)} into {to_tag_id}: {str(e)}")
+
+
+def canonical_tag(tags, tag_id):
+    """The tag a group of tags of the same name is merged into: the one at `tag_id`, else the oldest live one."""
+    live = [tag for tag in tags if not tag.get("isDeleted")]
+    for tag in live:
+        if tag["tagId"] == tag_id:
+            return tag
+    return min(live, key=lambda tag: (tag.get("createdAt") or 0, tag["tagId"]))
+
+
+def migrate_user_tags(user_id, time_now):
+    """Move the tags of a user to the IDs of their names. Returns (tags moved, bookmarks moved)."""
+    tags = [snapshot.to_dict() for snapshot in db.collection(TAG_COLLECTION).where("userId", "==", user_id).stream()]
+    groups = defaultdict(list)  # {normalized name: tags}
+    for tag in tags:
+        if tag.get("tagName", "").strip():
+            groups[normalize_tag_name(tag["tagName"])].append(tag)
+
+    moved_tags = moved_bookmarks = 0
+    for group in groups.values():
+        tag_id = get_tag_id(user_id, group[0]["tagName"])
+        if all(tag["tagId"] == tag_id or tag.get("isDeleted") for tag in group):
+            continue
+
+        target = canonical_tag(group, tag_id)
+        if target["tagId"] != tag_id:
+            target = {**target, "tagId": tag_id, "updatedAt": time_now}
+            if any(tag.get("creator") == TAG_CREATOR.USER.value for tag in group):
+                target["creator"] = TAG_CREATOR.USER.value
+            db.collection(TAG_COLLECTION).document(tag_id).set(target)
+
+        from_tags = {tag["tagId"]: tag["tagName"] for tag in group if tag["tagId"] != tag_id and not tag.get("isDeleted")}
+        moved_bookmarks += merge_tags(user_id, from_tags, tag_id, target["tagName"])
+        moved_tags += len(from_tags)
+    return moved_tags, moved_bookmarks
+
+
+@background_job("tag_id_migration")
+def migrate_tag_ids(budget_seconds=SCAN_JOB_BUDGET_SECONDS):
+    """
+    Move the users' tags to the IDs derived from their names, advanced from its checkpoint within the time budget.
+    Tags already at their ID are skipped. Returns the scan job, its outcomes count the users, tags and bookmarks
+    moved.
+    """
+    time_now = int(datetime.now(timezone.utc).timestamp())
+
+    def migrate_page(snapshots):
+        counts = {"users": 0, "tags": 0, "bookmarks": 0}
+        for done, snapshot in enumerate(snapshots):
+            if current_deadline().remaining() < SCAN_MIN_PAGE_SECONDS:
+                return done, counts
+            moved_tags, moved_bookmarks = migrate_user_tags(snapshot.id, time_now)
+            if moved_tags:
+                counts["users"] += 1
+                counts["tags"] += moved_tags
+                counts["bookmarks"] += moved_bookmarks
+        return len(snapshots), counts
+
+    return run_checkpointed_scan(TAG_MIGRATION_JOB, db.collection(USER_COLLECTION).select([]), USERS_PAGE_SIZE,
+                                 migrate_page, budget_seconds)
@@ -0,0 +1,75 @@
+import os
+import time
+from datetime import datetime, timezone
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.utils.metrics import background_job
+from src.utils.rate_limit import TokenBucket
+from src.utils.routes_util import bookmark_content_ref, commit_writes, BATCH_WRITE_LIMIT
+
+"""
+Purge of soft-deleted bookmarks, directories and tags.
+
+Deletes only mark documents with `isDeleted` (and `deletedAt`): deleted bookmarks and directories stay in the trash
+(/trash) where they can be restored, and the tombstones tell delta-sync clients (/sync) to drop them. After
+TOMBSTONE_RETENTION_SECONDS without update the documents are deleted for good, so listings, indexes and the count
+scans do not carry them forever. Clients that did not sync for longer than that could miss deletions, /sync tells
+them to sync in full (`resetRequired`).
+
+Runs are triggered by the scheduler through /admin/jobs/purge-trash. Deletes are committed in batches, at most
+PURGE_BATCHES_PER_SECOND, to stay well under the write quotas; what is left when the time budget of the run is
+spent is purged by the next one.
+"""
+
+TOMBSTONE_RETENTION_SECONDS = int(os.getenv("TRASH_RETENTION_DAYS", "30")) * 24 * 60 * 60
+PURGE_BATCHES_PER_SECOND = float(os.getenv("PURGE_BATCHES_PER_SECOND", "2"))
+# Time budget of one run, under the duration limit of the serverless function
+PURGE_JOB_BUDGET_SECONDS = float(os.getenv("PURGE_JOB_BUDGET_SECONDS", "50"))
+
+PURGED_COLLECTIONS = (BOOKMARK_COLLECTION, DIRECTORY_COLLECTION, TAG_COLLECTION)
+
+
+def purge_deletes(collection, snapshots):
+    """Writes deleting the documents of `snapshots`, with the content subdocuments of bookmarks."""
+    writes = []
+    for snapshot in snapshots:
+        writes.append(("delete", snapshot.reference, None))
+        if collection == BOOKMARK_COLLECTION:
+            writes.append(("delete", bookmark_content_ref(snapshot.id), None))
+    return writes
+
+
+@background_job("trash_purge")
+def purge_expired_tombstones(budget_seconds=PURGE_JOB_BUDGET_SECONDS):
+    """
+    Delete the documents soft-deleted more than TOMBSTONE_RETENTION_SECONDS ago, within the time budget. Returns
+    the count of purged documents per collection.
+    """
+    give_up_at = time.monotonic() + budget_seconds
+    cutoff = int(datetime.now(timezone.utc).timestamp()) - TOMBSTONE_RETENTION_SECONDS
+    batches = TokenBucket(PURGE_BATCHES_PER_SECOND)
+    purged = dict.fromkeys(PURGED_COLLECTIONS, 0)
+
+    for collection in PURGED_COLLECTIONS:
+        # Bookmarks are deleted with their content subdocument, two writes each
+        page_size = BATCH_WRITE_LIMIT // 2 if collection == BOOKMARK_COLLECTION else BATCH_WRITE_LIMIT
+        # Documents are deleted as they are found, each page is the first of what is left
+        expired_query = db.collection(collection)\
+            .where("isDeleted", "==", True)\
+            .where("updatedAt", "<", cutoff)\
+            .select([])\
+            .limit(page_size)
+        while True:
+            snapshots = list(expired_query.stream())
+            if not snapshots:
+                break
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0 or not batches.acquire(timeout=remaining):
+                return purged
+            errors = [error for error in commit_writes(purge_deletes(collection, snapshots)) if error is not None]
+            if errors:
+                raise errors[0]
+            purged[collection] += len(snapshots)
+    return purged
@@ -1,5 +1,15 @@
+from enum import Enum
 from src.models.directory_model import DEFAULT_DIRECTORY_NAME_AND_ID
 
+"""
+Enum to define whether the bookmarked page is still reachable, as of its last fetch (see src/jobs/content_refresh.py).
+"""
+class LINK_STATUS(Enum):
+    UNKNOWN = ""  # Not fetched yet
+    OK = "ok"
+    GONE = "gone"  # 404 or 410, the page was removed
+    ERROR = "error"  # Any other failure, may be temporary
+
 BOOKMARK_COLLECTION = "bookmarks"
 BOOKMARK_ID_PREFIX = "bookmark"
 
@@ -8,15 +18,41 @@ BOOKMARK_MODEL = {
     "userId": "", # Required
     "url": "", # Required
     "imageUrl": "",
+    "thumbnailHash": "",  # Thumbnails of imageUrl, see src/utils/thumbnails.py
     "title": "",
     "notes": "",
     "tags": [],
+    "tagNames": [],  # Names of the tags, kept in sync on writes and tag renames, see src/jobs/bookmark_names.py
     "directoryId": DEFAULT_DIRECTORY_NAME_AND_ID,  # Default directory
+    "directoryName": DEFAULT_DIRECTORY_NAME_AND_ID,
+    "directoryPath": [],  # IDs of the directory and its ancestors, root first (empty in the default directory)
     "createdAt": "",
     "updatedAt": "",
     "isDeleted": False,  # for now, implementing soft delete, "isDeleted": True, means it will not show up.
+    "deletedAt": "",  # In the trash since, purged after the retention (see src/jobs/trash_purge.py)
     "isFavorite": False,
 
-    "fetchedContent": "",
-    "generatedTags": "",
-}
\ No newline at end of file
+    "enrichmentFallbacks": [],  # Enrichment steps ("content", "tags", "thumbnail") that fell back or were skipped
+
+    # Content refresh, see src/jobs/content_refresh.py
+    "linkStatus": LINK_STATUS.UNKNOWN,
+    "contentEtag": "",  # Validators of the fetched page, sent back to revalidate it
+    "contentLastModified": "",
+    "contentHash": "",  # Hash of the extracted title, content and image
+    "lastCheckedAt": "",
+    "nextCheckAt": "",
+    "refreshInterval": "",  # Seconds between two checks, grows while the page does not change
+}
+
+"""
+Heavy enrichment data of a bookmark, kept out of the bookmark document in its subdocument
+bookmarks/{bookmarkId}/content/enrichment: listings and writes of bookmarks do not read or rewrite it.
+"""
+BOOKMARK_CONTENT_COLLECTION = "content"
+BOOKMARK_CONTENT_DOCUMENT = "enrichment"
+
+BOOKMARK_CONTENT_MODEL = {
+    "fetchedContent": "",  # Text extracted from the page
+    "generatedTags": [],  # Tags suggested for the page
+    "tagsGeneratedAt": "",
+}
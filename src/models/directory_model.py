@@ -3,12 +3,19 @@ DIRECTORY_ID_PREFIX = "directory"
 
 DEFAULT_DIRECTORY_NAME_AND_ID = "uncategorized"
 
+# Directories nest at most this deep, a top-level directory is at depth 1
+MAX_DIRECTORY_DEPTH = 16
+
 DIRECTORY_MODEL = {
     "directoryId": "",  # Required
     "userId": "",  # Required
     "name": "",  # Required (e.g., "Work", "Personal")
+    "parentId": None,  # None for a top-level directory
+    "ancestors": [],  # IDs of the parent directories, root first
+    "pathsDirtyAt": None,  # Moved at, until the paths under it are rewritten (see src/jobs/directory_tree.py)
     "createdAt": "",
     "updatedAt": "",
     "isDeleted": False,  # Soft delete support,
+    "deletedAt": "",  # In the trash since, purged after the retention (see src/jobs/trash_purge.py)
     "isModifiable": True # Uncategorized should not be deleted/edited
 }
@@ -0,0 +1,31 @@
+from enum import Enum
+
+"""
+Enum to define the state of a bulk job. A job runs in slices, each one resuming from the checkpoint of the last.
+"""
+class JOB_STATUS(Enum):
+    RUNNING = "running"  # Not done yet, advanced by the next run
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+JOB_COLLECTION = "jobs"
+
+JOB_ID_PREFIX = "job"
+
+JOB_MODEL = {
+    "jobId": "",  # Required
+    "type": "",  # Required (e.g., "reenrichment")
+    "status": JOB_STATUS.RUNNING,
+    "filter": {},  # Equality filters on the bookmarks processed (e.g., {"userId": "..."})
+    "options": {},
+    "cursor": None,  # ID of the last bookmark processed, bookmarks are processed in document ID order
+    "total": 0,  # Bookmarks matching the filter when the job was created
+    "processed": 0,
+    "outcomes": {},  # Count of processed bookmarks per outcome
+    "elapsedSeconds": 0,  # Time spent running, for the throughput
+    "leaseUntil": 0,  # A run holds the job until then, a crashed run releases it when it passes
+    "lastError": "",
+    "createdAt": "",
+    "updatedAt": "",
+    "completedAt": ""
+}
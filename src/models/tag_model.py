@@ -15,5 +15,8 @@ TAG_MODEL = {
     "tagId": "", # Required.
     "tagName": "", # Required.
     "creator": TAG_CREATOR.USER, # Setting the default creator as user.
-    "userId": "" # Required.
+    "userId": "", # Required.
+    "createdAt": "",
+    "updatedAt": "",
+    "isDeleted": False # Soft delete, kept as a tombstone so delta-sync clients see the deletion.
 }
\ No newline at end of file
@@ -8,5 +8,6 @@ USER_MODEL = {
     "email": "", # Required
     "avatarUrl": "",
     "createdAt": "", # Set by service code.
-    "updatedAt": "" # Set by service code.
+    "updatedAt": "", # Set by service code.
+    "dataVersion": 0 # Bumped on every write to the user's bookmarks, tags or directories. Used for ETags.
 }
\ No newline at end of file
@@ -0,0 +1,16 @@
+from src.services.async_routes.bookmark_routes import bookmark_routes
+from src.services.async_routes.tag_routes import tag_routes
+from src.services.async_routes.directory_routes import directory_routes
+from src.services.async_routes.sync_routes import sync_routes
+from src.services.async_routes.event_routes import event_routes
+
+"""
+Async handlers of the ASGI serving mode (see asgi.py). They cover the I/O bound read paths, tag generation and
+the events stream; every other API is served by the Flask app, which the ASGI app falls back to.
+"""
+
+def build_async_routes(prefix="/api"):
+    routes = []
+    for async_routes in (bookmark_routes, tag_routes, directory_routes, sync_routes, event_routes):
+        routes += async_routes.build(prefix)
+    return routes
@@ -0,0 +1,202 @@
+from src.utils.init import async_db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DEFAULT_DIRECTORY_NAME_AND_ID
+from src.utils.routes_util import parse_list_param, parse_bool_param, parse_pagination, resolve_bookmark_names, needs_name_maps, subtree_bookmarks_queries
+from src.utils.async_routes_util import AsyncRoutes, json_response, authorize_user, conditional_get, stream_dicts, fetch_name_maps, fetch_bookmarks_with_names, fetch_bookmark
+from src.utils.tag_index import TagIndex, MATCH_TYPE_AND, lookup_tag_index, store_tag_index
+
+# Async counterparts of the read routes of src/services/routes/bookmark_routes.py
+bookmark_routes = AsyncRoutes()
+
+"""
+API to get a bookmark given bookmark_id, see the Flask route for the parameters.
+"""
+@bookmark_routes.route("/bookmark/get/<bookmark_id>", methods=["GET"])
+@authorize_user
+async def get_bookmark(request, bookmark_id):
+    try:
+        include_content = parse_bool_param(request.query_params.get("includeContent"))
+        snapshot, content = await fetch_bookmark(bookmark_id, include_content)
+        bookmark = snapshot.to_dict()
+        if bookmark and include_content:
+            bookmark.update(content)
+
+        if not bookmark or bookmark.get("isDeleted"):
+            return json_response({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}, 404)
+
+        if bookmark["userId"] != request.state.user_id:
+            return json_response({"error": f"User unauthorized to get bookmark with bookmark_id: {bookmark_id}"}, 403)
+
+        return json_response({
+            "message": "success",
+            "data": {
+                "bookmark": bookmark,
+                "updateTime": snapshot.update_time.rfc3339()
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+"""
+API to get all bookmarks of a user.
+"""
+@bookmark_routes.route("/bookmark/all", methods=["GET"])
+@authorize_user
+@conditional_get
+async def fetch_all_bookmarks(request):
+    try:
+        bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", request.state.user_id)\
+            .where("isDeleted", "==", False)
+
+        bookmarks = await fetch_bookmarks_with_names(bookmarks_query, request.state.user_id)
+
+        return json_response({
+            "message": "success fetching all bookmarks of user",
+            "data": {
+                "bookmarks": bookmarks
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+"""
+API to get bookmarks matching several tags at once, see the Flask route for the parameters.
+"""
+@bookmark_routes.route("/bookmark/filter-by-tags", methods=["GET"])
+@authorize_user
+@conditional_get
+async def filter_bookmarks_by_tags(request):
+    try:
+        args = request.query_params
+        tag_ids = parse_list_param(args.get("tags"))
+        exclude_tag_ids = parse_list_param(args.get("exclude"))
+        match_type = args.get("match_type", MATCH_TYPE_AND).upper()
+        directory_id = args.get("directoryId")
+        favorite = parse_bool_param(args.get("favorite"))
+        offset, limit = parse_pagination(args)
+        user_id, data_version = request.state.user_id, request.state.data_version
+
+        async def load_tag_index():
+            # The index only changes when the user's data version changes, shared with the Flask route
+            tag_index = lookup_tag_index(user_id, data_version)
+            if tag_index is None:
+                bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+                    .where("userId", "==", user_id)\
+                    .where("isDeleted", "==", False)
+                tag_index = TagIndex(await stream_dicts(bookmarks_query))
+                store_tag_index(user_id, data_version, tag_index)
+            return tag_index
+
+        tag_index = await load_tag_index()
+        mask = tag_index.match(
+            tag_ids,
+            match_type=match_type,
+            exclude_tag_ids=exclude_tag_ids,
+            directory_id=directory_id,
+            favorite=favorite
+        )
+        bookmarks = tag_index.page(mask, offset, limit)
+
+        # Only bookmarks written before the names were denormalized need the user's tags and directories
+        tag_map = directory_map = None
+        if needs_name_maps(bookmarks):
+            tag_map, directory_map = await fetch_name_maps(user_id)
+
+        # Resolve names on a copy, the index keeps tag IDs
+        bookmarks = resolve_bookmark_names([dict(bookmark) for bookmark in bookmarks], tag_map, directory_map)
+
+        return json_response({
+            "message": "success filtering bookmarks by tags",
+            "data": {
+                "bookmarks": bookmarks,
+                "total": mask.bit_count(),
+                "offset": offset,
+                "limit": limit
+            }
+        }, 200)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+@bookmark_routes.route("/bookmark/tag/<tag_id>", methods=["GET"])
+@authorize_user
+@conditional_get
+async def get_bookmarks_by_tagId(request, tag_id):
+    try:
+        bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", request.state.user_id)\
+            .where("tags", "array_contains", tag_id)\
+            .where("isDeleted", "==", False)
+
+        bookmarks = await fetch_bookmarks_with_names(bookmarks_query, request.state.user_id)
+
+        return json_response({
+            "message": f"success fetching bookmarks with tagId: {tag_id}",
+            "data": {
+                "bookmarks": bookmarks
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+@bookmark_routes.route("/bookmark/directory/<directory_id>", methods=["GET"])
+@authorize_user
+@conditional_get
+async def get_bookmarks_by_directoryId(request, directory_id):
+    try:
+        bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", request.state.user_id)\
+            .where("isDeleted", "==", False)
+        if parse_bool_param(request.query_params.get("includeDescendants")):
+            bookmarks_query = subtree_bookmarks_queries(bookmarks_query, directory_id)
+        else:
+            bookmarks_query = bookmarks_query.where("directoryId", "==", directory_id)
+
+        bookmarks = await fetch_bookmarks_with_names(bookmarks_query, request.state.user_id)
+
+        return json_response({
+            "message": f"success fetching bookmarks with directory_id: {directory_id}",
+            "data": {
+                "bookmarks": bookmarks
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+@bookmark_routes.route("/bookmark/filter/<filter_type>", methods=["GET"])
+@authorize_user
+@conditional_get
+async def get_bookmarks_by_filterType(request, filter_type):
+    try:
+        bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", request.state.user_id)\
+            .where("isDeleted", "==", False)
+
+        if filter_type == "favorite":
+            bookmarks_query = bookmarks_query.where("isFavorite", "==", True)
+        elif filter_type == "with_notes":
+            bookmarks_query = bookmarks_query.where("notes", "!=", "")
+        elif filter_type == "without_tags":
+            bookmarks_query = bookmarks_query.where("tags", "==", [])
+        elif filter_type == "uncategorized":
+            bookmarks_query = bookmarks_query.where("directoryId", "==", DEFAULT_DIRECTORY_NAME_AND_ID)
+        elif filter_type != "all":
+            return json_response({"error": f"Invalid filter type: {filter_type}"}, 400)
+
+        bookmarks = await fetch_bookmarks_with_names(bookmarks_query, request.state.user_id)
+
+        return json_response({
+            "message": f"Success fetching bookmarks with filter: {filter_type}",
+            "data": {
+                "bookmarks": bookmarks
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
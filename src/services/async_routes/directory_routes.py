@@ -0,0 +1,39 @@
+import asyncio
+from src.utils.init import async_db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.utils.routes_util import subtree_bookmark_counts
+from src.utils.async_routes_util import AsyncRoutes, json_response, authorize_user, conditional_get, stream_dicts
+
+# Async counterparts of the read routes of src/services/routes/directory_routes.py
+directory_routes = AsyncRoutes()
+
+@directory_routes.route("/directory/all", methods=["GET"])
+@authorize_user
+@conditional_get
+async def get_all_directories(request):
+    try:
+        directories = await stream_dicts(async_db.collection(DIRECTORY_COLLECTION)
+                                         .where("userId", "==", request.state.user_id)
+                                         .where("isDeleted", "==", False))
+
+        async def count_bookmarks(directory_id):
+            bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+                .where("directoryId", "==", directory_id)\
+                .where("isDeleted", "==", False)
+            return sum([1 async for _ in bookmarks_query.stream()])
+
+        # Count bookmarks for all directories at the same time
+        counts = await asyncio.gather(*(count_bookmarks(directory["directoryId"]) for directory in directories))
+        for directory, count in zip(directories, counts):
+            directory["bookmarksCount"] = count
+        subtree_counts = subtree_bookmark_counts(directories)
+        for directory in directories:
+            directory["subtreeBookmarksCount"] = subtree_counts[directory["directoryId"]]
+
+        return json_response({
+            "message": "success",
+            "data": {"directories": directories}
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
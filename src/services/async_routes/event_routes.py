@@ -0,0 +1,85 @@
+import asyncio
+from starlette.responses import StreamingResponse
+from src.services.routes.event_routes import get_last_event_id, parse_poll_timeout, poll_response_data, EVENTS_DISABLED_ERROR
+from src.utils.async_routes_util import AsyncRoutes, json_response, authorize_user, authorize_user_allowing_query
+from src.utils.events import event_bus, format_sse, EVENT_RESET
+
+# Server-Sent Events stream, and async counterpart of the poll route of src/services/routes/event_routes.py
+event_routes = AsyncRoutes()
+
+# A comment line is sent after this many seconds without events, so proxies keep the connection open
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+# Streams are closed after this long, EventSource reconnects on its own with the Last-Event-ID header
+EVENT_STREAM_MAX_SECONDS = 300
+EVENT_STREAM_RETRY_MILLISECONDS = 3000
+
+"""
+API streaming the events of the user as Server-Sent Events, e.g. bookmark enrichment completions.
+"""
+@event_routes.route("/events", methods=["GET"])
+@authorize_user_allowing_query
+async def stream_events(request):
+    """
+    Example usage (the userId can be passed as a query parameter, EventSource does not send headers):
+        new EventSource("/api/events?userId=<userId>&lastEventId=<lastEventId of /bookmark/create>")
+
+    Each event carries its ID, type (e.g. `bookmark.enriched`) and JSON data. A `reset` event means events may
+    have been missed (e.g. the server restarted): catch up with /sync, the stream goes on from there.
+    """
+    try:
+        if not event_bus.enabled:
+            return json_response({"error": EVENTS_DISABLED_ERROR}, 501)
+        user_id = request.state.user_id
+        last_event_id = get_last_event_id(request.query_params, request.headers) or event_bus.last_event_id()
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+    async def stream():
+        nonlocal last_event_id
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + EVENT_STREAM_MAX_SECONDS
+        yield f"retry: {EVENT_STREAM_RETRY_MILLISECONDS}\n\n"
+        while loop.time() < closes_at:
+            timeout = min(EVENT_STREAM_HEARTBEAT_SECONDS, closes_at - loop.time())
+            events, reset = await event_bus.wait_for_events_async(user_id, last_event_id, timeout)
+            if reset:
+                last_event_id = event_bus.last_event_id()
+                yield format_sse(EVENT_RESET, {"lastEventId": last_event_id}, last_event_id)
+            for event in events:
+                last_event_id = event["id"]
+                yield format_sse(event["type"], event["data"], event["id"])
+            if not events and not reset:
+                yield ": heartbeat\n\n"
+
+    # The stream is cancelled when the client disconnects
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Disable proxy buffering
+    })
+
+
+"""
+API to long-poll the events of the user, see src/services/routes/event_routes.py.
+"""
+@event_routes.route("/events/poll", methods=["GET"])
+@authorize_user
+async def poll_events(request):
+    try:
+        if not event_bus.enabled:
+            return json_response({"error": EVENTS_DISABLED_ERROR}, 501)
+        timeout = parse_poll_timeout(request.query_params)
+        last_event_id = get_last_event_id(request.query_params, request.headers) or event_bus.last_event_id()
+
+        # Held polls cost no thread here, there is no limit of waiters
+        events, reset = await event_bus.wait_for_events_async(request.state.user_id, last_event_id, timeout)
+
+        if reset:
+            last_event_id = event_bus.last_event_id()
+        return json_response({
+            "message": "success",
+            "data": poll_response_data(events, reset, last_event_id)
+        }, 200)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
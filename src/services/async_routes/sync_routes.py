@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timezone
+from src.utils.init import async_db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.services.routes.sync_routes import SYNC_CLOCK_SKEW_SECONDS, token_expired
+from src.utils.async_routes_util import AsyncRoutes, json_response, authorize_user, stream_dicts
+
+# Async counterpart of src/services/routes/sync_routes.py
+sync_routes = AsyncRoutes()
+
+"""
+Query documents of a user in a collection changed at or after `since`.
+"""
+async def fetch_changed_documents(collection, user_id, since):
+    query = async_db.collection(collection).where("userId", "==", user_id)
+    if since > 0:
+        query = query.where("updatedAt", ">=", since)
+    return await stream_dicts(query)
+
+
+"""
+API to get all bookmarks, tags and directories created, updated or deleted since a sync token.
+"""
+@sync_routes.route("/sync", methods=["GET"])
+@authorize_user
+async def sync(request):
+    try:
+        since = request.query_params.get("since", "0")
+        if not since.isdigit():
+            return json_response({"error": f"Invalid sync token: {since}"}, 400)
+        since = int(since)
+
+        # Take the new token before querying so that writes racing with this request are picked up next time
+        next_token = max(int(datetime.now(timezone.utc).timestamp()) - SYNC_CLOCK_SKEW_SECONDS, 0)
+        reset_required = token_expired(since, next_token)
+        if reset_required:
+            since = 0
+
+        bookmarks, tags, directories = await asyncio.gather(
+            fetch_changed_documents(BOOKMARK_COLLECTION, request.state.user_id, since),
+            fetch_changed_documents(TAG_COLLECTION, request.state.user_id, since),
+            fetch_changed_documents(DIRECTORY_COLLECTION, request.state.user_id, since)
+        )
+
+        return json_response({
+            "message": "success",
+            "data": {
+                "bookmarks": bookmarks,
+                "tags": tags,
+                "directories": directories,
+                "token": str(next_token),
+                "resetRequired": reset_required
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
@@ -0,0 +1,139 @@
+import asyncio
+import traceback
+from datetime import datetime, timezone
+from src.utils.init import async_db
+from src.models.tag_model import TAG_COLLECTION
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.utils.routes_util import validate_required_fields
+from src.services.routes.tag_routes import GENERATED_TAG_COUNT
+from src.utils.resilience import OutboundCallError, CircuitOpenError
+from src.utils.async_routes_util import AsyncRoutes, json_response, authorize_user, conditional_get, bump_data_version, stream_dicts, get_http_client, \
+    fetch_bookmark, update_bookmark_fields
+
+# Async counterparts of the read and tag generation routes of src/services/routes/tag_routes.py
+tag_routes = AsyncRoutes()
+
+"""
+API to get a tag given tag_id
+"""
+@tag_routes.route("/tag/get/<tag_id>", methods=["GET"])
+@authorize_user
+async def get_tag(request, tag_id):
+    try:
+        tag = (await async_db.collection(TAG_COLLECTION).document(tag_id).get()).to_dict()
+
+        if not tag or tag.get("isDeleted"):
+            return json_response({"error": f"Tag not found for tag_id: {tag_id}"}, 404)
+
+        if tag["userId"] != request.state.user_id:
+            return json_response({"error": f"User unauthorized to delete tag with tag_id: {tag_id}"}, 403)
+
+        return json_response({
+            "message": "success",
+            "data": {
+                "tag": tag
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e), "traceback": traceback.format_exc()}, 500)
+
+
+"""
+API to get all tags for a user
+"""
+@tag_routes.route("/tag/all", methods=["GET"])
+@authorize_user
+@conditional_get
+async def get_all_tags(request):
+    try:
+        tags = await stream_dicts(async_db.collection(TAG_COLLECTION).where("userId", "==", request.state.user_id))
+        tags = [tag for tag in tags if not tag.get("isDeleted")]
+
+        async def count_bookmarks(tag_id):
+            bookmarks_query = async_db.collection(BOOKMARK_COLLECTION)\
+                .where("tags", "array_contains", tag_id)\
+                .where("isDeleted", "==", False)
+            return sum([1 async for _ in bookmarks_query.stream()])
+
+        # Count bookmarks for all tags at the same time
+        counts = await asyncio.gather(*(count_bookmarks(tag["tagId"]) for tag in tags))
+        for tag, count in zip(tags, counts):
+            tag["bookmarksCount"] = count
+
+        return json_response({
+            "message": "success",
+            "data": {
+                "tags": tags
+            }
+        }, 200)
+    except Exception as e:
+        return json_response({"error": str(e), "traceback": traceback.format_exc()}, 500)
+
+
+"""
+API to get AI generated tags for user
+"""
+@tag_routes.route("/tag/generate", methods=["POST"])
+@authorize_user
+async def generated_ai_tags(request):
+    try:
+        data = await request.json()
+        is_valid, message = validate_required_fields(data, ["bookmarkId"])
+
+        if not is_valid:
+            return json_response({"error": message}, 400)
+
+        bookmark_id = data["bookmarkId"]
+        snapshot, content = await fetch_bookmark(bookmark_id, include_content=True)
+        bookmark = snapshot.to_dict()
+
+        if not bookmark or bookmark.get("isDeleted"):
+            return json_response({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}, 404)
+
+        if bookmark["userId"] != request.state.user_id:
+            return json_response({"error": f"User unauthorized to generate tags for bookmark with bookmark_id: {bookmark_id}"}, 403)
+
+        # If tag already exists, return it.
+        if len(content["generatedTags"]) != 0 and not data.get("force"):
+            return json_response({
+                "message": "Tags already exist",
+                "data": {
+                    "generatedTags": content["generatedTags"]
+                }
+            }, 200)
+
+        allUserTags = await stream_dicts(async_db.collection(TAG_COLLECTION).where("userId", "==", request.state.user_id))
+        allUserTags = [tag for tag in allUserTags if not tag.get("isDeleted")]
+        # Imported on first use, keeps the LLM client out of the cold start
+        from src.utils.tagGeneration.generate_tags import generate_tags_async
+        generatedTags = await generate_tags_async(
+            get_http_client(),
+            GENERATED_TAG_COUNT,
+            bookmark["url"],
+            bookmark.get("title", ""),
+            content["fetchedContent"],
+            allUserTags
+        )
+
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        await update_bookmark_fields(snapshot.reference, {
+            "generatedTags": generatedTags,
+            "tagsGeneratedAt": time_now,
+            "updatedAt": time_now
+        })
+        await bump_data_version(request.state.user_id)
+
+        return json_response({
+            "message": "Tags successfully generated and saved",
+            "data": {
+                "generatedTags": generatedTags
+            }
+        }, 200)
+    except CircuitOpenError as e:
+        response = json_response({"error": str(e)}, 503)
+        response.headers["Retry-After"] = str(max(int(e.retry_after), 1))
+        return response
+    except (OutboundCallError, asyncio.TimeoutError) as e:
+        return json_response({"error": str(e) or "Tag generation timed out"}, 503)
+    except Exception as e:
+        return json_response({"error": str(e), "traceback": traceback.format_exc()}, 500)
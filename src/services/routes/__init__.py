@@ -3,10 +3,22 @@ from src.services.routes.user_routes import user_blueprint
 from src.services.routes.bookmark_routes import bookmark_blueprint
 from src.services.routes.tag_routes import tags_blueprint
 from src.services.routes.directory_routes import directory_blueprint
+from src.services.routes.sync_routes import sync_blueprint
+from src.services.routes.metrics_routes import metrics_blueprint
+from src.services.routes.admin_routes import admin_blueprint
+from src.services.routes.event_routes import event_blueprint
+from src.services.routes.thumbnail_routes import thumbnail_blueprint
+from src.services.routes.trash_routes import trash_blueprint
 
 # Combine all blueprints into one
 api_blueprint = Blueprint("api", __name__)
 api_blueprint.register_blueprint(user_blueprint)
 api_blueprint.register_blueprint(bookmark_blueprint)
 api_blueprint.register_blueprint(tags_blueprint)
-api_blueprint.register_blueprint(directory_blueprint)
\ No newline at end of file
+api_blueprint.register_blueprint(directory_blueprint)
+api_blueprint.register_blueprint(sync_blueprint)
+api_blueprint.register_blueprint(metrics_blueprint)
+api_blueprint.register_blueprint(admin_blueprint)
+api_blueprint.register_blueprint(event_blueprint)
+api_blueprint.register_blueprint(thumbnail_blueprint)
+api_blueprint.register_blueprint(trash_blueprint)
\ No newline at end of file
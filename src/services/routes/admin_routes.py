@@ -0,0 +1,304 @@
+from flask import Blueprint, jsonify, request, send_file, Response
+from src.utils.routes_util import authorize_admin, parse_bool_param
+from src.utils.profiling import list_profiles, get_profile_path, format_profile
+from src.jobs.content_refresh import run_content_refresh, backfill_refresh_schedule, REFRESH_BATCH_SIZE
+from src.jobs.bookmark_names import backfill_bookmark_names
+from src.jobs.tag_identity import migrate_tag_ids
+from src.jobs.bookmark_content import migrate_bookmark_content
+from src.jobs.trash_purge import purge_expired_tombstones
+from src.jobs.sync_timestamps import backfill_updated_at
+from src.jobs.directory_tree import backfill_directory_paths, repair_directory_paths
+from src.jobs.reenrichment import create_reenrichment_job, run_reenrichment_jobs, job_progress, JOB_TYPE
+from src.utils.init import db
+from src.models.job_model import JOB_COLLECTION, JOB_STATUS
+
+# Define a blueprint for the Admin APIs
+admin_blueprint = Blueprint("admin_routes", __name__)
+
+PROFILE_SORT_KEYS = ("cumulative", "tottime", "calls")
+
+"""
+API to list the stored profiles, newest first. See src/utils/profiling.py for how profiles are captured.
+"""
+@admin_blueprint.route("/admin/profiles", methods=["GET"])
+@authorize_admin
+def get_profiles():
+    try:
+        profiles = list_profiles()
+        return jsonify({
+            "message": "Profiles fetched successfully",
+            "data": {
+                "profiles": profiles,
+                "count": len(profiles)
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to download a stored profile. By default returns the raw pstats file (open it with `pstats`, snakeviz...).
+With `format=text`, returns the top functions as text, sorted by `sort` (cumulative, tottime or calls).
+"""
+@admin_blueprint.route("/admin/profiles/<profile_id>", methods=["GET"])
+@authorize_admin
+def get_profile(profile_id):
+    try:
+        path = get_profile_path(profile_id)
+        if not path:
+            return jsonify({"error": "Profile not found"}), 404
+
+        if request.args.get("format") == "text":
+            sort_by = request.args.get("sort", "cumulative")
+            if sort_by not in PROFILE_SORT_KEYS:
+                return jsonify({"error": f"Invalid sort: {sort_by}. Must be one of {', '.join(PROFILE_SORT_KEYS)}"}), 400
+            return Response(format_profile(path, sort_by), mimetype="text/plain")
+
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=f"{profile_id}.prof")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def checkpointed_scan_response(message, job):
+    """Response of the APIs advancing a checkpointed scan, see src/jobs/checkpointed_scan.py."""
+    if job is None:
+        return jsonify({"error": "Already running, retry later"}), 409
+    return jsonify({
+        "message": message,
+        "data": job
+    }), 200
+
+
+"""
+API running the content refresh, see src/jobs/content_refresh.py. Called by the scheduler (see vercel.json), GET
+for cron jobs. Checks the bookmarks that are due, within the time budget of the job, and returns the count of
+checks per outcome. With `backfill=true`, advances the scheduling of the bookmarks created before the content
+refresh instead, call it again until the backfill is `completed`.
+"""
+@admin_blueprint.route("/admin/jobs/content-refresh", methods=["GET", "POST"])
+@authorize_admin
+def run_content_refresh_job():
+    try:
+        backfill = parse_bool_param(request.args.get("backfill"))
+        limit = request.args.get("limit", type=int) or REFRESH_BATCH_SIZE
+        if limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+
+        if backfill:
+            # A run of the backfill takes the whole time budget
+            return checkpointed_scan_response("Content refresh backfill advanced", backfill_refresh_schedule())
+
+        outcomes = run_content_refresh(batch_size=limit)
+        return jsonify({
+            "message": "Content refresh completed",
+            "data": {
+                "outcomes": outcomes,
+                "checked": sum(count for outcome, count in outcomes.items() if outcome != "deferred")
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the writing of the tag and directory names on the bookmarks created before they were denormalized on
+bookmarks, see src/jobs/bookmark_names.py. Call it again until the backfill is `completed`, bookmarks that already
+have their names are skipped.
+"""
+@admin_blueprint.route("/admin/jobs/backfill-bookmark-names", methods=["POST"])
+@authorize_admin
+def run_bookmark_names_backfill():
+    try:
+        return checkpointed_scan_response("Bookmark names backfill advanced", backfill_bookmark_names())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the move of the tags created before tag IDs were derived from tag names to their IDs, merging tags of
+the same normalized name and moving their bookmarks, see src/jobs/tag_identity.py. Call it again until the migration
+is `completed`, tags already at their ID are skipped.
+"""
+@admin_blueprint.route("/admin/jobs/migrate-tag-ids", methods=["POST"])
+@authorize_admin
+def run_tag_id_migration():
+    try:
+        return checkpointed_scan_response("Tag ID migration advanced", migrate_tag_ids())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the move of the content fields of the bookmarks written before they had a content subdocument to it,
+see src/jobs/bookmark_content.py. Call it again until the migration is `completed`.
+"""
+@admin_blueprint.route("/admin/jobs/migrate-bookmark-content", methods=["POST"])
+@authorize_admin
+def run_bookmark_content_migration():
+    try:
+        return checkpointed_scan_response("Bookmark content migration advanced", migrate_bookmark_content())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the writing of the directory paths on the bookmarks created before directories were nested, see
+src/jobs/directory_tree.py. Call it again until the backfill is `completed`, bookmarks that already have a path are
+skipped.
+"""
+@admin_blueprint.route("/admin/jobs/backfill-directory-paths", methods=["POST"])
+@authorize_admin
+def run_directory_paths_backfill():
+    try:
+        return checkpointed_scan_response("Directory paths backfill advanced", backfill_directory_paths())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API rewriting the paths under the directories whose rewrite did not complete after they were moved, see
+src/jobs/directory_tree.py. Called by the scheduler (see vercel.json), GET for cron jobs. Returns the count of
+directories per outcome.
+"""
+@admin_blueprint.route("/admin/jobs/repair-directory-paths", methods=["GET", "POST"])
+@authorize_admin
+def run_directory_paths_repair():
+    try:
+        outcomes = repair_directory_paths()
+        return jsonify({
+            "message": "Directory paths repaired",
+            "data": {
+                "outcomes": outcomes
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the stamping of the documents of a synced collection (`collection`: tags, directories or bookmarks)
+written without a numeric `updatedAt`, which delta sync never returns, see src/jobs/sync_timestamps.py. Call it again
+until the backfill of the collection is `completed`.
+"""
+@admin_blueprint.route("/admin/jobs/backfill-updated-at", methods=["POST"])
+@authorize_admin
+def run_updated_at_backfill():
+    try:
+        collection = request.args.get("collection")
+        if not collection:
+            return jsonify({"error": "Missing required parameter: collection"}), 400
+        return checkpointed_scan_response("updatedAt backfill advanced", backfill_updated_at(collection))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API purging the documents deleted longer ago than the retention of the trash, see src/jobs/trash_purge.py. Called by
+the scheduler (see vercel.json), GET for cron jobs. Returns the count of purged documents per collection.
+"""
+@admin_blueprint.route("/admin/jobs/purge-trash", methods=["GET", "POST"])
+@authorize_admin
+def run_trash_purge():
+    try:
+        purged = purge_expired_tombstones()
+        return jsonify({
+            "message": "Trash purged",
+            "data": {
+                "purged": purged
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def get_reenrichment_job(job_id):
+    job = db.collection(JOB_COLLECTION).document(job_id).get().to_dict()
+    return job if job and job["type"] == JOB_TYPE else None
+
+
+"""
+API to start a re-enrichment job, fetching the pages of the bookmarks again and generating their tags again, see
+src/jobs/reenrichment.py. The job is advanced by the scheduled runs (/admin/jobs/reenrichment/run).
+"""
+@admin_blueprint.route("/admin/jobs/reenrichment", methods=["POST"])
+@authorize_admin
+def start_reenrichment_job():
+    """
+    Example body:
+        {}                                                        -> every bookmark, page fetched and tags generated
+        {"filter": {"userId": "user-1"}, "refetch": false}        -> tags of one user's bookmarks, from their content
+    """
+    try:
+        data = request.json or {}
+        job = create_reenrichment_job(data.get("filter") or {}, data.get("refetch", True), data.get("regenerate", True))
+        return jsonify({
+            "message": "Re-enrichment job started",
+            "data": job_progress(job)
+        }), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API advancing the running re-enrichment jobs from their checkpoints, within the time budget of one run. Called by the
+scheduler (see vercel.json), GET for cron jobs. Returns the progress of the jobs advanced.
+"""
+@admin_blueprint.route("/admin/jobs/reenrichment/run", methods=["GET", "POST"])
+@authorize_admin
+def run_reenrichment():
+    try:
+        jobs = run_reenrichment_jobs()
+        return jsonify({
+            "message": "Re-enrichment jobs advanced",
+            "data": {
+                "jobs": jobs
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to get the progress of a re-enrichment job: bookmarks processed, per outcome, throughput and estimated time left.
+"""
+@admin_blueprint.route("/admin/jobs/reenrichment/<job_id>", methods=["GET"])
+@authorize_admin
+def get_reenrichment_progress(job_id):
+    try:
+        job = get_reenrichment_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({
+            "message": "success",
+            "data": job_progress(job)
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to cancel a re-enrichment job. A run in progress stops after its current page.
+"""
+@admin_blueprint.route("/admin/jobs/reenrichment/<job_id>/cancel", methods=["POST"])
+@authorize_admin
+def cancel_reenrichment_job(job_id):
+    try:
+        job = get_reenrichment_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        if job["status"] != JOB_STATUS.RUNNING.value:
+            return jsonify({"error": f"Job is already {job['status']}"}), 409
+        db.collection(JOB_COLLECTION).document(job_id).update({"status": JOB_STATUS.CANCELLED.value})
+        job["status"] = JOB_STATUS.CANCELLED.value
+        return jsonify({
+            "message": "Re-enrichment job cancelled",
+            "data": job_progress(job)
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,18 +1,35 @@
 from datetime import datetime, timezone
 import traceback
 import threading
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
 from src.utils.init import db
-from src.models.bookmark_model import BOOKMARK_MODEL, BOOKMARK_COLLECTION, BOOKMARK_ID_PREFIX
+from src.models.bookmark_model import BOOKMARK_MODEL, BOOKMARK_COLLECTION, BOOKMARK_ID_PREFIX, LINK_STATUS
 from src.models.tag_model import TAG_COLLECTION
 from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
-from src.utils.routes_util import authorize_user, validate_required_fields, get_id, process_tags, fetch_tag_names, async_process_bookmark_creation
+from src.utils.routes_util import authorize_user, conditional_get, bump_data_version, validate_required_fields, get_id, process_tags, tag_ids_field, async_process_bookmark_creation, parse_list_param, parse_bool_param, parse_pagination, parse_batch_ids, get_documents, commit_writes, parse_update_time, fetch_bookmarks_with_names, fetch_name_maps, fetch_tag_name_map, resolve_bookmark_names, stream_pages, needs_name_maps, has_bookmark_names, tag_names_field, directory_name_field, directory_path_field, subtree_bookmarks_queries, fetch_bookmark_tag_names, bookmark_content_ref, bookmark_content
+from src.utils.concurrency import run_concurrently
+from src.utils.profiling import bind_profiling
+from src.utils.tag_index import TagIndex, MATCH_TYPE_AND, get_cached_tag_index
+from src.utils.events import event_bus
+from src.jobs.content_refresh import REFRESH_RETRY_SECONDS
+from src.utils.export import EXPORT_FORMATS, EXPORT_FIELDS, export_record, export_ndjson, export_csv, export_netscape_html, chunked
 
 # Define a blueprint for the User APIs
 bookmark_blueprint = Blueprint("bookmark_routes", __name__)
 
 CREATE_BOOKMARK_GENERATED_TAG_COUNT = 5
 
+# Attempts of the optimistic read-then-conditional-write loop used to toggle a favorite
+TOGGLE_FAVORITE_MAX_ATTEMPTS = 3
+
+MAX_BATCH_OPERATIONS = 500
+BATCH_ACTIONS = ("update", "favorite", "addTags", "delete")
+
+# Bookmarks read per query of an export
+EXPORT_PAGE_SIZE = 1000
+
 """
 API to create a bookmark.
 """
@@ -40,24 +57,37 @@ def create_bookmark():
             "title": "",
             "notes": "",
             "directoryId": DEFAULT_DIRECTORY_NAME_AND_ID,
+            "directoryName": DEFAULT_DIRECTORY_NAME_AND_ID,
+            "directoryPath": [],
             "tags": [],
+            "tagNames": [],
             "createdAt": time_now,
             "updatedAt": time_now,
             "isDeleted": False,
             "isFavorite": False,
-            "generatedTags": []
+            "enrichmentFallbacks": [],
+            "linkStatus": LINK_STATUS.UNKNOWN.value,
+            # Scheduled by the enrichment, checked anyway if it does not complete
+            "nextCheckAt": time_now + REFRESH_RETRY_SECONDS
         })
 
         # Save to Firestore
         db.collection(BOOKMARK_COLLECTION).document(bookmark_id).set(bookmark)
+        bump_data_version(request.user_id)
+
+        # Taken before starting the enrichment: resuming events from there can not miss its completion
+        last_event_id = event_bus.last_event_id()
 
         # Start async processing in the background
-        threading.Thread(target=async_process_bookmark_creation, args=(bookmark_id, url, request.user_id), daemon=True).start()
+        threading.Thread(target=bind_profiling(async_process_bookmark_creation), args=(bookmark_id, url, request.user_id), daemon=True).start()
 
         return jsonify({
             "message": "Bookmark created successfully", 
             "data": {
-                "bookmark": bookmark
+                "bookmark": bookmark,
+                # Listen to /events (or /events/poll) from this ID to be notified when the enrichment completes.
+                # None when events are disabled, see src/utils/events.py
+                "lastEventId": last_event_id
             }
         }), 201
     except ValueError as e:
@@ -67,14 +97,25 @@ def create_bookmark():
 
 
 """
-API to get a bookmark given bookmark_id
+API to get a bookmark given bookmark_id. With `includeContent=true`, the bookmark also has the fields of its content
+subdocument (`fetchedContent`, `generatedTags`, `tagsGeneratedAt`).
 """
 @bookmark_blueprint.route("/bookmark/get/<bookmark_id>", methods=["GET"])
 @authorize_user
 def get_bookmark(bookmark_id):
     try:
         bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
-        bookmark = bookmark_ref.get().to_dict()
+        if parse_bool_param(request.args.get("includeContent")):
+            # The bookmark and its content with one multi-document read
+            content_ref = bookmark_content_ref(bookmark_id)
+            snapshots = {snapshot.reference.path: snapshot for snapshot in db.get_all([bookmark_ref, content_ref])}
+            snapshot = snapshots[bookmark_ref.path]
+            bookmark = snapshot.to_dict()
+            if bookmark:
+                bookmark.update(bookmark_content(bookmark, snapshots[content_ref.path].to_dict()))
+        else:
+            snapshot = bookmark_ref.get()
+            bookmark = snapshot.to_dict()
 
         if not bookmark or bookmark.get("isDeleted"):
             return jsonify({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}), 404
@@ -85,13 +126,72 @@ def get_bookmark(bookmark_id):
         return jsonify({
             "message": "success", 
             "data": {
-                "bookmark": bookmark
+                "bookmark": bookmark,
+                # Pass back as `updateTime` on writes to only apply them if the bookmark did not change since
+                "updateTime": snapshot.update_time.rfc3339()
             }
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+"""
+API to get many bookmarks at once given a list of bookmark IDs
+"""
+@bookmark_blueprint.route("/bookmark/batch-get", methods=["POST"])
+@authorize_user
+def batch_get_bookmarks():
+    """
+    Fetch up to MAX_BATCH_GET_IDS bookmarks with one multi-document read. Their tag and directory names are on
+    the bookmarks, those of bookmarks written before they were are resolved with a second one.
+    Example body:
+        {"bookmarkIds": ["bookmark-1", "bookmark-2"]}
+
+    Bookmarks are returned in request order. IDs that are missing, deleted or owned by another
+    user are reported in `errors` with the status `get_bookmark` would have returned.
+    """
+    try:
+        bookmark_ids = parse_batch_ids(request.json, "bookmarkIds")
+
+        documents = get_documents([(BOOKMARK_COLLECTION, bookmark_id) for bookmark_id in bookmark_ids])
+
+        bookmarks = []
+        errors = {}
+        for bookmark_id in bookmark_ids:
+            bookmark = documents[(BOOKMARK_COLLECTION, bookmark_id)]
+            if not bookmark or bookmark.get("isDeleted"):
+                errors[bookmark_id] = {"status": 404, "error": f"Bookmark not found for bookmark_id: {bookmark_id}"}
+            elif bookmark["userId"] != request.user_id:
+                errors[bookmark_id] = {"status": 403, "error": f"User unauthorized to get bookmark with bookmark_id: {bookmark_id}"}
+            else:
+                bookmarks.append(bookmark)
+
+        # Resolve tag and directory names of the bookmarks not carrying them in a single multi-document read
+        legacy_bookmarks = [bookmark for bookmark in bookmarks if not has_bookmark_names(bookmark)]
+        name_refs = [(TAG_COLLECTION, tag_id) for bookmark in legacy_bookmarks for tag_id in bookmark["tags"]]
+        name_refs += [(DIRECTORY_COLLECTION, bookmark.get("directoryId")) for bookmark in legacy_bookmarks
+                      if bookmark.get("directoryId") and bookmark.get("directoryId") != DEFAULT_DIRECTORY_NAME_AND_ID]
+        names = get_documents(name_refs)
+
+        for bookmark in legacy_bookmarks:
+            tags = [names.get((TAG_COLLECTION, tag_id)) for tag_id in bookmark["tags"]]
+            bookmark["tagNames"] = [tag["tagName"] for tag in tags if tag and tag["userId"] == request.user_id]
+            bookmark["directoryName"] = directory_name_field(names.get((DIRECTORY_COLLECTION, bookmark.get("directoryId"))))
+        resolve_bookmark_names(bookmarks)
+
+        return jsonify({
+            "message": "success",
+            "data": {
+                "bookmarks": bookmarks,
+                "errors": errors
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 """
 API to update a bookmark given bookmark_id
 """
@@ -100,6 +200,7 @@ API to update a bookmark given bookmark_id
 def update_bookmark(bookmark_id):
     try:
         data = request.json
+        expected_update_time = parse_update_time(data)
         bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
         bookmark = bookmark_ref.get().to_dict()
 
@@ -120,35 +221,51 @@ def update_bookmark(bookmark_id):
             if not isinstance(data["tags"], list):
                 return jsonify({"error": "Tags provided in request must be a list"}), 400
             # Handle tags
-            tag_ids = process_tags(data.get("tags", []), request.user_id)
-            updated_fields["tags"] = tag_ids
+            tags = process_tags(data.get("tags", []), request.user_id)
+            updated_fields["tags"] = tag_ids_field(tags)
+            updated_fields["tagNames"] = tag_names_field([tag["tagName"] for tag in tags])
         if "directoryId" in data:
+            directory = None
             if data["directoryId"] != DEFAULT_DIRECTORY_NAME_AND_ID:
                 directory_ref = db.collection(DIRECTORY_COLLECTION).document(data["directoryId"])
                 directory = directory_ref.get().to_dict()
 
-                if not directory or directory.get("isDeleted"):
+                # Another user's directory is not found either, like in /bookmark/batch, so its existence is not leaked
+                if not directory or directory.get("isDeleted") or directory["userId"] != request.user_id:
                     return jsonify({"error": "Directory not found or deleted"}), 404
 
             updated_fields["directoryId"] = data["directoryId"]
+            updated_fields["directoryName"] = directory_name_field(directory)
+            updated_fields["directoryPath"] = directory_path_field(directory)
+
+        # A bookmark written before its names were denormalized gets them with this write
+        if "tagNames" not in bookmark and "tagNames" not in updated_fields:
+            updated_fields["tagNames"] = fetch_bookmark_tag_names([bookmark], request.user_id)[0]
+        if "directoryName" not in bookmark and "directoryName" not in updated_fields:
+            directory_id = bookmark.get("directoryId")
+            directory = db.collection(DIRECTORY_COLLECTION).document(directory_id).get().to_dict() \
+                if directory_id and directory_id != DEFAULT_DIRECTORY_NAME_AND_ID else None
+            updated_fields["directoryName"] = directory_name_field(directory)
 
         updated_fields["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
 
-        # Save to Firestore
-        bookmark_ref.update(updated_fields)
-
-        # Fetch tag names dynamically
-        tag_names = fetch_tag_names(updated_fields.get("tags", []))\
-            if "tags" in updated_fields else bookmark["tags"]
+        # Save only the changed fields, optionally guarded by the client's updateTime precondition
+        option = db.write_option(last_update_time=expected_update_time) if expected_update_time else None
+        write_result = bookmark_ref.update(updated_fields, option=option)
+        bump_data_version(request.user_id)
 
-        # Update in-memory bookmark for the response
+        # Update in-memory bookmark for the response, with tag names
         bookmark.update(updated_fields)
-        bookmark["tags"] = tag_names
+        bookmark["tags"] = bookmark.pop("tagNames")
 
         return jsonify({
             "message": "Bookmark updated successfully",
-            "data": {"bookmark": bookmark}
+            "data": {"bookmark": bookmark, "updateTime": write_result.update_time.rfc3339()}
         }), 200
+    except FailedPrecondition:
+        return jsonify({"error": f"Bookmark {bookmark_id} was modified since it was read, fetch it again and retry"}), 412
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -161,6 +278,7 @@ API to delete a bookmark given bookmark_id
 @authorize_user
 def delete_bookmark(bookmark_id):
     try:
+        expected_update_time = parse_update_time(request.get_json(silent=True))
         bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
         bookmark = bookmark_ref.get().to_dict()
 
@@ -170,10 +288,17 @@ def delete_bookmark(bookmark_id):
         if bookmark["userId"] != request.user_id:
             return jsonify({"error": f"User unauthorized to update bookmark with bookmark_id: {bookmark_id}"}), 403
 
-        # Update Firestore document
-        bookmark["isDeleted"] = True
-        bookmark["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
-        bookmark_ref.set(bookmark)
+        # Only write the soft delete fields, so fields written concurrently by the enrichment are kept
+        option = db.write_option(last_update_time=expected_update_time) if expected_update_time else None
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        bookmark_ref.update({
+            "isDeleted": True,
+            "deletedAt": time_now,
+            # Not checked by the content refresh while in the trash
+            "nextCheckAt": firestore.DELETE_FIELD,
+            "updatedAt": time_now
+        }, option=option)
+        bump_data_version(request.user_id)
 
         return jsonify({
             "message": "Bookmark deleted successfully", 
@@ -181,6 +306,10 @@ def delete_bookmark(bookmark_id):
                 "bookmarkId": bookmark_id
             }
         }), 200
+    except FailedPrecondition:
+        return jsonify({"error": f"Bookmark {bookmark_id} was modified since it was read, fetch it again and retry"}), 412
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -190,42 +319,217 @@ API to set a bookmark as favorite (or remove) given bookmark_id
 @bookmark_blueprint.route("/bookmark/favorite/<bookmark_id>", methods=["POST"])
 @authorize_user
 def toggle_favorite(bookmark_id):
+    """
+    Toggle isFavorite with optimistic concurrency: the write is conditioned on the update time of the
+    snapshot it was computed from, and retried on a fresh read if the bookmark changed in between.
+    If the client passes `updateTime`, a bookmark modified since then fails with 412 instead of retrying.
+    """
     try:
+        expected_update_time = parse_update_time(request.get_json(silent=True))
         bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
-        bookmark = bookmark_ref.get().to_dict()
 
-        if not bookmark or bookmark.get("isDeleted"):
-            return jsonify({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}), 404
+        for attempt in range(TOGGLE_FAVORITE_MAX_ATTEMPTS):
+            snapshot = bookmark_ref.get()
+            bookmark = snapshot.to_dict()
 
-        if bookmark["userId"] != request.user_id:
-            return jsonify({"error": f"User unauthorized to update bookmark with bookmark_id: {bookmark_id}"}), 403
+            if not bookmark or bookmark.get("isDeleted"):
+                return jsonify({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}), 404
+
+            if bookmark["userId"] != request.user_id:
+                return jsonify({"error": f"User unauthorized to update bookmark with bookmark_id: {bookmark_id}"}), 403
 
-        # Update Firestore document
-        bookmark["isFavorite"] = not bookmark["isFavorite"]
-        bookmark["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
-        bookmark_ref.set(bookmark)
+            if expected_update_time and snapshot.update_time != expected_update_time:
+                raise FailedPrecondition("updateTime mismatch")
+
+            is_favorite = not bookmark["isFavorite"]
+            try:
+                write_result = bookmark_ref.update({
+                    "isFavorite": is_favorite,
+                    "updatedAt": int(datetime.now(timezone.utc).timestamp())
+                }, option=db.write_option(last_update_time=snapshot.update_time))
+                break
+            except FailedPrecondition:
+                # Somebody else (e.g. the enrichment thread) wrote the bookmark, toggle again from a fresh read
+                if expected_update_time or attempt == TOGGLE_FAVORITE_MAX_ATTEMPTS - 1:
+                    raise
+        bump_data_version(request.user_id)
 
         return jsonify({
             "message": "Bookmark favorite set", 
             "data": {
                 "bookmarkId": bookmark_id,
-                "isFavorite": bookmark['isFavorite']
+                "isFavorite": is_favorite,
+                "updateTime": write_result.update_time.rfc3339()
             }
         }), 200
+    except FailedPrecondition:
+        return jsonify({"error": f"Bookmark {bookmark_id} was modified since it was read, fetch it again and retry"}), 412
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
 """
-API to get bookmarks given tag. This API matches for AND operator of all tags.
+API to apply many bookmark edits (multi-select actions) in a few round trips.
+"""
+@bookmark_blueprint.route("/bookmark/batch", methods=["POST"])
+@authorize_user
+def batch_update_bookmarks():
+    """
+    Apply a list of operations to bookmarks of the user.
+    Example body:
+        {"operations": [
+            {"bookmarkId": "bookmark-1", "action": "update", "title": "..", "notes": "..", "tags": ["a"], "directoryId": "directory-1"},
+            {"bookmarkId": "bookmark-2", "action": "favorite", "isFavorite": true},  # omit isFavorite to toggle
+            {"bookmarkId": "bookmark-3", "action": "addTags", "tags": ["reading_list"]},
+            {"bookmarkId": "bookmark-4", "action": "delete"}
+        ]}
+
+    Bookmarks and target directories are read with one multi-document read, all tag names go through a
+    single `process_tags` call and writes are committed in chunked WriteBatches.
+    Returns one result per operation, in request order, with the status the single-item API would return.
+    """
+    try:
+        operations = (request.json or {}).get("operations")
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "operations must be a non-empty list"}), 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return jsonify({"error": f"At most {MAX_BATCH_OPERATIONS} operations can be applied at once"}), 400
+
+        results = [None] * len(operations)
+
+        def fail(index, status, error):
+            results[index] = {"bookmarkId": operations[index].get("bookmarkId"), "status": status, "error": error}
+
+        # Validate operations before touching Firestore
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or not operation.get("bookmarkId") \
+                    or not isinstance(operation["bookmarkId"], str):
+                results[index] = {"bookmarkId": None, "status": 400, "error": "Missing required field: bookmarkId"}
+            elif operation.get("action") not in BATCH_ACTIONS:
+                fail(index, 400, f"Invalid action: {operation.get('action')}. Must be one of {', '.join(BATCH_ACTIONS)}")
+            elif "tags" in operation and not isinstance(operation["tags"], list):
+                fail(index, 400, "Tags provided in request must be a list")
+            elif "tags" in operation and not all(isinstance(tag, str) and tag.strip() for tag in operation["tags"]):
+                fail(index, 400, "Tags must be non-empty strings")
+            elif operation.get("directoryId") and not isinstance(operation["directoryId"], str):
+                fail(index, 400, "directoryId must be a string")
+            elif operation["action"] == "addTags" and not operation.get("tags"):
+                fail(index, 400, "Missing required field: tags")
+
+        valid_indexes = [index for index in range(len(operations)) if results[index] is None]
+
+        # One multi-document read for every bookmark and every target directory
+        refs = [(BOOKMARK_COLLECTION, operations[index]["bookmarkId"]) for index in valid_indexes]
+        refs += [(DIRECTORY_COLLECTION, operations[index]["directoryId"]) for index in valid_indexes
+                 if operations[index]["action"] == "update" and operations[index].get("directoryId")
+                 and operations[index]["directoryId"] != DEFAULT_DIRECTORY_NAME_AND_ID]
+        documents = get_documents(refs)
+
+        # Resolve every tag name of the request in a single pass
+        tag_names = list(dict.fromkeys(
+            tag_name for index in valid_indexes for tag_name in operations[index].get("tags", [])
+            if operations[index]["action"] in ("update", "addTags")
+        ))
+        tag_by_name = dict(zip(tag_names, process_tags(tag_names, request.user_id)))
+
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        writes = []
+        write_indexes = []
+        for index in valid_indexes:
+            operation = operations[index]
+            bookmark_id = operation["bookmarkId"]
+            action = operation["action"]
+            bookmark = documents[(BOOKMARK_COLLECTION, bookmark_id)]
+
+            if not bookmark or bookmark.get("isDeleted"):
+                fail(index, 404, f"Bookmark not found for bookmark_id: {bookmark_id}")
+                continue
+            if bookmark["userId"] != request.user_id:
+                fail(index, 403, f"User unauthorized to update bookmark with bookmark_id: {bookmark_id}")
+                continue
+
+            updated_fields = {}
+            if action == "update":
+                if "title" in operation:
+                    updated_fields["title"] = operation["title"]
+                if "notes" in operation:
+                    updated_fields["notes"] = operation["notes"]
+                if "tags" in operation:
+                    tags = [tag_by_name[tag_name] for tag_name in operation["tags"]]
+                    updated_fields["tags"] = tag_ids_field(tags)
+                    updated_fields["tagNames"] = tag_names_field([tag["tagName"] for tag in tags])
+                if operation.get("directoryId"):
+                    directory = None
+                    if operation["directoryId"] != DEFAULT_DIRECTORY_NAME_AND_ID:
+                        directory = documents[(DIRECTORY_COLLECTION, operation["directoryId"])]
+                        if not directory or directory.get("isDeleted") or directory["userId"] != request.user_id:
+                            fail(index, 404, "Directory not found or deleted")
+                            continue
+                    updated_fields["directoryId"] = operation["directoryId"]
+                    updated_fields["directoryName"] = directory_name_field(directory)
+                    updated_fields["directoryPath"] = directory_path_field(directory)
+            elif action == "favorite":
+                is_favorite = operation.get("isFavorite")
+                updated_fields["isFavorite"] = (not bookmark["isFavorite"]) if is_favorite is None else bool(is_favorite)
+            elif action == "addTags":
+                tags = [tag_by_name[tag_name] for tag_name in operation["tags"]]
+                updated_fields["tags"] = firestore.ArrayUnion(tag_ids_field(tags))
+                if "tagNames" in bookmark:
+                    updated_fields["tagNames"] = firestore.ArrayUnion(tag_names_field([tag["tagName"] for tag in tags]))
+            elif action == "delete":
+                updated_fields["isDeleted"] = True
+                updated_fields["deletedAt"] = time_now
+                updated_fields["nextCheckAt"] = firestore.DELETE_FIELD
+            updated_fields["updatedAt"] = time_now
+
+            # Keep the in-memory copy current so later operations on the same bookmark see this one
+            if action == "addTags":
+                bookmark["tags"] = list(dict.fromkeys(bookmark["tags"] + updated_fields["tags"].values))
+                if "tagNames" in updated_fields:
+                    bookmark["tagNames"] = tag_names_field(bookmark["tagNames"] + updated_fields["tagNames"].values)
+            else:
+                bookmark.update(updated_fields)
+
+            writes.append(("update", db.collection(BOOKMARK_COLLECTION).document(bookmark_id), updated_fields))
+            write_indexes.append(index)
+            # Result as of this operation, reported once its chunk is committed
+            results[index] = {
+                "bookmarkId": bookmark_id,
+                "status": 200,
+                "isFavorite": bookmark["isFavorite"],
+                "isDeleted": bookmark["isDeleted"]
+            }
+
+        for index, error in zip(write_indexes, commit_writes(writes)):
+            if error:
+                fail(index, 500, str(error))
+
+        if writes:
+            bump_data_version(request.user_id)
+
+        return jsonify({
+            "message": "Batch applied",
+            "data": {
+                "results": results
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to get all bookmarks of a user.
 """
 @bookmark_blueprint.route("/bookmark/all", methods=["GET"])
 @authorize_user
+@conditional_get
 def fetch_all_bookmarks():
     """
     Fetch all bookmarks of user.
-    Example usage:
-        /bookmark/filter-by-tags?match_type=AND&tags=tag123,tag456
     """
     try:
 
@@ -234,33 +538,172 @@ def fetch_all_bookmarks():
             .where("userId", "==", request.user_id)\
             .where("isDeleted", "==", False)
 
-        bookmarks = [doc.to_dict() for doc in bookmarks_query.stream()]
+        # Fetch bookmarks & resolve tag and directory names, see `fetch_bookmarks_with_names`
+        bookmarks = fetch_bookmarks_with_names(bookmarks_query, request.user_id)
+
+        return jsonify({
+            "message": "success fetching all bookmarks of user",
+            "data": {
+                "bookmarks": bookmarks
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to export all bookmarks of a user, streamed as NDJSON, CSV or a Netscape bookmark file (HTML).
+"""
+@bookmark_blueprint.route("/bookmark/export", methods=["GET"])
+@authorize_user
+def export_bookmarks():
+    """
+    Export all bookmarks of the user, with tag and directory names.
+    Example usage:
+        /bookmark/export?format=ndjson (default), /bookmark/export?format=csv, /bookmark/export?format=html
+
+    The bookmarks are read EXPORT_PAGE_SIZE at a time and written out as they are read (chunked transfer),
+    so exports of any size use the same memory. The HTML export has one folder per live directory, nested like
+    the directories, the other bookmarks are at its top level.
+    """
+    try:
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Invalid format: {export_format}. Must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+        user_id = request.user_id
+        # Loaded once, before streaming: an error is still reported as a JSON response
+        tag_map, directories = run_concurrently(
+            lambda: fetch_tag_name_map(user_id),
+            lambda: {doc.id: doc.to_dict() for doc in db.collection(DIRECTORY_COLLECTION).where("userId", "==", user_id).stream()}
+        )
+        directory_map = {directory_id: directory["name"] for directory_id, directory in directories.items()}
+        bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", user_id)\
+            .where("isDeleted", "==", False)\
+            .select(EXPORT_FIELDS)
+
+        def records(query, keep=None):
+            for snapshot in stream_pages(query, EXPORT_PAGE_SIZE):
+                bookmark = snapshot.to_dict()
+                if keep is None or keep(bookmark):
+                    yield export_record(bookmark, tag_map, directory_map, DEFAULT_DIRECTORY_NAME_AND_ID)
+
+        if export_format == "html":
+            # One folder per live directory, with a query each, nested like the directories. The other bookmarks
+            # (uncategorized, without a directoryId or in a directory deleted or purged since) are at the top
+            # level, found with one scan.
+            live_ids = sorted((directory_id for directory_id, directory in directories.items()
+                               if not directory.get("isDeleted") and directory_id != DEFAULT_DIRECTORY_NAME_AND_ID),
+                              key=lambda directory_id: directory_map[directory_id].lower())
+            live = set(live_ids)
+
+            def folder_parent(directory_id):
+                # A directory whose parent is not live anymore, or in a cycle left by concurrent moves, is exported
+                # at the top level
+                parent_id = directories[directory_id].get("parentId")
+                seen = {directory_id}
+                ancestor_id = parent_id
+                while ancestor_id in live:
+                    if ancestor_id in seen:
+                        return None
+                    seen.add(ancestor_id)
+                    ancestor_id = directories[ancestor_id].get("parentId")
+                return parent_id if parent_id in live else None
+
+            children = {}  # {parent ID: live subdirectory IDs, by name}, under None for the top level
+            for directory_id in live_ids:
+                children.setdefault(folder_parent(directory_id), []).append(directory_id)
+
+            def folders(parent_id):
+                return [(directory_map[directory_id], records(bookmarks_query.where("directoryId", "==", directory_id)),
+                         folders(directory_id))
+                        for directory_id in children.get(parent_id, [])]
+
+            top_level = records(bookmarks_query, keep=lambda bookmark: bookmark.get("directoryId") not in live)
+            body = export_netscape_html(top_level, folders(None))
+        elif export_format == "csv":
+            body = export_csv(records(bookmarks_query))
+        else:
+            body = export_ndjson(records(bookmarks_query))
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        file_name = f"bookmarks-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{extension}"
+        response = Response(stream_with_context(chunked(body)), content_type=content_type)
+        response.headers["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Fetch all tag names for the given tag IDs
-        tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
-        tag_map = {tag.id: tag.to_dict()["tagName"] for tag in tags_query}
 
-        # Fetch all directories for the user
-        directories_query = db.collection(DIRECTORY_COLLECTION).where("userId", "==", request.user_id).stream()
-        directory_map = {directory.id: directory.to_dict()["name"] for directory in directories_query}
+"""
+API to get bookmarks matching several tags at once.
+"""
+@bookmark_blueprint.route("/bookmark/filter-by-tags", methods=["GET"])
+@authorize_user
+@conditional_get
+def filter_bookmarks_by_tags():
+    """
+    Fetch bookmarks matching an AND / OR combination of tags, optionally excluding tags (NOT).
+    Example usage:
+        /bookmark/filter-by-tags?match_type=AND&tags=tag123,tag456&exclude=tag789&directoryId=uncategorized&favorite=true&offset=0&limit=50
 
-        # Replace tag IDs with tag names & resolve directory names
-        for bookmark in bookmarks:
-            bookmark["tags"] = [tag_map[tag_id] for tag_id in bookmark["tags"] if tag_id in tag_map]
-            bookmark["directoryName"] = directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+    The user's bookmarks are streamed once and filtered through an in-memory tag posting index,
+    so the number of Firestore queries does not depend on how many tags are requested.
+    """
+    try:
+        tag_ids = parse_list_param(request.args.get("tags"))
+        exclude_tag_ids = parse_list_param(request.args.get("exclude"))
+        match_type = request.args.get("match_type", MATCH_TYPE_AND).upper()
+        directory_id = request.args.get("directoryId")
+        favorite = parse_bool_param(request.args.get("favorite"))
+        offset, limit = parse_pagination(request.args)
+
+        user_id, data_version = request.user_id, request.data_version
+
+        def load_tag_index():
+            bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+                .where("userId", "==", user_id)\
+                .where("isDeleted", "==", False)
+            return TagIndex([doc.to_dict() for doc in bookmarks_query.stream()])
+
+        # The index only changes when the user's data version changes, so reuse it across requests
+        tag_index = get_cached_tag_index(user_id, data_version, load_tag_index)
+        mask = tag_index.match(
+            tag_ids,
+            match_type=match_type,
+            exclude_tag_ids=exclude_tag_ids,
+            directory_id=directory_id,
+            favorite=favorite
+        )
+        bookmarks = tag_index.page(mask, offset, limit)
+
+        # Only bookmarks written before the names were denormalized need the user's tags and directories
+        tag_map = directory_map = None
+        if needs_name_maps(bookmarks):
+            tag_map, directory_map = fetch_name_maps(user_id)
+
+        # Replace tag IDs with tag names & resolve directory names on a copy, the index keeps tag IDs
+        bookmarks = resolve_bookmark_names([dict(bookmark) for bookmark in bookmarks], tag_map, directory_map)
 
         return jsonify({
-            "message": "success fetching all bookmarks of user",
+            "message": "success filtering bookmarks by tags",
             "data": {
-                "bookmarks": bookmarks
+                "bookmarks": bookmarks,
+                "total": mask.bit_count(),
+                "offset": offset,
+                "limit": limit
             }
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
+
 
 @bookmark_blueprint.route("/bookmark/tag/<tag_id>", methods=["GET"])
 @authorize_user
+@conditional_get
 def get_bookmarks_by_tagId(tag_id):
     """
     Fetch all bookmarks for a given tag ID and resolve tag names.
@@ -272,20 +715,8 @@ def get_bookmarks_by_tagId(tag_id):
             .where("tags", "array_contains", tag_id)\
             .where("isDeleted", "==", False)
 
-        bookmarks = [doc.to_dict() for doc in bookmarks_query.stream()]
-
-        # Fetch all tags for the user in a single query
-        tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
-        tag_map = {tag.id: tag.to_dict()["tagName"] for tag in tags_query}
-
-        # Fetch all directories for the user
-        directories_query = db.collection(DIRECTORY_COLLECTION).where("userId", "==", request.user_id).stream()
-        directory_map = {directory.id: directory.to_dict()["name"] for directory in directories_query}
-
-        # Replace tag IDs with tag names & resolve directory names
-        for bookmark in bookmarks:
-            bookmark["tags"] = [tag_map[tag_id] for tag_id in bookmark["tags"] if tag_id in tag_map]
-            bookmark["directoryName"] = directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+        # Fetch bookmarks & resolve tag and directory names, see `fetch_bookmarks_with_names`
+        bookmarks = fetch_bookmarks_with_names(bookmarks_query, request.user_id)
 
         return jsonify({
             "message": f"success fetching bookmarks with tagId: {tag_id}",
@@ -300,31 +731,26 @@ def get_bookmarks_by_tagId(tag_id):
 
 @bookmark_blueprint.route("/bookmark/directory/<directory_id>", methods=["GET"])
 @authorize_user
+@conditional_get
 def get_bookmarks_by_directoryId(directory_id):
     """
     Fetch all bookmarks for a given directory ID and resolve tag names.
+    Example usage:
+        /bookmark/directory/<directoryId>                          -> bookmarks in the directory
+        /bookmark/directory/<directoryId>?includeDescendants=true  -> and in its subdirectories, at any depth
     """
     try:
         # Query bookmarks that belong to the user and specified directory
         bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
             .where("userId", "==", request.user_id)\
-            .where("directoryId", "==", directory_id)\
             .where("isDeleted", "==", False)
+        if parse_bool_param(request.args.get("includeDescendants")):
+            bookmarks_query = subtree_bookmarks_queries(bookmarks_query, directory_id)
+        else:
+            bookmarks_query = bookmarks_query.where("directoryId", "==", directory_id)
 
-        bookmarks = [doc.to_dict() for doc in bookmarks_query.stream()]
-
-        # Fetch all tags for the user in a single query
-        tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
-        tag_map = {tag.id: tag.to_dict()["tagName"] for tag in tags_query}
-
-        # Fetch all directories for the user
-        directories_query = db.collection(DIRECTORY_COLLECTION).where("userId", "==", request.user_id).stream()
-        directory_map = {directory.id: directory.to_dict()["name"] for directory in directories_query}
-
-        # Replace tag IDs with tag names & resolve directory names
-        for bookmark in bookmarks:
-            bookmark["tags"] = [tag_map[tag_id] for tag_id in bookmark["tags"] if tag_id in tag_map]
-            bookmark["directoryName"] = directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+        # Fetch bookmarks & resolve tag and directory names, see `fetch_bookmarks_with_names`
+        bookmarks = fetch_bookmarks_with_names(bookmarks_query, request.user_id)
 
         return jsonify({
             "message": f"success fetching bookmarks with directory_id: {directory_id}",
@@ -338,6 +764,7 @@ def get_bookmarks_by_directoryId(directory_id):
 
 @bookmark_blueprint.route("/bookmark/filter/<filter_type>", methods=["GET"])
 @authorize_user
+@conditional_get
 def get_bookmarks_by_filterType(filter_type):
     """
     Fetch all bookmarks based on filterType and resolve tag names.
@@ -367,21 +794,8 @@ def get_bookmarks_by_filterType(filter_type):
         else:
             return jsonify({"error": f"Invalid filter type: {filter_type}"}), 400
 
-        # Fetch bookmarks
-        bookmarks = [doc.to_dict() for doc in bookmarks_query.stream()]
-
-        # Fetch all tags for the user in a single query
-        tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
-        tag_map = {tag.id: tag.to_dict()["tagName"] for tag in tags_query}  # Convert to {tagId: tagName} dict
-
-        # Fetch all directories for the user
-        directories_query = db.collection(DIRECTORY_COLLECTION).where("userId", "==", request.user_id).stream()
-        directory_map = {directory.id: directory.to_dict()["name"] for directory in directories_query}
-    
-        # Replace tag IDs with tag names
-        for bookmark in bookmarks:
-            bookmark["tags"] = [tag_map[tag_id] for tag_id in bookmark["tags"] if tag_id in tag_map]
-            bookmark["directoryName"] = directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+        # Fetch bookmarks & resolve tag and directory names, see `fetch_bookmarks_with_names`
+        bookmarks = fetch_bookmarks_with_names(bookmarks_query, request.user_id)
 
         return jsonify({
             "message": f"Success fetching bookmarks with filter: {filter_type}",
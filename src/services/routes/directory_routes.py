@@ -1,13 +1,31 @@
+import threading
 from datetime import datetime, timezone
 from flask import Blueprint, jsonify, request
+from firebase_admin import firestore
 from src.utils.init import db
 from src.models.bookmark_model import BOOKMARK_COLLECTION
-from src.models.directory_model import DIRECTORY_COLLECTION, DIRECTORY_MODEL, DIRECTORY_ID_PREFIX, DEFAULT_DIRECTORY_NAME_AND_ID
-from src.utils.routes_util import authorize_user, validate_required_fields, get_id
+from src.models.directory_model import DIRECTORY_COLLECTION, DIRECTORY_MODEL, DIRECTORY_ID_PREFIX, DEFAULT_DIRECTORY_NAME_AND_ID, MAX_DIRECTORY_DEPTH
+from src.utils.routes_util import authorize_user, conditional_get, bump_data_version, validate_required_fields, get_id, parse_batch_ids, get_documents, subtree_bookmark_counts, commit_writes
+from src.jobs.bookmark_names import propagate_directory_rename
+from src.jobs.directory_tree import read_directories, directory_chains, subtree_height, move_directory_in_background
 
 # Define a blueprint for the User APIs
 directory_blueprint = Blueprint("directory_routes", __name__)
 
+
+def find_parent_directory(parent_id):
+    """The user's live directory at `parent_id`, None if there is none."""
+    if not isinstance(parent_id, str) or not parent_id:
+        raise ValueError("parentId must be a directory ID or null")
+    parent = db.collection(DIRECTORY_COLLECTION).document(parent_id).get().to_dict()
+    if not parent or parent.get("isDeleted") or parent["userId"] != request.user_id:
+        return None
+    return parent
+
+
+"""
+API to create a directory, at the top level or under the directory `parentId`.
+"""
 @directory_blueprint.route("/directory/create", methods=["POST"])
 @authorize_user
 def create_directory():
@@ -19,6 +37,17 @@ def create_directory():
         if not is_valid:
             return jsonify({"error": message}), 400
 
+        parent_id = data.get("parentId")
+        ancestors = []
+        if parent_id is not None:
+            parent = find_parent_directory(parent_id)
+            if parent is None:
+                return jsonify({"error": f"Parent directory not found for id: {parent_id}"}), 404
+            # From the `parentId` links, the parent's stored path may wait for the rewrite of a move
+            ancestors = directory_chains(read_directories(request.user_id)).get(parent_id, []) + [parent_id]
+            if len(ancestors) >= MAX_DIRECTORY_DEPTH:
+                return jsonify({"error": f"Directories can not be nested more than {MAX_DIRECTORY_DEPTH} levels deep"}), 400
+
         directory_id = get_id(DIRECTORY_ID_PREFIX)
         time_now = int(datetime.now(timezone.utc).timestamp())
 
@@ -27,17 +56,22 @@ def create_directory():
             "directoryId": directory_id,
             "userId": request.user_id,
             "name": data["name"],
+            "parentId": parent_id,
+            "ancestors": ancestors,
             "createdAt": time_now,
             "updatedAt": time_now,
             "isDeleted": False
         })
 
         db.collection(DIRECTORY_COLLECTION).document(directory_id).set(directory)
+        bump_data_version(request.user_id)
 
         return jsonify({
             "message": "Directory created successfully",
             "data": {"directory": directory}
         }), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -58,6 +92,10 @@ def rename_directory(directory_id):
 
         updated_fields = {"name": data["name"], "updatedAt": int(datetime.now(timezone.utc).timestamp())}
         directory_ref.update(updated_fields)
+        bump_data_version(request.user_id)
+
+        # Rewrite the directory name denormalized on its bookmarks in the background
+        threading.Thread(target=propagate_directory_rename, args=(request.user_id, directory_id), daemon=True).start()
 
         return jsonify({
             "message": "Directory renamed successfully",
@@ -69,8 +107,110 @@ def rename_directory(directory_id):
         return jsonify({"error": str(e)}), 500
     
 
+"""
+API to move a directory, with its subdirectories and bookmarks, under another directory or to the top level.
+"""
+@directory_blueprint.route("/directory/move/<directory_id>", methods=["POST"])
+@authorize_user
+def move_directory(directory_id):
+    """
+    Example body:
+        {"parentId": "directory-2"} -> under directory-2
+        {"parentId": null}          -> to the top level
+    The directory moves at once, the paths of its descendants and their bookmarks are rewritten in the background
+    (see src/jobs/directory_tree.py).
+    """
+    try:
+        data = request.json or {}
+        if "parentId" not in data:
+            return jsonify({"error": "Missing required field: parentId"}), 400
+        parent_id = data["parentId"]
+
+        directory_ref = db.collection(DIRECTORY_COLLECTION).document(directory_id)
+        directory = directory_ref.get().to_dict()
+
+        if not directory or directory.get("isDeleted"):
+            return jsonify({"error": f"Directory not found for id: {directory_id}"}), 404
+
+        if directory["userId"] != request.user_id:
+            return jsonify({"error": "Unauthorized"}), 403
+
+        # From the `parentId` links, the stored paths may wait for the rewrite of an earlier move
+        directories = read_directories(request.user_id)
+        chains = directory_chains(directories)
+        ancestors = []
+        if parent_id is not None:
+            parent = find_parent_directory(parent_id)
+            if parent is None:
+                return jsonify({"error": f"Parent directory not found for id: {parent_id}"}), 404
+            ancestors = chains.get(parent_id, []) + [parent_id]
+            if directory_id in ancestors:
+                return jsonify({"error": "A directory can not be moved into itself or its subdirectories"}), 400
+
+        if len(ancestors) + subtree_height(directory_id, chains, directories) > MAX_DIRECTORY_DEPTH:
+            return jsonify({"error": f"Directories can not be nested more than {MAX_DIRECTORY_DEPTH} levels deep"}), 400
+
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        # Cleared by the rewrite of the paths under it, repaired by the scheduled runs if it does not complete
+        updated_fields = {"parentId": parent_id, "ancestors": ancestors, "pathsDirtyAt": time_now, "updatedAt": time_now}
+        directory_ref.update(updated_fields)
+        directory.update(updated_fields)
+        bump_data_version(request.user_id)
+
+        threading.Thread(target=move_directory_in_background,
+                         args=(request.user_id, directory_id), daemon=True).start()
+
+        return jsonify({
+            "message": "Directory moved successfully",
+            "data": {
+                "directory": directory
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@directory_blueprint.route("/directory/batch-get", methods=["POST"])
+@authorize_user
+def batch_get_directories():
+    """
+    Fetch up to MAX_BATCH_GET_IDS directories with one multi-document read.
+    Example body:
+        {"directoryIds": ["directory-1", "directory-2"]}
+    """
+    try:
+        directory_ids = parse_batch_ids(request.json, "directoryIds")
+        documents = get_documents([(DIRECTORY_COLLECTION, directory_id) for directory_id in directory_ids])
+
+        directories = []
+        errors = {}
+        for directory_id in directory_ids:
+            directory = documents[(DIRECTORY_COLLECTION, directory_id)]
+            if not directory or directory.get("isDeleted"):
+                errors[directory_id] = {"status": 404, "error": f"Directory not found for id: {directory_id}"}
+            elif directory["userId"] != request.user_id:
+                errors[directory_id] = {"status": 403, "error": "Unauthorized"}
+            else:
+                directories.append(directory)
+
+        return jsonify({
+            "message": "success",
+            "data": {
+                "directories": directories,
+                "errors": errors
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @directory_blueprint.route("/directory/all", methods=["GET"])
 @authorize_user
+@conditional_get
 def get_all_directories():
     try:
         directories_query = db.collection(DIRECTORY_COLLECTION)\
@@ -89,6 +229,11 @@ def get_all_directories():
                 .stream()
             directory["bookmarksCount"] = sum(1 for _ in bookmarks_query)
 
+        # Counts of the subdirectories are added up, no query per subtree
+        subtree_counts = subtree_bookmark_counts(directories)
+        for directory in directories:
+            directory["subtreeBookmarksCount"] = subtree_counts[directory["directoryId"]]
+
         return jsonify({
             "message": "success",
             "data": {"directories": directories}
@@ -103,7 +248,9 @@ def delete_directory(directory_id):
     """
     Deletes a directory.
     - If `moveBookmarks=True`, move all bookmarks to "Uncategorized".
-    - If `moveBookmarks=False`, permanently delete all bookmarks in the directory.
+    - If `moveBookmarks=False`, delete all bookmarks in the directory. Restoring the directory from the trash
+      restores them too.
+    Directories with subdirectories can not be deleted, their subdirectories are deleted or moved first.
     """
     try:
         data = request.json
@@ -118,18 +265,36 @@ def delete_directory(directory_id):
         if directory["userId"] != request.user_id:
             return jsonify({"error": "Unauthorized"}), 403
 
+        children_query = db.collection(DIRECTORY_COLLECTION)\
+            .where("userId", "==", request.user_id)\
+            .where("parentId", "==", directory_id)\
+            .where("isDeleted", "==", False)\
+            .limit(1)
+        if any(True for _ in children_query.stream()):
+            return jsonify({"error": "Directory has subdirectories, delete or move them first"}), 409
+
         # Mark directory as deleted
-        directory_ref.update({"isDeleted": True, "updatedAt": int(datetime.now(timezone.utc).timestamp())})
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        directory_ref.update({"isDeleted": True, "deletedAt": time_now, "updatedAt": time_now})
 
-        bookmarks_query = db.collection(BOOKMARK_COLLECTION).where("directoryId", "==", directory_id).stream()
+        bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+            .where("userId", "==", request.user_id)\
+            .where("directoryId", "==", directory_id)\
+            .select(["isDeleted"])
 
+        # Written in chunked batches
         if move_bookmarks:
             # Move all bookmarks to "Uncategorized"
-            for bookmark in bookmarks_query:
-                bookmark.reference.update({
-                    "directoryId": DEFAULT_DIRECTORY_NAME_AND_ID,
-                    "updatedAt": int(datetime.now(timezone.utc).timestamp())
-                })
+            writes = [("update", bookmark.reference, {
+                "directoryId": DEFAULT_DIRECTORY_NAME_AND_ID,
+                "directoryName": DEFAULT_DIRECTORY_NAME_AND_ID,
+                "directoryPath": [],
+                "updatedAt": time_now
+            }) for bookmark in bookmarks_query.stream()]
+            errors = [error for error in commit_writes(writes) if error is not None]
+            if errors:
+                raise errors[0]
+            bump_data_version(request.user_id)
             return jsonify({
                 "message": "Directory deleted, bookmarks moved to Uncategorized",
                 "data": {
@@ -139,9 +304,18 @@ def delete_directory(directory_id):
                 }
             }), 200
         else:
-            # Permanently delete all bookmarks in the directory
-            for bookmark in bookmarks_query:
-                bookmark.reference.update({"isDeleted": True, "updatedAt": int(datetime.now(timezone.utc).timestamp())})
+            # Delete all bookmarks in the directory, those already in the trash stay as they are
+            writes = [("update", bookmark.reference, {
+                "isDeleted": True,
+                "deletedAt": time_now,
+                "deletedWithDirectory": directory_id,
+                "nextCheckAt": firestore.DELETE_FIELD,
+                "updatedAt": time_now
+            }) for bookmark in bookmarks_query.stream() if not bookmark.to_dict().get("isDeleted")]
+            errors = [error for error in commit_writes(writes) if error is not None]
+            if errors:
+                raise errors[0]
+            bump_data_version(request.user_id)
             return jsonify({
                 "message": "Directory and all bookmarks deleted",
                 "data": {
@@ -0,0 +1,97 @@
+import os
+import threading
+from flask import Blueprint, jsonify, request
+from src.utils.init import WAITRESS_THREADS
+from src.utils.routes_util import authorize_user
+from src.utils.events import event_bus, to_client_event
+
+# Define a blueprint for the Event APIs
+event_blueprint = Blueprint("event_routes", __name__)
+
+# Longest a poll is held open. Clients poll again right away when it returns.
+EVENT_POLL_MAX_SECONDS = 25
+# A held poll ties up a server thread, so at most this share of the waitress threads hold polls, the others are
+# left to the other requests. Push delivery only scales in the ASGI mode: its Server-Sent Events stream and poll
+# (see src/services/async_routes/event_routes.py) hold no thread and have no such limit.
+EVENT_POLL_THREADS_SHARE = 0.5
+EVENT_POLL_MAX_WAITERS = int(os.getenv("EVENT_POLL_MAX_WAITERS", max(1, int(WAITRESS_THREADS * EVENT_POLL_THREADS_SHARE))))
+EVENT_POLL_RETRY_AFTER_SECONDS = 5
+
+# Error of the event routes when the event bus is disabled, see src/utils/events.py
+EVENTS_DISABLED_ERROR = "Events are not enabled on this server, poll /bookmark/get instead"
+
+_poll_waiters = threading.BoundedSemaphore(EVENT_POLL_MAX_WAITERS)
+
+
+"""
+Parse the event ID to resume from, sent as `lastEventId` or in the `Last-Event-ID` header.
+"""
+def get_last_event_id(args, headers):
+    return args.get("lastEventId") or headers.get("Last-Event-ID")
+
+
+"""
+Parse the `timeout` query parameter (seconds) of a poll.
+"""
+def parse_poll_timeout(args):
+    try:
+        timeout = float(args.get("timeout", EVENT_POLL_MAX_SECONDS))
+    except ValueError:
+        raise ValueError("timeout must be a number")
+    if timeout < 0:
+        raise ValueError("timeout must be non-negative")
+    return min(timeout, EVENT_POLL_MAX_SECONDS)
+
+
+"""
+Response body of a poll, see `poll_events`.
+"""
+def poll_response_data(events, reset, last_event_id):
+    return {
+        "events": [to_client_event(event) for event in events],
+        # Resume from this ID
+        "lastEventId": events[-1]["id"] if events else last_event_id,
+        "resetRequired": reset
+    }
+
+
+"""
+API to long-poll the events of the user, e.g. bookmark enrichment completions.
+"""
+@event_blueprint.route("/events/poll", methods=["GET"])
+@authorize_user
+def poll_events():
+    """
+    Returns as soon as there are events after `lastEventId`, or after `timeout` seconds (at most 25) with none.
+    Example usage:
+        /events/poll?lastEventId=<lastEventId of /bookmark/create or of the previous poll>
+
+    Without `lastEventId` only events published from now on are returned. When `resetRequired` is true,
+    events may have been missed (e.g. the server restarted): catch up with /sync, then poll from `lastEventId`.
+    Each held poll takes a server thread: past EVENT_POLL_MAX_WAITERS of them, polls get a 503 with Retry-After.
+    """
+    try:
+        if not event_bus.enabled:
+            return jsonify({"error": EVENTS_DISABLED_ERROR}), 501
+        timeout = parse_poll_timeout(request.args)
+        last_event_id = get_last_event_id(request.args, request.headers) or event_bus.last_event_id()
+
+        if not _poll_waiters.acquire(blocking=False):
+            response = jsonify({"error": "Too many pending polls, retry later"})
+            response.headers["Retry-After"] = str(EVENT_POLL_RETRY_AFTER_SECONDS)
+            return response, 503
+        try:
+            events, reset = event_bus.wait_for_events(request.user_id, last_event_id, timeout)
+        finally:
+            _poll_waiters.release()
+
+        if reset:
+            last_event_id = event_bus.last_event_id()
+        return jsonify({
+            "message": "success",
+            "data": poll_response_data(events, reset, last_event_id)
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,15 @@
+from flask import Blueprint, Response
+from src.utils.metrics import REGISTRY
+from src.utils.routes_util import authorize_admin
+
+# Define a blueprint for the Metrics APIs
+metrics_blueprint = Blueprint("metrics_routes", __name__)
+
+"""
+API exposing request, datastore and outbound HTTP metrics in the Prometheus text format. Admin only, scrapers send
+`Authorization: Bearer <ADMIN_TOKEN>`.
+"""
+@metrics_blueprint.route("/metrics", methods=["GET"])
+@authorize_admin
+def get_metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
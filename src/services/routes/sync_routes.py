@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.utils.routes_util import authorize_user
+from src.jobs.trash_purge import TOMBSTONE_RETENTION_SECONDS
+
+# Define a blueprint for the Sync APIs
+sync_blueprint = Blueprint("sync_routes", __name__)
+
+# Documents are stamped with the clock of whichever instance wrote them, so the returned token is moved back
+# by this margin. Clients may receive a few documents twice, which is harmless since sync is idempotent.
+SYNC_CLOCK_SKEW_SECONDS = 5
+
+"""
+Query documents of a user in a collection changed at or after `since`. Documents written without a numeric
+`updatedAt` are only returned by full syncs until they are stamped by src/jobs/sync_timestamps.py.
+Needs a composite index on (userId ASC, updatedAt ASC) for each synced collection.
+"""
+def fetch_changed_documents(collection, user_id, since):
+    query = db.collection(collection).where("userId", "==", user_id)
+    if since > 0:
+        query = query.where("updatedAt", ">=", since)
+    return [doc.to_dict() for doc in query.stream()]
+
+
+"""
+Whether a sync token is older than the tombstones, which are purged after TOMBSTONE_RETENTION_SECONDS: deletions
+since then may be missed, the client has to sync in full and rebuild its replica.
+"""
+def token_expired(since, next_token):
+    return 0 < since < next_token - TOMBSTONE_RETENTION_SECONDS
+
+
+"""
+API to get all bookmarks, tags and directories created, updated or deleted since a sync token.
+"""
+@sync_blueprint.route("/sync", methods=["GET"])
+@authorize_user
+def sync():
+    """
+    Delta sync for clients keeping a local replica.
+    Example usage:
+        /sync               -> full sync, returns every document and a token
+        /sync?since=<token> -> only documents changed after the token was issued
+
+    Deleted documents are returned as tombstones with `isDeleted: True`. Bookmarks reference
+    tags and directories by ID, clients resolve names from their replica.
+
+    Tokens older than the retention of tombstones get a full sync with `resetRequired: True`,
+    clients then replace their replica instead of merging into it.
+    """
+    try:
+        since = request.args.get("since", "0")
+        if not since.isdigit():
+            return jsonify({"error": f"Invalid sync token: {since}"}), 400
+        since = int(since)
+
+        # Take the new token before querying so that writes racing with this request are picked up next time
+        next_token = max(int(datetime.now(timezone.utc).timestamp()) - SYNC_CLOCK_SKEW_SECONDS, 0)
+        reset_required = token_expired(since, next_token)
+        if reset_required:
+            since = 0
+
+        bookmarks = fetch_changed_documents(BOOKMARK_COLLECTION, request.user_id, since)
+        tags = fetch_changed_documents(TAG_COLLECTION, request.user_id, since)
+        directories = fetch_changed_documents(DIRECTORY_COLLECTION, request.user_id, since)
+
+        return jsonify({
+            "message": "success",
+            "data": {
+                "bookmarks": bookmarks,
+                "tags": tags,
+                "directories": directories,
+                "token": str(next_token),
+                "resetRequired": reset_required
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,15 +1,24 @@
 from flask import Blueprint, jsonify, request
 import traceback
+import threading
 from datetime import datetime, timezone
 from src.utils.init import db
-from src.models.tag_model import TAG_MODEL, TAG_COLLECTION, TAG_CREATOR, TAG_ID_PREFIX
+from src.models.tag_model import TAG_COLLECTION, TAG_CREATOR
 from src.models.bookmark_model import BOOKMARK_COLLECTION
-from src.utils.routes_util import authorize_user, validate_required_fields, get_id, remove_tag_from_all_bookmarks
-from src.utils.tagGeneration.generate_tags import generate_tags
+from src.utils.resilience import OutboundCallError, CircuitOpenError
+from src.utils.routes_util import authorize_user, conditional_get, bump_data_version, validate_required_fields, remove_tag_from_all_bookmarks, parse_batch_ids, get_documents, get_tag_id, find_tag, create_tag_document, bookmark_content_ref, bookmark_content, update_bookmark_fields
+from src.jobs.bookmark_names import propagate_tag_rename
+from src.jobs.tag_identity import move_tag_in_background, find_tag_references, merge_tags as merge_tag_documents, merge_tags_in_background
 
 # Define a blueprint for the User APIs
 tags_blueprint = Blueprint("tags_routes", __name__)
 
+# Tag merges moving more bookmarks continue in the background
+MERGE_SYNC_BOOKMARKS = 500
+
+# Number of tags generated by /tag/generate
+GENERATED_TAG_COUNT = 5
+
 """
 API to create a tag.
 """
@@ -24,27 +33,29 @@ def create_tag():
         if not is_valid:
             return jsonify({"error": message}), 400
 
-        tagId = get_id(TAG_ID_PREFIX)
         now = int(datetime.now(timezone.utc).timestamp())
 
-        tag = TAG_MODEL.copy()
-        tag.update({
-            "tagId": tagId,
-            "tagName": data["tagName"],
-            "creator": TAG_CREATOR.USER.value,
-            "userId": request.user_id,
-            "createdAt": now
-        })
-
-        # Save to Firestore
-        db.collection(TAG_COLLECTION).document(tagId).set(tag)
+        # A tag with the same normalized name is returned instead of created again
+        tag, created = find_tag(data["tagName"], request.user_id), False
+        if tag is None:
+            tag, created = create_tag_document(request.user_id, data["tagName"], TAG_CREATOR.USER.value, now)
+        if tag.get("isDeleted"):
+            # Revive a previously deleted tag with the same name
+            tag.update({"tagName": data["tagName"].strip(), "isDeleted": False, "updatedAt": now})
+            db.collection(TAG_COLLECTION).document(tag["tagId"]).update(
+                {"tagName": tag["tagName"], "isDeleted": False, "updatedAt": now})
+            created = True
+        if created:
+            bump_data_version(request.user_id)
 
         return jsonify({
-            "message": "Tag created successfully", 
+            "message": "Tag created successfully" if created else "Tag already exists",
             "data": {
                 "tag": tag
             }
-        }), 201
+        }), 201 if created else 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -59,7 +70,7 @@ def get_tag(tag_id):
         tag_ref = db.collection(TAG_COLLECTION).document(tag_id)
         tag = tag_ref.get().to_dict()
 
-        if not tag:
+        if not tag or tag.get("isDeleted"):
             return jsonify({"error": f"Tag not found for tag_id: {tag_id}"}), 404
 
         if tag["userId"] != request.user_id:
@@ -75,15 +86,56 @@ def get_tag(tag_id):
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
     
 
+"""
+API to get many tags at once given a list of tag IDs
+"""
+@tags_blueprint.route("/tag/batch-get", methods=["POST"])
+@authorize_user
+def batch_get_tags():
+    """
+    Fetch up to MAX_BATCH_GET_IDS tags with one multi-document read.
+    Example body:
+        {"tagIds": ["tag-1", "tag-2"]}
+    """
+    try:
+        tag_ids = parse_batch_ids(request.json, "tagIds")
+        documents = get_documents([(TAG_COLLECTION, tag_id) for tag_id in tag_ids])
+
+        tags = []
+        errors = {}
+        for tag_id in tag_ids:
+            tag = documents[(TAG_COLLECTION, tag_id)]
+            if not tag or tag.get("isDeleted"):
+                errors[tag_id] = {"status": 404, "error": f"Tag not found for tag_id: {tag_id}"}
+            elif tag["userId"] != request.user_id:
+                errors[tag_id] = {"status": 403, "error": f"User unauthorized to get tag with tag_id: {tag_id}"}
+            else:
+                tags.append(tag)
+
+        return jsonify({
+            "message": "success",
+            "data": {
+                "tags": tags,
+                "errors": errors
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
+
 """
 API to get all tags for a user
 """
 @tags_blueprint.route("/tag/all", methods=["GET"])
 @authorize_user
+@conditional_get
 def get_all_tags():
     try:
         tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
         tags = [tag.to_dict() for tag in tags_query]
+        tags = [tag for tag in tags if not tag.get("isDeleted")]
 
         # Count bookmarks for each tag dynamically
         for tag in tags:
@@ -115,7 +167,7 @@ def update_tag(tag_id):
         tag_ref = db.collection(TAG_COLLECTION).document(tag_id)
         tag = tag_ref.get().to_dict()
 
-        if not tag:
+        if not tag or tag.get("isDeleted"):
             return jsonify({"error": f"Tag not found for tag_id: {tag_id}"}), 404
         if tag["userId"] != request.user_id:
             return jsonify({"error": f"User unauthorized to delete tag with tag_id: {tag_id}"}), 403
@@ -125,23 +177,46 @@ def update_tag(tag_id):
         if not is_valid:
             return jsonify({"error": message}), 400
         
-        updated_fields = {}
-        if "tagName" in data:
-            updated_fields["tagName"] = data["tagName"]
-            # Change creator to user as it is updated by user
-            updated_fields["creator"] = TAG_CREATOR.USER.value
-        updated_fields["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
-        
-        # Save to firehose.
-        tag_ref.update(updated_fields)
-        tag.update(updated_fields)
+        # Tag IDs are derived from the normalized name: a new name moves the tag to another ID
+        new_tag_id = get_tag_id(request.user_id, data["tagName"])
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        tag_name = data["tagName"].strip()
+        # Change creator to user as it is updated by user
+        updated_fields = {"tagName": tag_name, "creator": TAG_CREATOR.USER.value, "updatedAt": time_now}
+
+        if new_tag_id == tag_id:
+            # Save to firehose.
+            tag_ref.update(updated_fields)
+            bump_data_version(request.user_id)
+
+            # Rewrite the tag name denormalized on its bookmarks in the background
+            if tag_name != tag["tagName"]:
+                threading.Thread(target=propagate_tag_rename, args=(request.user_id, tag_id), daemon=True).start()
+        else:
+            # Merged into the tag of the new name if there is one
+            new_tag_ref = db.collection(TAG_COLLECTION).document(new_tag_id)
+            new_tag = new_tag_ref.get().to_dict()
+            if new_tag and not new_tag.get("isDeleted"):
+                new_tag_ref.update(updated_fields)
+            else:
+                new_tag_ref.set({**tag, **updated_fields, "tagId": new_tag_id, "isDeleted": False})
+            tag_ref.update({"isDeleted": True, "updatedAt": time_now})
+            bump_data_version(request.user_id)
+
+            # Move the bookmarks to the new tag ID in the background
+            renamed_tag = bool(new_tag) and new_tag["tagName"] != tag_name
+            threading.Thread(target=move_tag_in_background,
+                             args=(request.user_id, {tag_id: tag["tagName"]}, new_tag_id, tag_name, renamed_tag),
+                             daemon=True).start()
 
         return jsonify({
             "message": "Tag updated successfully", 
             "data": {
-                "tag_id": tag_id
+                "tag_id": new_tag_id
             }
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
@@ -156,17 +231,18 @@ def delete_tag(tag_id):
         tag_ref = db.collection(TAG_COLLECTION).document(tag_id)
         tag = tag_ref.get().to_dict()
 
-        if not tag:
+        if not tag or tag.get("isDeleted"):
             return jsonify({"error": f"Tag not found for tag_id: {tag_id}"}), 404
 
         if tag["userId"] != request.user_id:
             return jsonify({"error": f"User unauthorized to delete tag with tag_id: {tag_id}"}), 403
         
         # Remove tag from all bookmarks
-        remove_tag_from_all_bookmarks(tag_id)
+        remove_tag_from_all_bookmarks(tag_id, tag["tagName"])
 
-        # Delete the tag document
-        tag_ref.delete()
+        # Soft delete the tag document, the tombstone lets delta-sync clients drop it
+        tag_ref.update({"isDeleted": True, "updatedAt": int(datetime.now(timezone.utc).timestamp())})
+        bump_data_version(request.user_id)
 
         return jsonify({
             "message": "Tag successfully deleted", 
@@ -178,12 +254,81 @@ def delete_tag(tag_id):
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
     
 
+"""
+API to merge tags into another tag
+"""
+@tags_blueprint.route("/tag/merge", methods=["POST"])
+@authorize_user
+def merge_tags():
+    """
+    Move the bookmarks of the source tags to the target tag, then delete the source tags.
+    Example body:
+        {"sourceTagIds": ["tag-1", "tag-2"], "targetTagId": "tag-3"}
+    Merges of up to MERGE_SYNC_BOOKMARKS bookmarks are done when the response is sent (200). Larger ones continue
+    in the background (202, without bookmarksCount), until then the source tags are listed with their remaining
+    bookmarks.
+    """
+    try:
+        data = request.json
+        is_valid, message = validate_required_fields(data, ["sourceTagIds", "targetTagId"])
+        if not is_valid:
+            return jsonify({"error": message}), 400
+
+        target_tag_id = data["targetTagId"]
+        if not isinstance(target_tag_id, str):
+            return jsonify({"error": "targetTagId must be a string"}), 400
+        source_tag_ids = [tag_id for tag_id in parse_batch_ids(data, "sourceTagIds") if tag_id != target_tag_id]
+        if not source_tag_ids:
+            return jsonify({"error": "sourceTagIds must contain tags other than the target tag"}), 400
+
+        documents = get_documents([(TAG_COLLECTION, tag_id) for tag_id in source_tag_ids + [target_tag_id]])
+        for tag_id in source_tag_ids + [target_tag_id]:
+            tag = documents[(TAG_COLLECTION, tag_id)]
+            if not tag or tag.get("isDeleted"):
+                return jsonify({"error": f"Tag not found for tag_id: {tag_id}"}), 404
+            if tag["userId"] != request.user_id:
+                return jsonify({"error": f"User unauthorized to merge tag with tag_id: {tag_id}"}), 403
+
+        target_tag = documents[(TAG_COLLECTION, target_tag_id)]
+        source_tags = {tag_id: documents[(TAG_COLLECTION, tag_id)]["tagName"] for tag_id in source_tag_ids}
+        # Bounded probe: a source tag with more bookmarks than the limit makes the merge a background one, which
+        # finds the bookmarks itself
+        snapshots = find_tag_references(request.user_id, source_tag_ids, limit=MERGE_SYNC_BOOKMARKS + 1)
+
+        in_background = len(snapshots) > MERGE_SYNC_BOOKMARKS
+        if in_background:
+            threading.Thread(target=merge_tags_in_background,
+                             args=(request.user_id, source_tags, target_tag_id, target_tag["tagName"]),
+                             daemon=True).start()
+        else:
+            merge_tag_documents(request.user_id, source_tags, target_tag_id, target_tag["tagName"], snapshots)
+
+        return jsonify({
+            "message": "Tags are being merged" if in_background else "Tags merged successfully",
+            "data": {
+                "targetTagId": target_tag_id,
+                "mergedTagIds": source_tag_ids,
+                "bookmarksCount": None if in_background else len(snapshots),
+                "inBackground": in_background
+            }
+        }), 202 if in_background else 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
+
 """
 API to get AI generated tags for user
 """
 @tags_blueprint.route("/tag/generate", methods=["POST"])
 @authorize_user
 def generated_ai_tags():
+    """
+    Example body:
+        {"bookmarkId": "bookmark-1"}                -> the bookmark's generated tags, generated if it has none
+        {"bookmarkId": "bookmark-1", "force": true} -> generated again
+    """
     try:
         data = request.json
         required_fields = ["bookmarkId"]
@@ -194,30 +339,45 @@ def generated_ai_tags():
         
         bookmark_id = data["bookmarkId"]
         bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
-        bookmark = bookmark_ref.get().to_dict()
+        # The bookmark and its content subdocument with one multi-document read
+        snapshots = {snapshot.reference.path: snapshot for snapshot in db.get_all([bookmark_ref, bookmark_content_ref(bookmark_id)])}
+        bookmark = snapshots[bookmark_ref.path].to_dict()
+
+        if not bookmark or bookmark.get("isDeleted"):
+            return jsonify({"error": f"Bookmark not found for bookmark_id: {bookmark_id}"}), 404
+
+        if bookmark["userId"] != request.user_id:
+            return jsonify({"error": f"User unauthorized to generate tags for bookmark with bookmark_id: {bookmark_id}"}), 403
+
+        content = bookmark_content(bookmark, snapshots[bookmark_content_ref(bookmark_id).path].to_dict())
 
         # If tag already exists, return it.
-        if len(bookmark.get("generatedTags", [])) != 0:
+        if len(content["generatedTags"]) != 0 and not data.get("force"):
             return jsonify({
                 "message": "Tags already exist", 
                 "data": {
-                    "generatedTags": bookmark["generatedTags"]
+                    "generatedTags": content["generatedTags"]
                 }
             }), 200
 
         tags_query = db.collection(TAG_COLLECTION).where("userId", "==", request.user_id).stream()
         allUserTags = [tag.to_dict() for tag in tags_query]
+        allUserTags = [tag for tag in allUserTags if not tag.get("isDeleted")]
+        # Imported on first use, keeps the LLM client out of the cold start
+        from src.utils.tagGeneration.generate_tags import generate_tags
         generatedTags = generate_tags(
+            GENERATED_TAG_COUNT,
             bookmark["url"], 
             bookmark.get("title", ""),
-            bookmark.get("fetchedContent", ""), 
+            content["fetchedContent"], 
             allUserTags
         )
 
         updated_fields = {}
         updated_fields["generatedTags"] = generatedTags
-        updated_fields["updatedAt"] = int(datetime.now(timezone.utc).timestamp())
-        bookmark_ref.update(updated_fields)
+        updated_fields["updatedAt"] = updated_fields["tagsGeneratedAt"] = int(datetime.now(timezone.utc).timestamp())
+        update_bookmark_fields(bookmark_ref, updated_fields)
+        bump_data_version(request.user_id)
 
         return jsonify({
             "message": "Tags successfully generated and saved", 
@@ -226,5 +386,11 @@ def generated_ai_tags():
             }
         }), 200
 
+    except CircuitOpenError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = str(max(int(e.retry_after), 1))
+        return response, 503
+    except OutboundCallError as e:
+        return jsonify({"error": str(e) or "Tag generation timed out"}), 503
     except Exception as e:
-        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
\ No newline at end of file
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
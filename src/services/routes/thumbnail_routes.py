@@ -0,0 +1,31 @@
+from flask import Blueprint, Response, jsonify, request
+from src.utils.thumbnails import get_thumbnail_store, is_valid_thumbnail, THUMBNAIL_CONTENT_TYPE, THUMBNAIL_SIZES
+
+# Define a blueprint for the Thumbnail APIs
+thumbnail_blueprint = Blueprint("thumbnail_routes", __name__)
+
+# Thumbnails are addressed by the hash of their image, the content of a URL never changes
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+"""
+API to get a thumbnail of a bookmark image, given the bookmark's `thumbnailHash` and a size (small, medium).
+Not authorized: it is loaded by <img> tags, which can not send the userId header, and only serves images of
+public pages under unguessable addresses.
+"""
+@thumbnail_blueprint.route("/thumbnail/<image_hash>/<size>", methods=["GET"])
+def get_thumbnail(image_hash, size):
+    try:
+        if not is_valid_thumbnail(image_hash, size):
+            return jsonify({"error": f"Invalid thumbnail: {image_hash}/{size}. Sizes: {', '.join(THUMBNAIL_SIZES)}"}), 400
+
+        store = get_thumbnail_store()
+        thumbnail = store.read(image_hash, size) if store is not None else None
+        if thumbnail is None:
+            return jsonify({"error": f"Thumbnail not found: {image_hash}/{size}"}), 404
+
+        response = Response(thumbnail, mimetype=THUMBNAIL_CONTENT_TYPE)
+        response.headers["Cache-Control"] = THUMBNAIL_CACHE_CONTROL
+        response.set_etag(f"{image_hash}-{size}")
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,189 @@
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request
+from firebase_admin import firestore
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.utils.routes_util import authorize_user, conditional_get, bump_data_version, parse_pagination, parse_batch_ids, get_documents, commit_writes, fetch_bookmarks_with_names, tag_names_field, directory_name_field, directory_path_field
+from src.jobs.trash_purge import TOMBSTONE_RETENTION_SECONDS
+
+# Define a blueprint for the Trash APIs
+trash_blueprint = Blueprint("trash_routes", __name__)
+
+TRASH_TYPES = ("bookmarks", "directories")
+
+
+def deleted_at(document):
+    # Documents deleted before `deletedAt` was recorded were last updated by their deletion
+    return document.get("deletedAt") or document.get("updatedAt") or 0
+
+
+def with_expiry(document):
+    """Trash entry of a document: purged for good at `expiresAt`, see src/jobs/trash_purge.py."""
+    document["deletedAt"] = deleted_at(document)
+    document["expiresAt"] = document.get("updatedAt", document["deletedAt"]) + TOMBSTONE_RETENTION_SECONDS
+    return document
+
+
+"""
+API to list the deleted bookmarks and directories of a user, most recently deleted first.
+"""
+@trash_blueprint.route("/trash", methods=["GET"])
+@authorize_user
+@conditional_get
+def get_trash():
+    """
+    Example usage:
+        /trash                                  -> deleted bookmarks and directories
+        /trash?type=bookmarks&offset=0&limit=50 -> one page of the deleted bookmarks
+    Each entry has `deletedAt` and `expiresAt`, when it is purged and can not be restored anymore.
+    """
+    try:
+        trash_type = request.args.get("type")
+        if trash_type is not None and trash_type not in TRASH_TYPES:
+            return jsonify({"error": f"type must be one of: {', '.join(TRASH_TYPES)}"}), 400
+        offset, limit = parse_pagination(request.args)
+
+        data = {}
+        if trash_type in (None, "bookmarks"):
+            bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+                .where("userId", "==", request.user_id)\
+                .where("isDeleted", "==", True)
+            bookmarks = sorted(fetch_bookmarks_with_names(bookmarks_query, request.user_id), key=deleted_at, reverse=True)
+            data["bookmarks"] = [with_expiry(bookmark) for bookmark in bookmarks[offset:offset + limit]]
+            data["bookmarksCount"] = len(bookmarks)
+        if trash_type in (None, "directories"):
+            directories_query = db.collection(DIRECTORY_COLLECTION)\
+                .where("userId", "==", request.user_id)\
+                .where("isDeleted", "==", True)
+            directories = sorted((doc.to_dict() for doc in directories_query.stream()), key=deleted_at, reverse=True)
+            data["directories"] = [with_expiry(directory) for directory in directories[offset:offset + limit]]
+            data["directoriesCount"] = len(directories)
+
+        return jsonify({
+            "message": "success",
+            "data": data
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+"""
+API to restore deleted bookmarks and directories from the trash
+"""
+@trash_blueprint.route("/trash/restore", methods=["POST"])
+@authorize_user
+def restore_from_trash():
+    """
+    Example body:
+        {"bookmarkIds": ["bookmark-1"], "directoryIds": ["directory-1"]}
+    A restored directory brings back the bookmarks deleted with it, and goes to the top level if its parent is still
+    deleted. A restored bookmark whose directory is still deleted goes to the default directory, and loses its tags
+    deleted since.
+    Entries that can not be restored are reported in `errors`, by ID.
+    """
+    try:
+        data = request.json or {}
+        bookmark_ids = parse_batch_ids(data, "bookmarkIds") if data.get("bookmarkIds") else []
+        directory_ids = parse_batch_ids(data, "directoryIds") if data.get("directoryIds") else []
+        if not bookmark_ids and not directory_ids:
+            return jsonify({"error": "bookmarkIds or directoryIds must be a non-empty list"}), 400
+
+        documents = get_documents([(BOOKMARK_COLLECTION, bookmark_id) for bookmark_id in bookmark_ids] +
+                                  [(DIRECTORY_COLLECTION, directory_id) for directory_id in directory_ids])
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        restored_fields = {
+            "isDeleted": False,
+            "deletedAt": firestore.DELETE_FIELD,
+            "deletedWithDirectory": firestore.DELETE_FIELD,
+            "updatedAt": time_now
+        }
+        errors = {}
+
+        def in_trash(collection, doc_id):
+            document = documents[(collection, doc_id)]
+            if not document or not document.get("isDeleted"):
+                errors[doc_id] = {"status": 404, "error": f"Not found in the trash: {doc_id}"}
+                return False
+            if document["userId"] != request.user_id:
+                errors[doc_id] = {"status": 403, "error": f"User unauthorized to restore: {doc_id}"}
+                return False
+            return True
+
+        restored_directory_ids = [directory_id for directory_id in directory_ids if in_trash(DIRECTORY_COLLECTION, directory_id)]
+
+        # Bookmarks deleted with the restored directories come back with them
+        for directory_id in restored_directory_ids:
+            bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
+                .where("userId", "==", request.user_id)\
+                .where("deletedWithDirectory", "==", directory_id)
+            for snapshot in bookmarks_query.stream():
+                documents.setdefault((BOOKMARK_COLLECTION, snapshot.id), snapshot.to_dict())
+                if snapshot.id not in bookmark_ids:
+                    bookmark_ids.append(snapshot.id)
+
+        bookmarks = {bookmark_id: documents[(BOOKMARK_COLLECTION, bookmark_id)] for bookmark_id in bookmark_ids
+                     if in_trash(BOOKMARK_COLLECTION, bookmark_id)}
+        restored_directories = {directory_id: documents[(DIRECTORY_COLLECTION, directory_id)] for directory_id in restored_directory_ids}
+
+        # The tags, directories and parent directories of what is restored with one multi-document read
+        references = get_documents(
+            [(TAG_COLLECTION, tag_id) for bookmark in bookmarks.values() for tag_id in bookmark["tags"]] +
+            [(DIRECTORY_COLLECTION, bookmark["directoryId"]) for bookmark in bookmarks.values()
+             if bookmark.get("directoryId", DEFAULT_DIRECTORY_NAME_AND_ID) != DEFAULT_DIRECTORY_NAME_AND_ID
+             and bookmark["directoryId"] not in restored_directories] +
+            [(DIRECTORY_COLLECTION, directory["parentId"]) for directory in restored_directories.values()
+             if directory.get("parentId") and directory["parentId"] not in restored_directories]
+        )
+
+        # A directory goes back under its parent, or to the top level if the parent is still deleted. Parents are
+        # placed before their subdirectories, their paths may change.
+        writes = []
+        for directory_id, directory in sorted(restored_directories.items(), key=lambda item: len(item[1].get("ancestors", []))):
+            parent_id = directory.get("parentId")
+            parent = restored_directories.get(parent_id) or references.get((DIRECTORY_COLLECTION, parent_id))
+            if parent_id not in restored_directories and (not parent or parent.get("isDeleted")):
+                parent_id = parent = None
+            directory["parentId"], directory["ancestors"] = parent_id, directory_path_field(parent)
+            writes.append(("update", db.collection(DIRECTORY_COLLECTION).document(directory_id),
+                           {**restored_fields, "parentId": parent_id, "ancestors": directory["ancestors"]}))
+
+        for bookmark_id, bookmark in bookmarks.items():
+            # Deletes cleared the next content refresh check, a restored bookmark is checked on the next run
+            fields = {**restored_fields, "nextCheckAt": time_now}
+            tags = [references[(TAG_COLLECTION, tag_id)] for tag_id in bookmark["tags"]]
+            live_tags = [tag for tag in tags if tag and not tag.get("isDeleted")]
+            if len(live_tags) != len(tags):
+                fields["tags"] = [tag["tagId"] for tag in live_tags]
+                fields["tagNames"] = tag_names_field([tag["tagName"] for tag in live_tags])
+            directory_id = bookmark.get("directoryId", DEFAULT_DIRECTORY_NAME_AND_ID)
+            directory = None
+            if directory_id != DEFAULT_DIRECTORY_NAME_AND_ID:
+                directory = restored_directories.get(directory_id) or references[(DIRECTORY_COLLECTION, directory_id)]
+                if not directory or (directory.get("isDeleted") and directory_id not in restored_directories):
+                    directory = None
+                    fields["directoryId"] = DEFAULT_DIRECTORY_NAME_AND_ID
+                    fields["directoryName"] = directory_name_field(None)
+            fields["directoryPath"] = directory_path_field(directory)
+            writes.append(("update", db.collection(BOOKMARK_COLLECTION).document(bookmark_id), fields))
+
+        write_errors = [error for error in commit_writes(writes) if error is not None]
+        if write_errors:
+            raise write_errors[0]
+        bump_data_version(request.user_id)
+
+        return jsonify({
+            "message": "Restored from the trash",
+            "data": {
+                "bookmarkIds": list(bookmarks),
+                "directoryIds": restored_directory_ids,
+                "errors": errors
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
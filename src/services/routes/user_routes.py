@@ -5,7 +5,7 @@ from src.utils.init import db
 from src.models.user_model import USER_MODEL, USER_COLLECTION, USER_ID_PREFIX
 from src.models.bookmark_model import BOOKMARK_COLLECTION
 from src.models.tag_model import TAG_COLLECTION
-from src.utils.routes_util import validate_required_fields, get_id
+from src.utils.routes_util import validate_required_fields, get_id, bookmark_content_ref
 
 # Define a blueprint for the User APIs
 user_blueprint = Blueprint("user_routes", __name__)
@@ -38,7 +38,8 @@ def create_user():
             "avatarUrl": data.get("avatarUrl", ""),
             "email": data.get("email", ""),
             "createdAt": now,
-            "updatedAt": now
+            "updatedAt": now,
+            "dataVersion": 0
         }
 
         # 🔹 Save user to Firestore
@@ -111,6 +112,7 @@ def delete_user(user_id):
         # Delete all bookmarks associated with the user
         bookmarks_query = db.collection(BOOKMARK_COLLECTION).where("userId", "==", user_id).stream()
         for bookmark in bookmarks_query:
+            bookmark_content_ref(bookmark.id).delete()
             db.collection(BOOKMARK_COLLECTION).document(bookmark.id).delete()
 
         # Delete all tags associated with the user
@@ -0,0 +1,66 @@
+import os
+from a2wsgi import WSGIMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match, Router
+from src.services.async_routes import build_async_routes
+from src.utils.async_routes_util import close_http_client
+
+"""
+ASGI serving mode (see asgi.py at the repository root).
+
+Requests matching an async route (src/services/async_routes) are handled on the event loop, with the async
+Firestore client and httpx, so one process can keep thousands of I/O bound requests in flight. Every other
+request falls back to the Flask app, run on a bounded thread pool like waitress does.
+"""
+
+# Threads running the Flask routes in ASGI mode
+WSGI_FALLBACK_WORKERS = int(os.getenv("WSGI_FALLBACK_WORKERS", "10"))
+
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+CORS_EXPOSE_HEADERS = ["ETag", "Server-Timing"]
+
+
+class AsyncFirstApp:
+    """Dispatch to the async routes when one matches the request, to the Flask app otherwise."""
+    def __init__(self, async_routes, wsgi_app):
+        self.async_routes = async_routes
+        # Same CORS policy as index.py applies to the Flask app
+        self.async_app = CORSMiddleware(
+            Router(routes=async_routes),
+            allow_origin_regex=".*",  # Reflect the origin, like flask_cors with supports_credentials
+            allow_credentials=True,
+            allow_methods=CORS_METHODS,
+            allow_headers=["*"],
+            expose_headers=CORS_EXPOSE_HEADERS
+        )
+        self.wsgi_app = WSGIMiddleware(wsgi_app, workers=WSGI_FALLBACK_WORKERS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http" and self.is_async_route(scope):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+    def is_async_route(self, scope):
+        for route in self.async_routes:
+            match, _ = route.matches(scope)
+            # CORS preflight requests of async routes are answered by the CORS middleware
+            if match == Match.FULL or (match == Match.PARTIAL and scope["method"] == "OPTIONS"):
+                return True
+        return False
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await close_http_client()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(wsgi_app):
+    return AsyncFirstApp(build_async_routes("/api"), wsgi_app)
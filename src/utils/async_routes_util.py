@@ -0,0 +1,262 @@
+import asyncio
+import re
+import threading
+from functools import wraps
+from firebase_admin import firestore
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from src.utils.init import async_db
+from src.models.user_model import USER_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.models.bookmark_model import BOOKMARK_COLLECTION, BOOKMARK_CONTENT_COLLECTION, BOOKMARK_CONTENT_DOCUMENT, \
+    BOOKMARK_CONTENT_MODEL
+from src.utils.metrics import track_request
+from src.utils.singleflight import AsyncSingleFlight
+from src.utils.routes_util import resolve_bookmark_names, needs_name_maps, bookmark_content
+
+"""
+Helpers of the async routes (src/services/async_routes), the async counterparts of routes_util.py.
+Handlers receive the Starlette request plus the path parameters as keyword arguments, like Flask views.
+"""
+
+# Outbound HTTP calls, see `get_http_client`
+OUTBOUND_HTTP_TIMEOUT_SECONDS = 30
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+_listing_flight = AsyncSingleFlight("listing")
+
+
+class AsyncRoutes:
+    """
+    Collects async route handlers, like a Flask Blueprint:
+        bookmark_routes = AsyncRoutes()
+        @bookmark_routes.route("/bookmark/get/<bookmark_id>", methods=["GET"])
+    `build(prefix)` returns the Starlette routes. Every request gets its RequestStats and Server-Timing header,
+    like the Flask requests (see metrics.py).
+    """
+    def __init__(self):
+        self.handlers = []
+
+    def route(self, rule, methods):
+        def decorator(func):
+            self.handlers.append((rule, methods, func))
+            return func
+        return decorator
+
+    def build(self, prefix=""):
+        return [self._build_route(prefix + rule, methods, func) for rule, methods, func in self.handlers]
+
+    @staticmethod
+    def _build_route(rule, methods, func):
+        async def endpoint(request):
+            # Metrics are labelled with the Flask rule, so both serving modes share the same series
+            with track_request(rule, request.method) as stats:
+                response = await func(request, **request.path_params)
+            elapsed = stats.finish(str(response.status_code))
+            response.headers["Server-Timing"] = stats.server_timing(elapsed)
+            return response
+
+        # Flask style <param> -> Starlette style {param}
+        path = re.sub(r"<(?:[a-z]+:)?(\w+)>", r"{\1}", rule)
+        return Route(path, endpoint, methods=methods, name=func.__name__)
+
+
+def json_response(body, status_code=200):
+    return JSONResponse(body, status_code=status_code)
+
+
+"""
+Decorator that ensures only authorized users can access the wrapped async API routes, see routes_util.authorize_user.
+Sets `request.state.user_id` and `request.state.data_version`.
+"""
+def authorize_user(func):
+    @wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        error = await load_user(request, request.headers.get("userId"))
+        if error is not None:
+            return error
+        return await func(request, *args, **kwargs)
+    return wrapper
+
+
+"""
+Same as `authorize_user`, also accepting the userId as a query parameter: browsers can not set headers on
+Server-Sent Events connections (EventSource).
+"""
+def authorize_user_allowing_query(func):
+    @wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        error = await load_user(request, request.headers.get("userId") or request.query_params.get("userId"))
+        if error is not None:
+            return error
+        return await func(request, *args, **kwargs)
+    return wrapper
+
+
+async def load_user(request, user_id):
+    """Set `request.state.user_id` and `request.state.data_version`, or return the 401 response."""
+    if not user_id:
+        return json_response({"error": "Unauthorized Access: Missing userId in header"}, 401)
+
+    user_ref = await async_db.collection(USER_COLLECTION).document(user_id).get()
+    if not user_ref.exists:
+        return json_response({"error": "Unauthorized Access: Invalid userId provided"}, 401)
+    request.state.user_id = user_id
+    request.state.data_version = user_ref.to_dict().get("dataVersion", 0)
+    return None
+
+
+"""
+Bump the per-user data version after a write, see routes_util.bump_data_version.
+"""
+async def bump_data_version(user_id):
+    await async_db.collection(USER_COLLECTION).document(user_id).update({"dataVersion": firestore.Increment(1)})
+
+
+"""
+Decorator for listing GET routes (must be placed below `authorize_user`), see routes_util.conditional_get.
+"""
+def conditional_get(func):
+    @wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        etag = f"v{request.state.data_version}"
+        if if_none_match_contains(request.headers.get("If-None-Match"), etag):
+            response = Response(status_code=304)
+        else:
+            key = (request.state.user_id, request.url.path, tuple(sorted(request.query_params.multi_items())),
+                   request.state.data_version)
+
+            async def run():
+                response = await func(request, *args, **kwargs)
+                return response.status_code, response.body, response.raw_headers
+
+            status, body, raw_headers = await _listing_flight.do(key, run)
+            response = Response(body, status_code=status)
+            # With the headers set by the route, each request sharing the response gets its own copy
+            response.raw_headers = list(raw_headers)
+            if response.status_code != 200:
+                return response
+        response.headers["ETag"] = f'W/"{etag}"'
+        # Let clients cache the response but always revalidate it
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return wrapper
+
+
+def if_none_match_contains(header, etag):
+    """Weak comparison of an If-None-Match header against an ETag value"""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+async def stream_dicts(query):
+    return [doc.to_dict() async for doc in query.stream()]
+
+
+async def fetch_tag_name_map(user_id):
+    """Return {tagId: tagName} for all tags of the user"""
+    tags_query = async_db.collection(TAG_COLLECTION).where("userId", "==", user_id)
+    return {tag.id: tag.to_dict()["tagName"] async for tag in tags_query.stream()}
+
+
+async def fetch_directory_name_map(user_id):
+    """Return {directoryId: name} for all directories of the user"""
+    directories_query = async_db.collection(DIRECTORY_COLLECTION).where("userId", "==", user_id)
+    return {directory.id: directory.to_dict()["name"] async for directory in directories_query.stream()}
+
+
+async def fetch_name_maps(user_id, *other_awaitables):
+    """
+    Fetch the tag and directory name maps of the user concurrently, along with any other awaitables.
+    Returns (tag_map, directory_map, *results of other_awaitables).
+    """
+    return await asyncio.gather(fetch_tag_name_map(user_id), fetch_directory_name_map(user_id), *other_awaitables)
+
+
+async def stream_union(queries):
+    """Run queries concurrently, returns the documents matched by any of them, each once."""
+    documents = {}
+    for snapshots in await asyncio.gather(*(stream_snapshots(query) for query in queries)):
+        for snapshot in snapshots:
+            documents.setdefault(snapshot.reference.path, snapshot.to_dict())
+    return list(documents.values())
+
+
+async def stream_snapshots(query):
+    return [doc async for doc in query.stream()]
+
+
+async def fetch_bookmarks_with_names(bookmarks_query, user_id):
+    """
+    Run a bookmarks query and resolve the names, reading the user's tags and directories only if needed.
+    `bookmarks_query` may be a list of queries, see `stream_union`.
+    """
+    if isinstance(bookmarks_query, list):
+        bookmarks = await stream_union(bookmarks_query)
+    else:
+        bookmarks = await stream_dicts(bookmarks_query)
+    tag_map = directory_map = None
+    if needs_name_maps(bookmarks):
+        tag_map, directory_map = await fetch_name_maps(user_id)
+    return resolve_bookmark_names(bookmarks, tag_map, directory_map)
+
+
+def bookmark_content_ref(bookmark_id):
+    return async_db.collection(BOOKMARK_COLLECTION).document(bookmark_id)\
+        .collection(BOOKMARK_CONTENT_COLLECTION).document(BOOKMARK_CONTENT_DOCUMENT)
+
+
+async def fetch_bookmark(bookmark_id, include_content=False):
+    """
+    Return (bookmark snapshot, content) of a bookmark, reading its content subdocument at the same time if
+    `include_content` (content is None otherwise). See `bookmark_content` in routes_util.py.
+    """
+    bookmark_ref = async_db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
+    if not include_content:
+        return await bookmark_ref.get(), None
+    snapshot, content_snapshot = await asyncio.gather(bookmark_ref.get(), bookmark_content_ref(bookmark_id).get())
+    return snapshot, bookmark_content(snapshot.to_dict() or {}, content_snapshot.to_dict())
+
+
+async def update_bookmark_fields(bookmark_ref, fields):
+    """Async counterpart of `update_bookmark_fields` in routes_util.py."""
+    content_fields = {field: fields[field] for field in BOOKMARK_CONTENT_MODEL if field in fields}
+    if not content_fields:
+        return await bookmark_ref.update(fields)
+
+    bookmark_fields = {field: value for field, value in fields.items() if field not in content_fields}
+    bookmark_fields.update({field: firestore.DELETE_FIELD for field in content_fields})
+    batch = async_db.batch()
+    batch.update(bookmark_ref, bookmark_fields)
+    batch.set(bookmark_content_ref(bookmark_ref.id), content_fields, merge=True)
+    return (await batch.commit())[0]
+
+
+def get_http_client():
+    """Shared httpx.AsyncClient for outbound calls of the async routes, created on first use."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+                _http_client = httpx.AsyncClient(timeout=OUTBOUND_HTTP_TIMEOUT_SECONDS)
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
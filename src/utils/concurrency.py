@@ -0,0 +1,75 @@
+import os
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from src.utils.profiling import run_in_active_profile
+
+"""
+Run independent blocking calls (Firestore reads, outbound HTTP) of one request in parallel, so the request
+waits for the slowest call instead of the sum of all of them.
+
+Calls run on a process-wide thread pool, in a copy of the caller's context: the Flask request / app context and
+the metrics RequestStats stay visible, so datastore usage is still accounted to the calling request. Prefer
+capturing `request` attributes (e.g. `request.user_id`) into locals before submitting work anyway. Calls of a
+profiled request or job are profiled on their worker too, see src/utils/profiling.py.
+
+A call already running on the pool runs nested calls inline, so a saturated pool can not deadlock on itself.
+"""
+
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "32"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def get_executor():
+    """Shared thread pool, created on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+    return _executor
+
+
+def _run_in_worker(context, call):
+    _worker_state.active = True
+    try:
+        return context.run(run_in_active_profile, call)
+    finally:
+        _worker_state.active = False
+
+
+def run_concurrently(*calls):
+    """
+    Run zero-argument callables in parallel and return their results, in order.
+    The first call runs on the calling thread. If a call raises, the exception is re-raised once all calls are done.
+    """
+    if len(calls) <= 1 or getattr(_worker_state, "active", False):
+        return [call() for call in calls]
+
+    executor = get_executor()
+    futures = [executor.submit(_run_in_worker, contextvars.copy_context(), call) for call in calls[1:]]
+    try:
+        first_result = calls[0]()
+    finally:
+        # Wait for every call even on error, none of them should outlive the request
+        for future in futures:
+            future.exception()
+    return [first_result] + [future.result() for future in futures]
+
+
+def submit(call):
+    """
+    Start a zero-argument callable on the shared pool and return its Future, e.g. to prefetch the next page of
+    results while the current one is processed. Runs inline when already on the pool.
+    """
+    if getattr(_worker_state, "active", False):
+        future = Future()
+        try:
+            future.set_result(call())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return get_executor().submit(_run_in_worker, contextvars.copy_context(), call)
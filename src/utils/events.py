@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+"""
+In-process, per-user event bus pushing changes made in the background (e.g. the bookmark enrichment) to clients,
+served as Server-Sent Events (ASGI mode) or long-polling (see the event routes).
+
+Every event gets an ID "<process id>.<sequence>". The last EVENT_BUFFER_SIZE events of each user are kept so a
+client reconnecting with the last ID it saw (SSE `Last-Event-ID`) receives what it missed. When that is not
+possible (the ID is from another process or instance, or the missed events were already dropped) the client is
+told to reset, i.e. to catch up with /sync, instead of silently missing events.
+
+Events only reach clients connected to the instance that published them: the bus is not shared between
+instances. It is enabled with EVENTS_ENABLED, by default everywhere but on Vercel, where the instance running an
+enrichment is generally not the one holding the client's connection. When disabled nothing is published, the
+event routes answer 501 and clients poll /bookmark/get instead.
+"""
+
+EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "0" if os.getenv("VERCEL") == "1" else "1") == "1"
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "100"))
+# Users whose events are buffered at most, least recently active ones are dropped first
+MAX_BUFFERED_USERS = int(os.getenv("EVENT_MAX_BUFFERED_USERS", "10000"))
+
+EVENT_BOOKMARK_ENRICHED = "bookmark.enriched"
+EVENT_BOOKMARK_ENRICHMENT_FAILED = "bookmark.enrichment_failed"
+EVENT_RESET = "reset"
+
+# Identifies this process: sequences of other processes (or of a restarted one) are not comparable
+PROCESS_ID = uuid.uuid4().hex[:12]
+
+
+def parse_event_id(event_id):
+    """Return the sequence of an event ID issued by this process, None if it was issued by another one."""
+    process_id, _, sequence = (event_id or "").partition(".")
+    if process_id != PROCESS_ID or not sequence.isdigit():
+        return None
+    return int(sequence)
+
+
+def format_event_id(sequence):
+    return f"{PROCESS_ID}.{sequence}"
+
+
+class EventBus:
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE, max_users=MAX_BUFFERED_USERS, enabled=EVENTS_ENABLED):
+        self.enabled = enabled
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self._sequence = 0
+        self._buffers = OrderedDict()  # {user_id: deque of events}
+        # Sequence of the last event dropped from each buffer, and from buffers dropped altogether
+        self._dropped_through = {}
+        self._evicted_through = 0
+        self._subscribers = {}  # {user_id: set of callables notified of new events}
+        self._lock = threading.Lock()
+
+    def last_event_id(self):
+        """ID to resume from to receive only events published from now on, None if the bus is disabled."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return format_event_id(self._sequence)
+
+    def publish(self, user_id, event_type, data):
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._sequence += 1
+            event = {"id": format_event_id(self._sequence), "sequence": self._sequence, "type": event_type,
+                     "data": data, "publishedAt": int(time.time())}
+            buffer = self._buffers.get(user_id)
+            if buffer is None:
+                buffer = self._buffers[user_id] = deque(maxlen=self.buffer_size)
+                # Events of an earlier buffer of the user may have been evicted with it
+                self._dropped_through[user_id] = self._evicted_through
+                if len(self._buffers) > self.max_users:
+                    evicted_user_id, evicted = self._buffers.popitem(last=False)
+                    self._dropped_through.pop(evicted_user_id, None)
+                    self._evicted_through = max(self._evicted_through, evicted[-1]["sequence"])
+            else:
+                self._buffers.move_to_end(user_id)
+            if len(buffer) == buffer.maxlen:
+                self._dropped_through[user_id] = buffer[0]["sequence"]
+            buffer.append(event)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for notify in subscribers:
+            notify()
+        return event["id"]
+
+    def events_after(self, user_id, last_event_id):
+        """
+        Return (events published for the user after `last_event_id`, reset). `reset` is True when events may
+        have been missed and can not be replayed.
+        """
+        sequence = parse_event_id(last_event_id)
+        with self._lock:
+            if sequence is None or sequence > self._sequence:
+                return [], True
+            if user_id in self._buffers:
+                dropped_through = self._dropped_through.get(user_id, 0)
+            else:
+                dropped_through = self._evicted_through
+            if sequence < dropped_through:
+                return [], True
+            buffer = list(self._buffers.get(user_id, ()))
+        return [event for event in buffer if event["sequence"] > sequence], False
+
+    def subscribe(self, user_id, notify):
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(notify)
+
+    def unsubscribe(self, user_id, notify):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(notify)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def wait_for_events(self, user_id, last_event_id, timeout):
+        """Block until events follow `last_event_id`, for at most `timeout` seconds. Returns (events, reset)."""
+        published = threading.Event()
+        self.subscribe(user_id, published.set)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                events, reset = self.events_after(user_id, last_event_id)
+                remaining = deadline - time.monotonic()
+                if events or reset or remaining <= 0:
+                    return events, reset
+                published.wait(remaining)
+                published.clear()
+        finally:
+            self.unsubscribe(user_id, published.set)
+
+    async def wait_for_events_async(self, user_id, last_event_id, timeout):
+        """Same as `wait_for_events` without blocking the event loop. Events are published from other threads."""
+        loop = asyncio.get_running_loop()
+        published = asyncio.Event()
+
+        def notify():
+            loop.call_soon_threadsafe(published.set)
+
+        self.subscribe(user_id, notify)
+        try:
+            deadline = loop.time() + timeout
+            while True:
+                events, reset = self.events_after(user_id, last_event_id)
+                remaining = deadline - loop.time()
+                if events or reset or remaining <= 0:
+                    return events, reset
+                try:
+                    await asyncio.wait_for(published.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                published.clear()
+        finally:
+            self.unsubscribe(user_id, notify)
+
+
+def to_client_event(event):
+    return {"id": event["id"], "type": event["type"], "data": event["data"], "publishedAt": event["publishedAt"]}
+
+
+def format_sse(event_type, data, event_id=None):
+    """Format a Server-Sent Event"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Event bus of the process
+event_bus = EventBus()
@@ -0,0 +1,132 @@
+import csv
+import html
+import io
+import json
+
+"""
+Bookmark export formats, see /bookmark/export.
+
+Every format is a generator turning an iterator of export records (see `export_record`) into text, so an export
+is written out as the bookmarks are read: memory use does not depend on the number of bookmarks.
+"""
+
+# Fields read from the bookmark documents, the content and enrichment fields are not exported
+EXPORT_FIELDS = ["bookmarkId", "url", "title", "notes", "tags", "tagNames", "directoryId", "directoryName",
+                 "isFavorite", "imageUrl", "linkStatus", "createdAt", "updatedAt"]
+CSV_COLUMNS = ["bookmarkId", "url", "title", "notes", "tags", "directoryId", "directoryName", "isFavorite",
+               "imageUrl", "linkStatus", "createdAt", "updatedAt"]
+CSV_TAG_SEPARATOR = ","
+
+# Output is sent in chunks of about this size instead of one per bookmark
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def export_record(bookmark, tag_map, directory_map, default_directory):
+    """
+    Exported fields of a bookmark, with its tag and directory names. Bookmarks written before the names were
+    denormalized on them are resolved from the name maps.
+    """
+    record = {field: bookmark.get(field, "") for field in EXPORT_FIELDS if field != "tagNames"}
+    if "tagNames" in bookmark:
+        record["tags"] = bookmark["tagNames"]
+    else:
+        record["tags"] = [tag_map[tag_id] for tag_id in bookmark.get("tags", []) if tag_id in tag_map]
+    if "directoryName" not in bookmark:
+        record["directoryName"] = directory_map.get(bookmark.get("directoryId"), default_directory)
+    record["isFavorite"] = bool(bookmark.get("isFavorite"))
+    return record
+
+
+def export_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def export_csv(records):
+    # One row is written at a time to a reused buffer
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow({**record, "tags": CSV_TAG_SEPARATOR.join(record["tags"])})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_netscape_html(records, folders):
+    """
+    Netscape bookmark file, imported by every browser. `records` are written at the top level, then `folders`, an
+    iterable of (folder name, records, subfolders) where subfolders are nested folders of the same form. Folders
+    without bookmarks, in them or in their subfolders, are left out.
+    """
+    yield (
+        "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+        "<META HTTP-EQUIV=\"Content-Type\" CONTENT=\"text/html; charset=UTF-8\">\n"
+        "<TITLE>Bookmarks</TITLE>\n"
+        "<H1>Bookmarks</H1>\n"
+        "<DL><p>\n"
+    )
+    for record in records:
+        yield "    " + netscape_entry(record)
+    for folder in folders:
+        yield from netscape_folder(*folder, depth=1)
+    yield "</DL><p>\n"
+
+
+def netscape_folder(folder_name, records, subfolders, depth):
+    # The folder is opened with its first bookmark, which may be in a subfolder
+    indent = "    " * depth
+
+    def contents():
+        for record in records:
+            yield indent + "    " + netscape_entry(record)
+        for subfolder in subfolders:
+            yield from netscape_folder(*subfolder, depth=depth + 1)
+
+    opened = False
+    for part in contents():
+        if not opened:
+            yield f"{indent}<DT><H3>{html.escape(folder_name)}</H3>\n{indent}<DL><p>\n"
+            opened = True
+        yield part
+    if opened:
+        yield f"{indent}</DL><p>\n"
+
+
+def netscape_entry(record):
+    attributes = [f'HREF="{html.escape(record["url"] or "")}"']
+    if record["createdAt"]:
+        attributes.append(f'ADD_DATE="{record["createdAt"]}"')
+    if record["updatedAt"]:
+        attributes.append(f'LAST_MODIFIED="{record["updatedAt"]}"')
+    if record["tags"]:
+        attributes.append(f'TAGS="{html.escape(",".join(record["tags"]))}"')
+    entry = f'<DT><A {" ".join(attributes)}>{html.escape(record["title"] or record["url"] or "")}</A>\n'
+    if record["notes"]:
+        entry += f"<DD>{html.escape(record['notes'])}\n"
+    return entry
+
+
+def chunked(parts, chunk_size=EXPORT_CHUNK_SIZE):
+    """Join small pieces of text into chunks of about `chunk_size` characters."""
+    chunk = []
+    size = 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+# Format name -> (content type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "html": ("text/html; charset=utf-8", "html"),
+}
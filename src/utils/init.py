@@ -1,18 +1,35 @@
 import os
 import json
+import threading
 from flask import Flask
-from firebase_admin import credentials, initialize_app, firestore
+from src.utils.storage import STORAGE_BACKENDS, STORAGE_BACKEND_FIRESTORE, STORAGE_BACKEND_MEMORY
+from src.utils.storage.instrumented import InstrumentedClient
+from src.utils.metrics import register_request_metrics
+from src.utils.profiling import register_request_profiling
 
 # Check if running on Vercel
 ON_VERCEL = os.getenv("VERCEL") == "1"
 
+# Threads of the waitress server (index.py), its default is 4
+WAITRESS_THREADS = int(os.getenv("WAITRESS_THREADS", "16"))
+
+# Storage backend used by the routes, see src/utils/storage
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", STORAGE_BACKEND_FIRESTORE)
+
 def create_app():
     app = Flask(__name__)
     # Additional Flask app configurations can go here
+    register_request_metrics(app)
+    register_request_profiling(app)
     return app
 
-# Initialize Firebase and Firestore
-def init_firestore():
+# Initialize the Firebase app, once for the sync and async Firestore clients
+def init_firebase_app():
+    from firebase_admin import credentials, initialize_app, get_app
+    try:
+        return get_app()
+    except ValueError:
+        pass
     if ON_VERCEL:
         # Running on Vercel: Load credentials from environment variable
         firebase_creds = json.loads(os.getenv("FIREBASE_CREDENTIALS"))
@@ -20,8 +37,69 @@ def init_firestore():
     else:
      # Running Locally: Load from file
         cred = credentials.Certificate("credentials_firebase/firebase-adminsdk.json")
-    initialize_app(cred)
+    return initialize_app(cred)
+
+# Initialize Firebase and Firestore
+def init_firestore():
+    from firebase_admin import firestore
+    init_firebase_app()
     return firestore.client()
 
-# Create a global Firestore client
-db = init_firestore()
+# Initialize the configured storage backend
+def init_db():
+    if STORAGE_BACKEND not in STORAGE_BACKENDS:
+        raise ValueError(f"Invalid STORAGE_BACKEND: {STORAGE_BACKEND}. Must be one of {', '.join(STORAGE_BACKENDS)}")
+    if STORAGE_BACKEND == STORAGE_BACKEND_MEMORY:
+        from src.utils.storage.memory_store import MemoryClient
+        # Optional simulated round trip latency, to benchmark against datastore latencies close to Firestore's
+        return MemoryClient(latency=float(os.getenv("MEMORY_STORE_LATENCY_MS", "0")) / 1000)
+    return init_firestore()
+
+_db_client = None
+_db_client_lock = threading.RLock()  # Reentrant: the async client of the memory backend is built on the sync one
+
+# Return the storage client, instrumented to account datastore usage per request.
+# It is created on first use (not at import) to keep credentials parsing and client creation out of cold starts.
+def get_db():
+    global _db_client
+    if _db_client is None:
+        with _db_client_lock:
+            if _db_client is None:
+                _db_client = InstrumentedClient(init_db())
+    return _db_client
+
+class LazyClient:
+    """Stand-in for the storage client forwarding every attribute to `get_client()`, so it can be imported eagerly."""
+    def __init__(self, get_client):
+        self._get_client = get_client
+
+    def __getattr__(self, name):
+        return getattr(self._get_client(), name)
+
+# Global storage client used by the routes
+db = LazyClient(get_db)
+
+# Initialize the async client of the configured storage backend, used by the async routes (see asgi.py)
+def init_async_db():
+    if STORAGE_BACKEND == STORAGE_BACKEND_MEMORY:
+        from src.utils.storage.async_memory_store import AsyncMemoryClient
+        # Share the documents of the sync client, the Flask routes serve the rest of the API in the same process
+        return AsyncMemoryClient(get_db()._wrapped)
+    from firebase_admin import firestore_async
+    init_firebase_app()
+    return firestore_async.client()
+
+_async_db_client = None
+
+# Return the async storage client, instrumented like `get_db()`. Created on first use.
+def get_async_db():
+    global _async_db_client
+    if _async_db_client is None:
+        with _db_client_lock:
+            if _async_db_client is None:
+                from src.utils.storage.async_instrumented import AsyncInstrumentedClient
+                _async_db_client = AsyncInstrumentedClient(init_async_db())
+    return _async_db_client
+
+# Global async storage client used by the async routes
+async_db = LazyClient(get_async_db)
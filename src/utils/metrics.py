@@ -0,0 +1,293 @@
+import threading
+import time
+from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+"""
+Minimal Prometheus metrics registry and per-request datastore / outbound HTTP accounting.
+
+The storage client is wrapped by `InstrumentedClient` (src/utils/storage/instrumented.py), which records every
+document read, document written, query and the time spent on them into the `RequestStats` of the current
+context. Flask request hooks (see `register_request_metrics`) create one `RequestStats` per request, export it
+as Prometheus metrics labelled by route and add it to the response as a `Server-Timing` header.
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+BACKGROUND_ROUTE_PREFIX = "background:"
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}  # {label values: [bucket counts..., sum, count]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for index, bound in enumerate(self.buckets):
+                    labels = _format_labels(self.label_names + ("le",), key + (_format_number(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {series[index]}")
+                labels = _format_labels(self.label_names + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = [value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for value in values]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+REGISTRY = Registry()
+
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "bookmarkai_requests_total", "HTTP requests handled.", ("route", "method", "status")))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "bookmarkai_request_duration_seconds", "Time spent handling a request, or a background job.", ("route", "method")))
+DATASTORE_DURATION = REGISTRY.register(Histogram(
+    "bookmarkai_datastore_duration_seconds", "Time spent in datastore calls per request.", ("route", "method")))
+DATASTORE_READS = REGISTRY.register(Histogram(
+    "bookmarkai_datastore_documents_read", "Documents read per request.", ("route", "method"), COUNT_BUCKETS))
+DATASTORE_WRITES = REGISTRY.register(Histogram(
+    "bookmarkai_datastore_documents_written", "Documents written per request.", ("route", "method"), COUNT_BUCKETS))
+DATASTORE_QUERIES = REGISTRY.register(Histogram(
+    "bookmarkai_datastore_queries", "Queries and multi-document reads issued per request.", ("route", "method"), COUNT_BUCKETS))
+DATASTORE_READS_TOTAL = REGISTRY.register(Counter(
+    "bookmarkai_datastore_documents_read_total", "Documents read.", ("route", "method")))
+DATASTORE_WRITES_TOTAL = REGISTRY.register(Counter(
+    "bookmarkai_datastore_documents_written_total", "Documents written.", ("route", "method")))
+DATASTORE_QUERIES_TOTAL = REGISTRY.register(Counter(
+    "bookmarkai_datastore_queries_total", "Queries and multi-document reads issued.", ("route", "method")))
+# Upstream labels of the calls to bookmarked pages and their images, which may be on any host
+OUTBOUND_PAGE = "page"
+OUTBOUND_IMAGE = "image"
+OUTBOUND_HTTP_TOTAL = REGISTRY.register(Counter(
+    "bookmarkai_outbound_http_requests_total", "Outbound HTTP calls.", ("route", "upstream", "outcome")))
+OUTBOUND_HTTP_DURATION = REGISTRY.register(Histogram(
+    "bookmarkai_outbound_http_duration_seconds", "Time spent in outbound HTTP calls.", ("route", "upstream")))
+OUTBOUND_HTTP_REJECTED = REGISTRY.register(Counter(
+    "bookmarkai_outbound_http_rejected_total", "Outbound HTTP calls not attempted (circuit open, deadline exceeded).",
+    ("route", "upstream", "reason")))
+CIRCUIT_BREAKER_OPENED = REGISTRY.register(Counter(
+    "bookmarkai_circuit_breaker_opened_total", "Circuit breakers opened after repeated failures.", ("upstream",)))
+SINGLEFLIGHT_SHARED = REGISTRY.register(Counter(
+    "bookmarkai_singleflight_shared_total", "Duplicate calls served by the result of an identical in-flight call.",
+    ("name",)))
+ENRICHMENT_FALLBACKS = REGISTRY.register(Counter(
+    "bookmarkai_enrichment_fallbacks_total", "Enrichment steps that fell back to a local result.", ("step",)))
+CONTENT_REFRESH_CHECKS = REGISTRY.register(Counter(
+    "bookmarkai_content_refresh_checks_total", "Bookmarked pages revalidated by the content refresh.", ("outcome",)))
+
+
+class RequestStats:
+    """Datastore and outbound HTTP cost of one request (or one background job)."""
+    def __init__(self, route, method=""):
+        self.route = route
+        self.method = method
+        self.started_at = time.perf_counter()
+        self.documents_read = 0
+        self.documents_written = 0
+        self.queries = 0
+        self.datastore_seconds = 0.0
+        self.http_calls = 0
+        self.http_seconds = 0.0
+        # Calls of one request may run concurrently, see src/utils/concurrency.py
+        self._lock = threading.Lock()
+
+    def record_datastore(self, seconds, reads=0, writes=0, queries=0):
+        with self._lock:
+            self.datastore_seconds += seconds
+            self.documents_read += reads
+            self.documents_written += writes
+            self.queries += queries
+
+    def record_http(self, upstream, seconds, outcome):
+        with self._lock:
+            self.http_calls += 1
+            self.http_seconds += seconds
+        OUTBOUND_HTTP_TOTAL.inc(route=self.route, upstream=upstream, outcome=outcome)
+        OUTBOUND_HTTP_DURATION.observe(seconds, route=self.route, upstream=upstream)
+
+    def finish(self, status=""):
+        elapsed = time.perf_counter() - self.started_at
+        labels = {"route": self.route, "method": self.method}
+        if not self.route.startswith(BACKGROUND_ROUTE_PREFIX):
+            REQUESTS_TOTAL.inc(status=status, **labels)
+        REQUEST_DURATION.observe(elapsed, **labels)
+        DATASTORE_DURATION.observe(self.datastore_seconds, **labels)
+        DATASTORE_READS.observe(self.documents_read, **labels)
+        DATASTORE_WRITES.observe(self.documents_written, **labels)
+        DATASTORE_QUERIES.observe(self.queries, **labels)
+        DATASTORE_READS_TOTAL.inc(self.documents_read, **labels)
+        DATASTORE_WRITES_TOTAL.inc(self.documents_written, **labels)
+        DATASTORE_QUERIES_TOTAL.inc(self.queries, **labels)
+        return elapsed
+
+    def server_timing(self, total_seconds):
+        return ", ".join([
+            f'datastore;dur={self.datastore_seconds * 1000:.1f};desc="reads={self.documents_read} '
+            f'writes={self.documents_written} queries={self.queries}"',
+            f'http;dur={self.http_seconds * 1000:.1f};desc="calls={self.http_calls}"',
+            f"total;dur={total_seconds * 1000:.1f}",
+        ])
+
+
+# Stats of the request (or background job) running in the current context. Calls outside of any are not recorded.
+_current_stats = ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def record_datastore(seconds, reads=0, writes=0, queries=0):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record_datastore(seconds, reads, writes, queries)
+
+
+@contextmanager
+def track_request(route, method):
+    """Account the calls made within the block to a new RequestStats, for requests served outside of Flask (asgi.py)."""
+    stats = RequestStats(route, method)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def track_background(name):
+    """Account the datastore and HTTP calls of a background job (e.g. the bookmark enrichment) as its own route."""
+    stats = RequestStats(BACKGROUND_ROUTE_PREFIX + name)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        stats.finish()
+
+
+def background_job(name):
+    """Decorator running a function under `track_background(name)`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_background(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def track_outbound_http(upstream):
+    """
+    Time an outbound HTTP call. `upstream` is the label of the call: the host of a fixed upstream (e.g. the LLM API),
+    or the kind of call for those to any host (OUTBOUND_PAGE, OUTBOUND_IMAGE), so the label values stay bounded.
+    """
+    started_at = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record_http(upstream, time.perf_counter() - started_at, outcome)
+
+
+def record_outbound_rejected(upstream, reason):
+    stats = _current_stats.get()
+    OUTBOUND_HTTP_REJECTED.inc(route=stats.route if stats is not None else "", upstream=upstream, reason=reason)
+
+
+def register_request_metrics(app):
+    """Register Flask hooks creating the RequestStats of each request and adding the Server-Timing header."""
+    from flask import request
+
+    @app.before_request
+    def start_request_stats():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request.metrics_token = _current_stats.set(RequestStats(route, request.method))
+
+    @app.after_request
+    def finish_request_stats(response):
+        stats = _current_stats.get()
+        if stats is not None:
+            elapsed = stats.finish(str(response.status_code))
+            response.headers["Server-Timing"] = stats.server_timing(elapsed)
+        return response
+
+    @app.teardown_request
+    def reset_request_stats(exception=None):
+        token = getattr(request, "metrics_token", None)
+        if token is not None:
+            try:
+                _current_stats.reset(token)
+            except ValueError:
+                # Token created in another context, nothing to restore
+                pass
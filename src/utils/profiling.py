@@ -0,0 +1,269 @@
+import cProfile
+import contextvars
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+
+"""
+Opt-in cProfile hook for requests and background jobs.
+
+A request is profiled when it carries the `X-Profile` header set to ADMIN_TOKEN, or when it is picked by
+PROFILE_SAMPLE_RATE (0 to 1, default 0). Background jobs decorated with `profiled_job` are picked by the sample
+rate, or profiled when the request that started them was (see `bind_profiling`).
+
+Profiles are written to PROFILE_DIR as `<id>.prof` (pstats format) plus `<id>.json` metadata, keeping at most
+PROFILE_MAX_COUNT profiles no older than PROFILE_MAX_AGE_SECONDS. They can be listed and downloaded through
+the admin APIs. When profiling is off the cost per request is a header lookup and a float comparison.
+
+Up to Python 3.11 cProfile only sees the thread that enabled it. The calls a profiled request or job runs on the
+fan-out pool (src/utils/concurrency.py) are profiled on their worker, each with its own profiler, and merged into
+its profile when it is saved. From Python 3.12 cProfile sees every thread of the process: a profile then also
+contains the requests and jobs that ran at the same time. The metadata of a profile records which (`scope`).
+"""
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "bookmarkai-profiles"))
+PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "50"))
+PROFILE_MAX_AGE_SECONDS = int(os.getenv("PROFILE_MAX_AGE_SECONDS", str(24 * 60 * 60)))
+
+# Only one profile runs at a time, from 3.12 cProfile hooks the whole interpreter. Others are skipped, not queued,
+# except background jobs started by a profiled request which wait for it to finish.
+_active_profile_lock = threading.Lock()
+BOUND_JOB_PROFILE_WAIT_SECONDS = 30
+
+# "request": the thread of the request or job and its fan-out calls, "process": every thread
+PROFILE_SCOPE = "process" if sys.version_info >= (3, 12) else "request"
+
+# Profile of the request or job running in this context, copied to its fan-out calls
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+def is_admin_token(value):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    # Compared as bytes, compare_digest rejects non-ASCII strings
+    return bool(admin_token) and bool(value) and hmac.compare_digest(value.encode(), admin_token.encode())
+
+
+def _sampled():
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class _ActiveProfile:
+    def __init__(self, name, details):
+        self.name = name
+        self.details = details
+        self.profile = cProfile.Profile()
+        self.worker_profiles = []  # Profiles of the fan-out calls, see `run_in_active_profile`
+        self.worker_profiles_lock = threading.Lock()
+        self.stopped = False
+        self.started_at = time.time()
+        self.started_counter = time.perf_counter()
+
+    @classmethod
+    def start(cls, name, details=None, wait=0):
+        """Start a profile, waiting at most `wait` seconds for the running one to finish. None if skipped."""
+        acquired = _active_profile_lock.acquire(timeout=wait) if wait else _active_profile_lock.acquire(blocking=False)
+        if not acquired:
+            return None
+        active = cls(name, details or {})
+        try:
+            active.profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already hooked into the interpreter
+            _active_profile_lock.release()
+            return None
+        _current_profile.set(active)
+        return active
+
+    def add_worker_profile(self, profile):
+        with self.worker_profiles_lock:
+            # A call that outlived the profile is left out
+            if not self.stopped:
+                self.worker_profiles.append(profile)
+
+    def stop(self):
+        """Stop profiling and save the profile. Returns the profile ID, or None if it could not be saved."""
+        try:
+            self.profile.disable()
+            duration = time.perf_counter() - self.started_counter
+        finally:
+            _current_profile.set(None)
+            with self.worker_profiles_lock:
+                self.stopped = True
+            _active_profile_lock.release()
+        try:
+            return save_profile([self.profile] + self.worker_profiles, self.name, duration, self.started_at,
+                                self.details)
+        except OSError as e:
+            print(f"❌ Could not save profile: {str(e)}")
+            return None
+
+
+def run_in_active_profile(call):
+    """
+    Run a fan-out call on its pool worker, profiled into the profile of the request or job that submitted it if
+    there is one (the context of the call is a copy of the caller's).
+    """
+    active = _current_profile.get()
+    if active is None:
+        return call()
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # From 3.12 the profile of the caller already sees this thread
+        return call()
+    try:
+        return call()
+    finally:
+        profile.disable()
+        active.add_worker_profile(profile)
+
+
+def save_profile(profiles, name, duration, started_at, details):
+    """Save `profiles`, the profile of a request or job and those of its fan-out calls, merged into one."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"profile-{uuid.uuid4()}"
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        try:
+            stats.add(profile)
+        except TypeError:
+            # Nothing recorded, from 3.12 the caller's profile recorded it
+            continue
+    stats.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    metadata = {
+        "profileId": profile_id,
+        "name": name,
+        "durationMs": round(duration * 1000, 2),
+        "createdAt": int(started_at),
+        "scope": PROFILE_SCOPE,
+        "workerCalls": len(profiles) - 1,
+        **details
+    }
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as metadata_file:
+        json.dump(metadata, metadata_file)
+    prune_profiles()
+    return profile_id
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for file_name in os.listdir(PROFILE_DIR):
+        if file_name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, file_name)) as metadata_file:
+                    profiles.append(json.load(metadata_file))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda profile: profile.get("createdAt", 0), reverse=True)
+
+
+def prune_profiles():
+    """Apply the retention policy: drop profiles beyond PROFILE_MAX_COUNT or older than PROFILE_MAX_AGE_SECONDS."""
+    oldest_allowed = time.time() - PROFILE_MAX_AGE_SECONDS
+    for index, profile in enumerate(list_profiles()):
+        if index >= PROFILE_MAX_COUNT or profile.get("createdAt", 0) < oldest_allowed:
+            delete_profile(profile["profileId"])
+
+
+def delete_profile(profile_id):
+    for extension in (".prof", ".json"):
+        try:
+            os.remove(os.path.join(PROFILE_DIR, profile_id + extension))
+        except FileNotFoundError:
+            pass
+
+
+def get_profile_path(profile_id):
+    """Path of a stored profile, or None if it does not exist. Only IDs returned by `list_profiles` are accepted."""
+    if profile_id not in {profile["profileId"] for profile in list_profiles()}:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
+
+
+def format_profile(path, sort_by="cumulative", limit=50):
+    """Human readable summary of a stored profile."""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).strip_dirs().sort_stats(sort_by).print_stats(limit)
+    return output.getvalue()
+
+
+def register_request_profiling(app):
+    """Register Flask hooks profiling the requests picked by the header or the sample rate."""
+    from flask import request, g
+
+    @app.before_request
+    def start_request_profile():
+        if not (is_admin_token(request.headers.get(PROFILE_HEADER)) or _sampled()):
+            return
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.active_profile = _ActiveProfile.start(route, {
+            "method": request.method,
+            "path": request.full_path,
+            "userId": request.headers.get("userId", "")
+        })
+
+    @app.after_request
+    def stop_request_profile(response):
+        active = g.pop("active_profile", None)
+        if active:
+            profile_id = active.stop()
+            if profile_id:
+                response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    @app.teardown_request
+    def stop_request_profile_on_error(exception=None):
+        # after_request does not run when the request failed with an unhandled exception
+        active = g.pop("active_profile", None)
+        if active:
+            active.stop()
+
+
+def bind_profiling(func):
+    """
+    Wrap a background job target, from within a request, so that it is profiled if the request is.
+    Used when starting the enrichment thread from create_bookmark.
+    """
+    from flask import g
+    force = "active_profile" in g and g.active_profile is not None
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, _force_profile=force, **kwargs)
+    return wrapper
+
+
+def profiled_job(name):
+    """Decorator profiling a background job when sampled, or when called with `_force_profile=True`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, _force_profile=False, **kwargs):
+            if _force_profile:
+                active = _ActiveProfile.start(name, wait=BOUND_JOB_PROFILE_WAIT_SECONDS)
+            else:
+                active = _ActiveProfile.start(name) if _sampled() else None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if active:
+                    active.stop()
+        return wrapper
+    return decorator
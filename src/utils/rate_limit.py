@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+
+"""
+Rate limits of background jobs making many outbound calls (e.g. the content refresh, src/jobs/content_refresh.py).
+
+`TokenBucket` bounds the overall rate of calls, `HostSpacing` keeps a minimum interval between two calls to the
+same host so a batch of bookmarks from one site does not hammer it.
+"""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate  # Tokens added per second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting for at most `timeout` seconds (forever if None). Returns False if none came."""
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if give_up_at is not None:
+                if now + wait > give_up_at:
+                    return False
+            time.sleep(wait)
+
+
+class HostSpacing:
+    def __init__(self, min_interval, max_hosts=10000):
+        self.min_interval = min_interval
+        self.max_hosts = max_hosts
+        self._last_call_at = OrderedDict()  # {host: monotonic time of the last call}
+        self._lock = threading.Lock()
+
+    def try_reserve(self, host):
+        """Record a call to `host` now, unless the previous one was less than `min_interval` ago (returns False)."""
+        with self._lock:
+            now = time.monotonic()
+            last_call_at = self._last_call_at.get(host)
+            if last_call_at is not None and now - last_call_at < self.min_interval:
+                return False
+            self._last_call_at[host] = now
+            self._last_call_at.move_to_end(host)
+            if len(self._last_call_at) > self.max_hosts:
+                self._last_call_at.popitem(last=False)
+            return True
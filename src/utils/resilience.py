@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+from src.utils.metrics import track_outbound_http, record_outbound_rejected, CIRCUIT_BREAKER_OPENED
+
+"""
+Deadlines and circuit breakers for outbound calls (page fetches, tag generation).
+
+A job or request sets its time budget with `deadline_scope(seconds)`. Every outbound call made within it goes
+through `outbound_call(url, max_seconds)`, which derives the call timeout from what is left of the budget, so a
+job never runs past its budget however many calls it makes. The deadline is a context variable: it follows
+calls submitted through `run_concurrently` (src/utils/concurrency.py).
+
+Each upstream host has its own circuit breaker. After CIRCUIT_FAILURE_THRESHOLD consecutive failures calls to
+the host fail fast with `CircuitOpenError` for CIRCUIT_RESET_SECONDS, then a single trial call decides whether
+the circuit closes again. Callers catch `OutboundCallError` (or any error of the call) and fall back.
+"""
+
+# Connection timeout of outbound calls, the rest of the budget is for the response
+OUTBOUND_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OUTBOUND_CONNECT_TIMEOUT_SECONDS", "5"))
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Bookmarked pages span any number of hosts, least recently used breakers are dropped past this count
+MAX_CIRCUIT_BREAKERS = 1024
+
+
+class OutboundCallError(Exception):
+    """An outbound call was not attempted."""
+    reason = "error"
+
+
+class DeadlineExceeded(OutboundCallError):
+    reason = "deadline"
+
+
+class CircuitOpenError(OutboundCallError):
+    reason = "circuit_open"
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"Circuit open for {upstream}, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def timeout(self, max_seconds=None):
+        """Seconds left, capped by `max_seconds`. Raises DeadlineExceeded if none are."""
+        self.check()
+        remaining = self.remaining()
+        return remaining if max_seconds is None else min(remaining, max_seconds)
+
+
+_current_deadline = ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds):
+    """Run the block with a deadline `seconds` from now, or the enclosing deadline if it is earlier."""
+    deadline = Deadline(seconds)
+    enclosing = _current_deadline.get()
+    if enclosing is not None and enclosing.expires_at < deadline.expires_at:
+        deadline = enclosing
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be attempted."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            retry_after = self.opened_at + self.reset_seconds - time.monotonic()
+            if retry_after > 0 or self.trial_in_flight:
+                raise CircuitOpenError(self.name, max(retry_after, 0))
+            # Half open: let this call through as the trial
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self, label=None):
+        """`label`: upstream label of the failed call in metrics, the breaker's name by default."""
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                CIRCUIT_BREAKER_OPENED.inc(upstream=label or self.name)
+            self.trial_in_flight = False
+
+
+_breakers = OrderedDict()
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(upstream):
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(upstream)
+            if len(_breakers) > MAX_CIRCUIT_BREAKERS:
+                _breakers.popitem(last=False)
+        else:
+            _breakers.move_to_end(upstream)
+        return breaker
+
+
+@contextmanager
+def outbound_call(url, max_seconds, label=None):
+    """
+    Guard an outbound call to `url`: fail fast if the host's circuit is open or the deadline has passed, time it
+    (see metrics.track_outbound_http) and record its outcome in the circuit breaker. Yields the Deadline of the
+    call, at most `max_seconds` away; pass `deadline.remaining()` as the client timeout. Errors raised in the
+    block count as failures of the host. `label` is the upstream label of the call in metrics (timings,
+    rejections, circuits opened), the host by default: pass one for calls to any host (e.g. metrics.OUTBOUND_PAGE),
+    the breakers of their hosts do not bound the metric series.
+    """
+    upstream = urlparse(url).hostname or url
+    label = label or upstream
+    breaker = get_circuit_breaker(upstream)
+    enclosing = current_deadline()
+    try:
+        timeout = max_seconds if enclosing is None else enclosing.timeout(max_seconds)
+        breaker.before_call()
+    except OutboundCallError as e:
+        record_outbound_rejected(label, e.reason)
+        raise
+
+    with track_outbound_http(label), deadline_scope(timeout) as deadline:
+        try:
+            yield deadline
+        except BaseException:
+            breaker.record_failure(label)
+            raise
+        breaker.record_success()
+
+
+def request_timeout(deadline):
+    """(connect, read) timeout for `requests`, from the Deadline yielded by `outbound_call`."""
+    remaining = max(deadline.remaining(), 0.001)
+    return min(OUTBOUND_CONNECT_TIMEOUT_SECONDS, remaining), remaining
@@ -1,13 +1,24 @@
-from flask import jsonify, request
+from flask import jsonify, request, make_response, Response
 from functools import wraps
+from firebase_admin import firestore
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
 from src.utils.init import db
+import os
+import unicodedata
 import uuid
 from datetime import datetime, timezone
 from src.models.user_model import USER_COLLECTION
-from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.bookmark_model import BOOKMARK_COLLECTION, BOOKMARK_CONTENT_COLLECTION, BOOKMARK_CONTENT_DOCUMENT, \
+    BOOKMARK_CONTENT_MODEL
 from src.models.tag_model import TAG_CREATOR, TAG_COLLECTION, TAG_ID_PREFIX
-from src.utils.tagGeneration.fetch_page_content import fetch_page_content
-from src.utils.tagGeneration.generate_tags import generate_tags
+from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.utils.concurrency import run_concurrently, submit
+from src.utils.metrics import background_job, ENRICHMENT_FALLBACKS
+from src.utils.profiling import profiled_job, is_admin_token
+from src.utils.resilience import deadline_scope
+from src.utils.singleflight import SingleFlight
+from src.utils.events import event_bus, EVENT_BOOKMARK_ENRICHED, EVENT_BOOKMARK_ENRICHMENT_FAILED
 import traceback
 
 """
@@ -33,10 +44,71 @@ def authorize_user(func):
         if not user_ref.exists:
             return jsonify({"error": "Unauthorized Access: Invalid userId provided"}), 401
         request.user_id = user_id  # Attach userId to the request context
+        # The user document doubles as the per-user data version, see `bump_data_version`
+        request.data_version = user_ref.to_dict().get("dataVersion", 0)
         return func(*args, **kwargs)
     return wrapper
 
 
+"""
+Decorator restricting the wrapped API routes to operators holding ADMIN_TOKEN, sent in the `adminToken` header.
+Admin APIs are disabled when ADMIN_TOKEN is not configured.
+Schedulers that can only send `Authorization: Bearer <token>` (e.g. Vercel cron jobs, with CRON_SECRET set to
+ADMIN_TOKEN) are accepted too.
+"""
+def authorize_admin(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        scheme, _, bearer_token = request.headers.get("Authorization", "").partition(" ")
+        token = request.headers.get("adminToken") or (bearer_token if scheme.lower() == "bearer" else None)
+        if not is_admin_token(token):
+            return jsonify({"error": "Unauthorized Access: Missing or invalid adminToken in header"}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+
+"""
+Bump the per-user data version. Must be called by every path that writes bookmarks, tags or directories
+of a user, after the write, so that listing ETags change and clients refetch.
+"""
+def bump_data_version(user_id):
+    db.collection(USER_COLLECTION).document(user_id).update({"dataVersion": firestore.Increment(1)})
+
+
+"""
+Decorator for listing GET routes (must be placed below `authorize_user`) that adds an ETag derived from the
+per-user data version. If the client sends a matching `If-None-Match`, answer `304` without running the route,
+so an unchanged poll only costs the user document read done by `authorize_user`.
+Identical requests (same user, path, query and data version) arriving while one is running share its response,
+see src/utils/singleflight.py.
+"""
+def conditional_get(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        etag = f"v{request.data_version}"
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            key = (request.user_id, request.path, tuple(sorted(request.args.items(multi=True))), request.data_version)
+            status, headers, body = _listing_flight.do(key, lambda: _freeze_response(make_response(func(*args, **kwargs))))
+            response = Response(body, status=status, headers=headers)
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # Let clients cache the response but always revalidate it
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return wrapper
+
+
+_listing_flight = SingleFlight("listing")
+
+
+def _freeze_response(response):
+    # A Response object belongs to the request that made it, requests sharing it get their own copy
+    return response.status_code, list(response.headers.items()), response.get_data()
+
+
 """
 Utility function to validate_required_fields
 """
@@ -47,6 +119,187 @@ def validate_required_fields(data, required_fields):
     return True, ""
 
 
+"""
+Parse the optional `updateTime` of a write request body, as returned by the read APIs (RFC 3339).
+Clients send it to make the write a no-op with 412 if the document changed since they read it.
+"""
+def parse_update_time(data):
+    update_time = (data or {}).get("updateTime")
+    if not update_time:
+        return None
+    try:
+        return DatetimeWithNanoseconds.from_rfc3339(update_time)
+    except ValueError:
+        raise ValueError(f"Invalid updateTime: {update_time}")
+
+
+MAX_PAGE_SIZE = 500
+
+"""
+Parse a comma separated query parameter (e.g. "tag1,tag2") into a list, ignoring empty entries.
+"""
+def parse_list_param(value):
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+"""
+Parse an optional boolean query parameter. Returns None when the parameter is absent.
+"""
+def parse_bool_param(value):
+    if value is None or value == "":
+        return None
+    if value.lower() in ("true", "1", "yes"):
+        return True
+    if value.lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+"""
+Parse `offset` and `limit` query parameters. `limit` defaults to MAX_PAGE_SIZE and is capped by it.
+"""
+def parse_pagination(args):
+    try:
+        offset = int(args.get("offset", 0))
+        limit = int(args.get("limit", MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("offset and limit must be integers")
+    if offset < 0 or limit < 0:
+        raise ValueError("offset and limit must be non-negative")
+    return offset, min(limit, MAX_PAGE_SIZE)
+
+
+MAX_BATCH_GET_IDS = 500
+
+"""
+Validate the list of IDs of a batch request body. Returns the IDs without duplicates, in request order.
+"""
+def parse_batch_ids(data, field):
+    ids = data.get(field) if data else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError(f"{field} must be a non-empty list")
+    if not all(isinstance(doc_id, str) and doc_id for doc_id in ids):
+        raise ValueError(f"{field} must only contain non-empty strings")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_GET_IDS:
+        raise ValueError(f"At most {MAX_BATCH_GET_IDS} {field} can be requested at once")
+    return ids
+
+
+"""
+Fetch many documents with a single multi-document read.
+`refs` is a list of (collection, document_id) pairs, which may span several collections.
+Returns a dict {(collection, document_id): document dict or None if it does not exist}.
+"""
+def get_documents(refs):
+    refs = list(dict.fromkeys(refs))
+    if not refs:
+        return {}
+    doc_refs = [db.collection(collection).document(doc_id) for collection, doc_id in refs]
+    documents = dict.fromkeys(refs)
+    for doc in db.get_all(doc_refs):
+        if doc.exists:
+            documents[(doc.reference.parent.id, doc.id)] = doc.to_dict()
+    return documents
+
+
+"""
+Stream the results of a query page by page, ordered by document ID: each page is a short query, where one
+stream over a very large result would be held open for as long as the caller takes to consume it.
+The next page is fetched while the caller consumes the current one, at most two pages are in memory.
+"""
+def stream_pages(query, page_size):
+    def fetch_page(last_snapshot):
+        page_query = query.order_by("__name__").limit(page_size)
+        if last_snapshot is not None:
+            page_query = page_query.start_after(last_snapshot)
+        return list(page_query.stream())
+
+    snapshots = fetch_page(None)
+    while snapshots:
+        next_page = submit(lambda last_snapshot=snapshots[-1]: fetch_page(last_snapshot)) \
+            if len(snapshots) == page_size else None
+        yield from snapshots
+        snapshots = next_page.result() if next_page is not None else []
+
+
+# Firestore accepts at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+"""
+Commit writes in chunked WriteBatches. Each write is a tuple (operation, document_reference, fields) where
+operation is "set", "update" or "delete" (fields is ignored for deletes). Updates and deletes may have a write option
+(e.g. a `last_update_time` precondition) as a fourth element.
+Returns a list aligned with `writes` holding None for committed writes, or the exception that failed its chunk.
+"""
+def commit_writes(writes, chunk_size=BATCH_WRITE_LIMIT):
+    results = []
+    for start in range(0, len(writes), chunk_size):
+        chunk = writes[start:start + chunk_size]
+        batch = db.batch()
+        for operation, doc_ref, fields, *option in chunk:
+            option = option[0] if option else None
+            if operation == "create":
+                batch.create(doc_ref, fields)
+            elif operation == "set":
+                batch.set(doc_ref, fields)
+            elif operation == "merge":
+                batch.set(doc_ref, fields, merge=True)
+            elif operation == "update":
+                batch.update(doc_ref, fields, option=option)
+            elif operation == "delete":
+                batch.delete(doc_ref, option=option)
+            else:
+                raise ValueError(f"Invalid batch operation: {operation}")
+        try:
+            batch.commit()
+            results.extend([None] * len(chunk))
+        except Exception as e:
+            results.extend([e] * len(chunk))
+    return results
+
+
+"""
+Reference of the content subdocument of a bookmark, holding its heavy enrichment data (BOOKMARK_CONTENT_MODEL).
+"""
+def bookmark_content_ref(bookmark_id):
+    return db.collection(BOOKMARK_COLLECTION).document(bookmark_id)\
+        .collection(BOOKMARK_CONTENT_COLLECTION).document(BOOKMARK_CONTENT_DOCUMENT)
+
+
+"""
+Update a bookmark with fields which may include content fields (BOOKMARK_CONTENT_MODEL): those are written to its
+content subdocument in the same batch, and removed from bookmarks written before the content was moved out.
+"""
+def update_bookmark_fields(bookmark_ref, fields, option=None):
+    content_fields = {field: fields[field] for field in BOOKMARK_CONTENT_MODEL if field in fields}
+    if not content_fields:
+        return bookmark_ref.update(fields, option=option)
+
+    bookmark_fields = {field: value for field, value in fields.items() if field not in content_fields}
+    bookmark_fields.update({field: firestore.DELETE_FIELD for field in content_fields})
+    batch = db.batch()
+    batch.update(bookmark_ref, bookmark_fields, option=option)
+    batch.set(bookmark_content_ref(bookmark_ref.id), content_fields, merge=True)
+    return batch.commit()[0]
+
+
+"""
+Content of a bookmark from its content subdocument, falling back to the fields of bookmarks written before the
+content was moved out (see src/jobs/bookmark_content.py). `content` is the subdocument dict, None if missing.
+"""
+def bookmark_content(bookmark, content):
+    merged = {field: bookmark[field] for field in BOOKMARK_CONTENT_MODEL if field in bookmark}
+    merged.update(content or {})
+    return {**BOOKMARK_CONTENT_MODEL, **merged}
+
+
+def fetch_bookmark_content(bookmark_id, bookmark):
+    return bookmark_content(bookmark, bookmark_content_ref(bookmark_id).get().to_dict())
+
+
 """
 Get unique UUID4 with given prefix.
 """
@@ -55,116 +308,421 @@ def get_id(prefix):
 
 
 """
-    Process tag names to get or create tag IDs.
+Tag IDs are derived from the user and the normalized tag name, so finding the tag of a name is a point read and a
+tag is created at most once per name, even by concurrent requests: the document is written with `create`, which
+fails if it already exists. "ML", "ml" and " ml " are the same tag.
+"""
+TAG_ID_NAMESPACE = uuid.UUID("5d1c4b1e-8f0a-4a53-9d4e-2b7f6a3c9e10")
+
+# Tags created before their IDs were derived from their names are found by querying their name, until they are
+# migrated by src/jobs/tag_identity.py. Set LEGACY_TAG_LOOKUP=0 once it ran.
+LEGACY_TAG_LOOKUP = os.getenv("LEGACY_TAG_LOOKUP", "1") == "1"
+
+
+def normalize_tag_name(tag_name):
+    if not isinstance(tag_name, str):
+        raise ValueError("Tag names must be strings.")
+    normalized = " ".join(unicodedata.normalize("NFKC", tag_name).split()).casefold()
+    if not normalized:
+        raise ValueError("Tag names can not be empty.")
+    return normalized
+
+
+def get_tag_id(user_id, tag_name):
+    return TAG_ID_PREFIX + "-" + str(uuid.uuid5(TAG_ID_NAMESPACE, f"{user_id}:{normalize_tag_name(tag_name)}"))
+
+
+def create_tag_document(user_id, tag_name, creator, time_now):
+    """
+    Create the tag named `tag_name`, unless a tag with the same normalized name exists. Returns (tag document,
+    whether it was created): the existing document is returned otherwise, it may be deleted.
+    """
+    tag_id = get_tag_id(user_id, tag_name)
+    tag_ref = db.collection(TAG_COLLECTION).document(tag_id)
+    tag = {
+        "tagId": tag_id,
+        "tagName": tag_name.strip(),
+        "creator": creator,
+        "userId": user_id,
+        "createdAt": time_now,
+        "updatedAt": time_now,
+        "isDeleted": False
+    }
+    try:
+        tag_ref.create(tag)
+        return tag, True
+    except AlreadyExists:
+        return tag_ref.get().to_dict(), False
+
+
+def find_tag(tag_name, user_id):
+    """The user's tag named `tag_name` if any, with a point read (and a query for legacy tags). May be deleted."""
+    tag = db.collection(TAG_COLLECTION).document(get_tag_id(user_id, tag_name)).get().to_dict()
+    if tag is None and LEGACY_TAG_LOOKUP:
+        tag = find_legacy_tag(tag_name, user_id)
+    return tag
+
+
+def find_legacy_tag(tag_name, user_id):
+    tag_query = db.collection(TAG_COLLECTION)\
+        .where("tagName", "==", tag_name)\
+        .where("userId", "==", user_id)\
+        .limit(1)\
+        .get()
+    return tag_query[0].to_dict() if tag_query else None
+
+
+"""
+    Process tag names to get or create tags, with one multi-document read.
 
     Args:
         tags (list): List of tag names.
         user_id (str): The ID of the user creating/updating the bookmark.
 
     Returns:
-        list: List of tag IDs corresponding to the tag names.
+        list: List of tag documents corresponding to the tag names. Names normalizing to the same tag (see
+        `get_tag_id`) get the same document.
 
     Raises:
-        ValueError: If `tag_names` is not a list or is missing.
+        ValueError: If `tags` is not a list or has an empty name.
     """
 def process_tags(tags, user_id):
     if not isinstance(tags, list):
         raise ValueError("Tags must be a list.")
 
     time_now = int(datetime.now(timezone.utc).timestamp())
-    tag_ids = []
-
-    for tag_name in tags:
-        # Check if tag exists for the user
-        tag_query = db.collection(TAG_COLLECTION)\
-            .where("tagName", "==", tag_name)\
-            .where("userId", "==", user_id)\
-            .get()
-        if tag_query:
-            # Tag exists
-            tag_id = tag_query[0].id
-        else:
-            # Create new tag
-            tag_id = get_id(TAG_ID_PREFIX)
-            tag_data = {
-                "tagId": tag_id,
-                "tagName": tag_name,
-                "creator": TAG_CREATOR.USER.value, # TODO - Different types of tag handling
-                "userId": user_id,
-                "createdAt": time_now
-            }
-            # Add a new tag to the db
-            db.collection(TAG_COLLECTION).document(tag_id).set(tag_data)
-        
-        tag_ids.append(tag_id)
+    tag_ids = [get_tag_id(user_id, tag_name) for tag_name in tags]
+    documents = get_documents([(TAG_COLLECTION, tag_id) for tag_id in tag_ids])
+
+    tags_by_id = {}
+    for tag_name, tag_id in zip(tags, tag_ids):
+        if tag_id in tags_by_id:
+            continue
+        tag = documents[(TAG_COLLECTION, tag_id)]
+        if tag is None and LEGACY_TAG_LOOKUP:
+            tag = find_legacy_tag(tag_name, user_id)
+        if tag is None:
+            tag, _ = create_tag_document(user_id, tag_name, TAG_CREATOR.USER.value, time_now) # TODO - Different types of tag handling
+        if tag.get("isDeleted"):
+            # Revive a previously deleted tag with the same name
+            db.collection(TAG_COLLECTION).document(tag["tagId"]).update({"isDeleted": False, "updatedAt": time_now})
+            tag.update({"isDeleted": False, "updatedAt": time_now})
+        tags_by_id[tag_id] = tag
+
+    return [tags_by_id[tag_id] for tag_id in tag_ids]
+
 
-    return tag_ids
+"""
+Tag IDs of a bookmark from the tag documents returned by `process_tags`, without duplicates.
+"""
+def tag_ids_field(tags):
+    return list(dict.fromkeys(tag["tagId"] for tag in tags))
 
 
 """
 Remove tag from bookmark. If a bookmark have only input tag, delete the bookmark.
 """
-def remove_tag_from_all_bookmarks(tag_id):
+def remove_tag_from_all_bookmarks(tag_id, tag_name):
     bookmarks_query = db.collection(BOOKMARK_COLLECTION)\
         .where("userId", "==", request.user_id)\
-        .where("tags", "array_contains", tag_id)
-    
+        .where("tags", "array_contains", tag_id)\
+        .select(["tags", "tagNames", "isDeleted"])
+    time_now = int(datetime.now(timezone.utc).timestamp())
+
+    # Written in chunked batches, tags are removed with a transform so concurrent tag edits are kept
+    writes = []
     for bookmark_doc in bookmarks_query.stream():
         bookmark = bookmark_doc.to_dict()
-        updated_tags = [tid for tid in bookmark["tags"] if tid != tag_id]
-
-        if not updated_tags:
+        if bookmark.get("isDeleted"):
+            # Already in the trash, restoring it drops the deleted tag
+            continue
+        if all(tid == tag_id for tid in bookmark["tags"]):
             # If no tags left, delete the bookmark
-            bookmark_doc.reference.update({"isDeleted": True})
+            writes.append(("update", bookmark_doc.reference, {"isDeleted": True, "deletedAt": time_now,
+                                                              "nextCheckAt": firestore.DELETE_FIELD, "updatedAt": time_now}))
         else:
             # Update tags
-            bookmark_doc.reference.update({"tags": updated_tags})
+            updated_fields = {"tags": firestore.ArrayRemove([tag_id]), "updatedAt": time_now}
+            if "tagNames" in bookmark:
+                updated_fields["tagNames"] = firestore.ArrayRemove([tag_name])
+            writes.append(("update", bookmark_doc.reference, updated_fields))
 
+    errors = [error for error in commit_writes(writes) if error is not None]
+    if errors:
+        raise errors[0]
 
-def fetch_tag_names(tag_ids):
-    """Fetch tag names from Firestore based on tag IDs"""
-    if not tag_ids:
-        return []
 
-    tag_docs = db.collection(TAG_COLLECTION).where("tagId", "in", tag_ids).stream()
-    return [tag_doc.to_dict().get("tagName", "") for tag_doc in tag_docs if tag_doc.exists]
+"""
+Denormalized tag names of a bookmark (`tagNames`), without duplicates.
+"""
+def tag_names_field(tag_names):
+    return list(dict.fromkeys(tag_names))
+
+
+"""
+Denormalized directory name of a bookmark (`directoryName`), from the directory document (None for the default one).
+"""
+def directory_name_field(directory):
+    return directory["name"] if directory else DEFAULT_DIRECTORY_NAME_AND_ID
+
+
+"""
+Materialized path of a bookmark's directory (`directoryPath`): the IDs of the directory and of its ancestors, root
+first, from the directory document (empty for the default one). Bookmarks under a directory, at any depth, are
+found with a single `array_contains` query on it.
+"""
+def directory_path_field(directory):
+    return directory.get("ancestors", []) + [directory["directoryId"]] if directory else []
+
+
+# Bookmarks written before directory paths were stored are found by their directory ID until they are backfilled by
+# src/jobs/directory_tree.py. Set LEGACY_DIRECTORY_PATHS=0 once it ran.
+LEGACY_DIRECTORY_PATHS = os.getenv("LEGACY_DIRECTORY_PATHS", "1") == "1"
+
+
+def subtree_bookmarks_queries(bookmarks_query, directory_id):
+    """
+    Narrow a bookmarks query (sync or async) to the bookmarks in `directory_id` and its descendants. Bookmarks
+    without a path are only ever in a directory that was never moved, so the legacy query only needs the directory
+    itself: moving a directory writes the paths of its bookmarks.
+    """
+    queries = [bookmarks_query.where("directoryPath", "array_contains", directory_id)]
+    if LEGACY_DIRECTORY_PATHS:
+        queries.append(bookmarks_query.where("directoryId", "==", directory_id))
+    return queries
+
+
+def subtree_bookmark_counts(directories):
+    """
+    {directoryId: count of the bookmarks in the directory and its descendants}, from the directories' own
+    `bookmarksCount` and their ancestors.
+    """
+    counts = {directory["directoryId"]: directory["bookmarksCount"] for directory in directories}
+    for directory in directories:
+        for ancestor_id in directory.get("ancestors", []):
+            if ancestor_id in counts:
+                counts[ancestor_id] += directory["bookmarksCount"]
+    return counts
+
+
+"""
+Whether the bookmark carries its tag and directory names. Bookmarks written before the names were denormalized
+do not until they are backfilled (see src/jobs/bookmark_names.py), their names are resolved from the name maps.
+"""
+def has_bookmark_names(bookmark):
+    return "tagNames" in bookmark and "directoryName" in bookmark
+
+
+def fetch_bookmark_tag_names(bookmarks, user_id):
+    """
+    Return {bookmark index: tag names} for bookmarks without denormalized names, resolved with one multi-document
+    read of their tags (no `in` query, so any number of tags).
+    """
+    legacy = {index: bookmark for index, bookmark in enumerate(bookmarks) if "tagNames" not in bookmark}
+    tags = get_documents([(TAG_COLLECTION, tag_id) for bookmark in legacy.values() for tag_id in bookmark["tags"]])
+    names = {}
+    for index, bookmark in legacy.items():
+        bookmark_tags = [tags.get((TAG_COLLECTION, tag_id)) for tag_id in bookmark["tags"]]
+        names[index] = tag_names_field([tag["tagName"] for tag in bookmark_tags if tag and tag["userId"] == user_id])
+    return names
+
+
+def fetch_tag_name_map(user_id):
+    """Return {tagId: tagName} for all tags of the user"""
+    tags_query = db.collection(TAG_COLLECTION).where("userId", "==", user_id).stream()
+    return {tag.id: tag.to_dict()["tagName"] for tag in tags_query}
+
+
+def fetch_directory_name_map(user_id):
+    """Return {directoryId: name} for all directories of the user"""
+    directories_query = db.collection(DIRECTORY_COLLECTION).where("userId", "==", user_id).stream()
+    return {directory.id: directory.to_dict()["name"] for directory in directories_query}
+
+
+def fetch_name_maps(user_id, *other_calls):
+    """
+    Fetch the tag and directory name maps of the user concurrently, along with any other independent calls.
+    Returns (tag_map, directory_map, *results of other_calls).
+    """
+    return run_concurrently(
+        lambda: fetch_tag_name_map(user_id),
+        lambda: fetch_directory_name_map(user_id),
+        *other_calls
+    )
+
+
+def resolve_bookmark_names(bookmarks, tag_map=None, directory_map=None):
+    """
+    Replace tag IDs with tag names & set directory names, in place. Bookmarks carrying their names are resolved
+    from them, the name maps are only needed for the others (see `has_bookmark_names`).
+    """
+    for bookmark in bookmarks:
+        if has_bookmark_names(bookmark):
+            bookmark["tags"] = bookmark.pop("tagNames")
+        else:
+            bookmark["tags"] = [tag_map[tag_id] for tag_id in bookmark["tags"] if tag_id in tag_map]
+            bookmark["directoryName"] = directory_map.get(bookmark.get("directoryId"), DEFAULT_DIRECTORY_NAME_AND_ID)
+    return bookmarks
+
+
+def needs_name_maps(bookmarks):
+    return not all(has_bookmark_names(bookmark) for bookmark in bookmarks)
+
 
+def stream_union(queries):
+    """Run queries concurrently, returns the documents matched by any of them, each once."""
+    documents = {}
+    for snapshots in run_concurrently(*(lambda query=query: list(query.stream()) for query in queries)):
+        for snapshot in snapshots:
+            documents.setdefault(snapshot.reference.path, snapshot.to_dict())
+    return list(documents.values())
 
+
+def fetch_bookmarks_with_names(bookmarks_query, user_id):
+    """
+    Run a bookmarks query and resolve the bookmarks' tag and directory names. Bookmarks carry their names, the
+    user's tags and directories are only read if some of them do not. `bookmarks_query` may be a list of queries,
+    see `stream_union`.
+    """
+    if isinstance(bookmarks_query, list):
+        bookmarks = stream_union(bookmarks_query)
+    else:
+        bookmarks = [doc.to_dict() for doc in bookmarks_query.stream()]
+    tag_map = directory_map = None
+    if needs_name_maps(bookmarks):
+        tag_map, directory_map = fetch_name_maps(user_id)
+    return resolve_bookmark_names(bookmarks, tag_map, directory_map)
+
+
+# Time budget of the outbound calls of one enrichment, see src/utils/resilience.py
+ENRICHMENT_BUDGET_SECONDS = 30
+# Writes of the enrichment started over after a concurrent write of the bookmark, before giving up
+ENRICHMENT_WRITE_ATTEMPTS = 5
+
+
+def write_enrichment(bookmark_ref, fields, page_content, thumbnail_hash):
+    """
+    Write the enrichment `fields` of a bookmark, with the page title and image only where the bookmark has none: a
+    title or image set by the user, at creation or while the page was fetched, is kept. Conditioned on the bookmark
+    read, a bookmark written since is read again, at most ENRICHMENT_WRITE_ATTEMPTS times.
+    """
+    for attempt in range(ENRICHMENT_WRITE_ATTEMPTS):
+        snapshot = bookmark_ref.get()
+        bookmark = snapshot.to_dict()
+        if bookmark is None:
+            raise ValueError(f"Bookmark {bookmark_ref.id} was purged during its enrichment")
+        page_fields = {}
+        if not bookmark.get("title"):
+            page_fields["title"] = page_content["title"]
+        if not bookmark.get("imageUrl"):
+            # Served by /thumbnail/<thumbnailHash>/<size>, empty if the image could not be processed
+            page_fields.update({"imageUrl": page_content["image"], "thumbnailHash": thumbnail_hash})
+        try:
+            return update_bookmark_fields(bookmark_ref, {**fields, **page_fields},
+                                          option=db.write_option(last_update_time=snapshot.update_time))
+        except FailedPrecondition:
+            continue
+    raise RuntimeError(f"Bookmark {bookmark_ref.id} kept changing, enrichment not written after {ENRICHMENT_WRITE_ATTEMPTS} attempts")
+
+
+@profiled_job("enrichment")
+@background_job("enrichment")
 def async_process_bookmark_creation(bookmark_id, url, user_id):
-    """Background task to fetch page content, generate tags, and update bookmark."""
+    """
+    Background task to fetch page content, generate tags, and update bookmark.
+    A page that can not be fetched in time is enriched with empty content, and tags are generated locally when the
+    LLM API is unavailable; the steps that fell back (or the thumbnails that could not be made) are recorded in
+    `enrichmentFallbacks`.
+    """
+    # Imported on first use: the scraping, LLM and imaging modules (BeautifulSoup, lxml, Pillow) are only needed here
+    from src.utils.tagGeneration.fetch_page_content import fetch_page_content, create_page_content
+    from src.utils.tagGeneration.generate_tags import generate_tags, generate_local_tags
+    from src.utils.thumbnails import create_thumbnails
+    from src.jobs.content_refresh import enrichment_refresh_fields
+    fallbacks = []
+
+    def fetch_page_content_or_fallback():
+        try:
+            return fetch_page_content(url)
+        except Exception as e:
+            print(f"⚠️ Could not fetch {url}, continuing with empty content: {str(e)}")
+            fallbacks.append("content")
+            return create_page_content()
+
     try:
         print("🔄 Background processing started...")
 
-        # Fetch page content
-        page_content = fetch_page_content(url)
+        with deadline_scope(ENRICHMENT_BUDGET_SECONDS):
+            # Fetch page content and the user tags at the same time, they are independent
+            page_content, allUserTags = run_concurrently(
+                fetch_page_content_or_fallback,
+                lambda: [tag.to_dict() for tag in db.collection(TAG_COLLECTION).where("userId", "==", user_id).stream()]
+            )
+            allUserTags = [tag for tag in allUserTags if not tag.get("isDeleted")]
+
+            def generate_tags_or_fallback():
+                try:
+                    return generate_tags(
+                        5, # generate 5 number of tags when bookmark is created
+                        url,
+                        page_content["title"],
+                        page_content["content"],
+                        allUserTags
+                    )
+                except Exception as e:
+                    print(f"⚠️ Tag generation failed, generating tags locally: {str(e)}")
+                    fallbacks.append("tags")
+                    return generate_local_tags(5, url, page_content["title"], page_content["content"], allUserTags)
 
-        # Get user tags
-        tags_query = db.collection(TAG_COLLECTION).where("userId", "==", user_id).stream()
-        allUserTags = [tag.to_dict() for tag in tags_query]
+            def create_thumbnails_or_skip():
+                if not page_content["image"]:
+                    return ""
+                try:
+                    return create_thumbnails(page_content["image"])
+                except Exception as e:
+                    print(f"⚠️ No thumbnail for {page_content['image']}: {str(e)}")
+                    fallbacks.append("thumbnail")
+                    return ""
 
-        # Generate AI tags
-        generatedTags = generate_tags(
-            5, # generate 5 number of tags when bookmark is created
-            url, 
-            page_content["title"],
-            page_content["content"], 
-            allUserTags
-        )
+            # Generate AI tags and the image thumbnails at the same time, both only need the page content
+            generatedTags, thumbnailHash = run_concurrently(generate_tags_or_fallback, create_thumbnails_or_skip)
+
+        for step in fallbacks:
+            ENRICHMENT_FALLBACKS.inc(step=step)
 
         # Process tags and get tag IDs
-        tag_ids = process_tags(generatedTags, user_id)
+        tags = process_tags(generatedTags, user_id)
 
         # Update Firestore with generated tags & fetched content
-        db.collection(BOOKMARK_COLLECTION).document(bookmark_id).update({
-            "imageUrl": page_content["image"],
-            "title": page_content["title"],
+        time_now = int(datetime.now(timezone.utc).timestamp())
+        updated_fields = {
             "generatedTags": generatedTags,
-            "tags": tag_ids,
-            "updatedAt": int(datetime.now(timezone.utc).timestamp()),
+            "tagsGeneratedAt": time_now,
+            "enrichmentFallbacks": fallbacks,
+            "updatedAt": time_now,
+        }
+        # Validators and schedule of the content refresh, see src/jobs/content_refresh.py
+        updated_fields.update(enrichment_refresh_fields(page_content, time_now))
+        if tags:
+            # Merge instead of overwrite, the user may have edited the tags while we were generating
+            updated_fields["tags"] = firestore.ArrayUnion(tag_ids_field(tags))
+            updated_fields["tagNames"] = firestore.ArrayUnion(tag_names_field([tag["tagName"] for tag in tags]))
+        bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark_id)
+        write_enrichment(bookmark_ref, updated_fields, page_content, thumbnailHash)
+        bump_data_version(user_id)
+
+        # Push the enriched bookmark to the user's clients, same data as /bookmark/get, and the suggested tags
+        snapshot = bookmark_ref.get()
+        event_bus.publish(user_id, EVENT_BOOKMARK_ENRICHED, {
+            "bookmark": snapshot.to_dict(),
+            "updateTime": snapshot.update_time.rfc3339(),
+            "generatedTags": generatedTags
         })
         
         print(f"✅ Background processing completed for {bookmark_id}")
 
     except Exception as e:
         print(f"❌ Error in async process: {str(e)}")
-        print(traceback.format_exc())
\ No newline at end of file
+        print(traceback.format_exc())
+        # Clients waiting for the enrichment stop waiting
+        event_bus.publish(user_id, EVENT_BOOKMARK_ENRICHMENT_FAILED, {"bookmarkId": bookmark_id})
\ No newline at end of file
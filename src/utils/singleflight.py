@@ -0,0 +1,112 @@
+import asyncio
+import copy
+import threading
+from functools import wraps
+from src.utils.metrics import SINGLEFLIGHT_SHARED
+
+"""
+Coalescing of concurrent identical work ("singleflight").
+
+While a call for a key is in flight, identical calls for the same key wait for it and share its result (or its
+exception) instead of doing the work again: double-clicks and multi-tab clients firing the same listing, or two
+saves of the same URL enriching it twice. Nothing is cached, a call starting after the in-flight one finished
+runs again. Every shared result is counted in `bookmarkai_singleflight_shared_total`, labelled by flight name.
+
+Waiting callers get a deep copy of the result, so callers may mutate what they get back.
+"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces calls across threads (the Flask routes and background jobs)."""
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Return func(), or the result of the in-flight call with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_SHARED.inc(name=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Coalesces calls across tasks of one event loop (the async routes)."""
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, func):
+        """Return await func(), or the result of the in-flight call with the same key."""
+        future = self._calls.get(key)
+        if future is not None:
+            SINGLEFLIGHT_SHARED.inc(name=self.name)
+            # Shielded: a waiting request being cancelled must not cancel the call of the others
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here, so an error nobody else waited for is not reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+
+def singleflight(name, key):
+    """Decorator coalescing concurrent calls of a function for which `key(*args, **kwargs)` is equal."""
+    flight = SingleFlight(name)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return flight.do(key(*args, **kwargs), lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def async_singleflight(name, key):
+    """Decorator coalescing concurrent calls of a coroutine function, see `singleflight`."""
+    flight = AsyncSingleFlight(name)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await flight.do(key(*args, **kwargs), lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,15 @@
+"""
+Storage backends for the app.
+
+Routes talk to the global `db` from `src/utils/init.py`, which implements the subset of the Firestore client API
+the routes use: `collection().document()` get/set/update/create/delete, `where`/`order_by`/`limit`/`start_after`
+queries with `stream()`/`get()`, `get_all`, `batch()` and `write_option`.
+
+Backends, selected with the STORAGE_BACKEND environment variable:
+    firestore -> the Firebase Admin Firestore client (default)
+    memory    -> MemoryClient, an in-process stand-in used by benchmarks and local runs without credentials
+"""
+
+STORAGE_BACKEND_FIRESTORE = "firestore"
+STORAGE_BACKEND_MEMORY = "memory"
+STORAGE_BACKENDS = (STORAGE_BACKEND_FIRESTORE, STORAGE_BACKEND_MEMORY)
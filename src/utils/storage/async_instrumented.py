@@ -0,0 +1,128 @@
+import time
+from src.utils.metrics import record_datastore
+from src.utils.storage.instrumented import _Proxy, _unwrap
+
+"""
+Async counterpart of instrumented.py, wrapping the async Firestore client (or AsyncMemoryClient) to record
+documents read, documents written, queries issued and time spent into the RequestStats of the current request.
+"""
+
+
+class AsyncInstrumentedClient(_Proxy):
+    def collection(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.collection(*args, **kwargs))
+
+    def batch(self):
+        return AsyncInstrumentedBatch(self._wrapped.batch())
+
+    async def get_all(self, references, *args, **kwargs):
+        references = [_unwrap(reference) for reference in references]
+        started_at = time.perf_counter()
+        snapshots = [snapshot async for snapshot in self._wrapped.get_all(references, *args, **kwargs)]
+        # Firestore bills a read for every requested document, found or not
+        record_datastore(time.perf_counter() - started_at, reads=max(len(snapshots), 1), queries=1)
+        for snapshot in snapshots:
+            yield AsyncInstrumentedSnapshot(snapshot)
+
+
+class AsyncInstrumentedQuery(_Proxy):
+    """Wraps collection references and queries."""
+    def document(self, *args, **kwargs):
+        return AsyncInstrumentedDocument(self._wrapped.document(*args, **kwargs))
+
+    def where(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.order_by(*args, **kwargs))
+
+    def limit(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.limit(*args, **kwargs))
+
+    def offset(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.offset(*args, **kwargs))
+
+    def select(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.select(*args, **kwargs))
+
+    def start_after(self, document_fields_or_snapshot):
+        return AsyncInstrumentedQuery(self._wrapped.start_after(_unwrap(document_fields_or_snapshot)))
+
+    async def stream(self, *args, **kwargs):
+        record_datastore(0, queries=1)
+        iterator = self._wrapped.stream(*args, **kwargs).__aiter__()
+        while True:
+            started_at = time.perf_counter()
+            try:
+                snapshot = await iterator.__anext__()
+            except StopAsyncIteration:
+                record_datastore(time.perf_counter() - started_at)
+                return
+            record_datastore(time.perf_counter() - started_at, reads=1)
+            yield AsyncInstrumentedSnapshot(snapshot)
+
+    async def get(self, *args, **kwargs):
+        return [snapshot async for snapshot in self.stream(*args, **kwargs)]
+
+
+class AsyncInstrumentedDocument(_Proxy):
+    def collection(self, *args, **kwargs):
+        return AsyncInstrumentedQuery(self._wrapped.collection(*args, **kwargs))
+
+    async def get(self, *args, **kwargs):
+        return AsyncInstrumentedSnapshot(await self._timed(self._wrapped.get, reads=1, args=args, kwargs=kwargs))
+
+    async def set(self, *args, **kwargs):
+        return await self._timed(self._wrapped.set, writes=1, args=args, kwargs=kwargs)
+
+    async def create(self, *args, **kwargs):
+        return await self._timed(self._wrapped.create, writes=1, args=args, kwargs=kwargs)
+
+    async def update(self, *args, **kwargs):
+        return await self._timed(self._wrapped.update, writes=1, args=args, kwargs=kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._timed(self._wrapped.delete, writes=1, args=args, kwargs=kwargs)
+
+    async def _timed(self, call, reads=0, writes=0, args=(), kwargs=None):
+        started_at = time.perf_counter()
+        try:
+            return await call(*args, **(kwargs or {}))
+        finally:
+            record_datastore(time.perf_counter() - started_at, reads=reads, writes=writes)
+
+
+class AsyncInstrumentedSnapshot(_Proxy):
+    @property
+    def reference(self):
+        return AsyncInstrumentedDocument(self._wrapped.reference)
+
+
+class AsyncInstrumentedBatch(_Proxy):
+    def __init__(self, wrapped):
+        super().__init__(wrapped)
+        self._write_count = 0
+
+    def create(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.create(_unwrap(reference), *args, **kwargs)
+
+    def set(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.set(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.delete(_unwrap(reference), *args, **kwargs)
+
+    async def commit(self):
+        started_at = time.perf_counter()
+        try:
+            return await self._wrapped.commit()
+        finally:
+            record_datastore(time.perf_counter() - started_at, writes=self._write_count)
+            self._write_count = 0
@@ -0,0 +1,139 @@
+import asyncio
+from src.utils.storage.memory_store import _latency_already_spent
+
+"""
+Async facade over a MemoryClient, mirroring the subset of `google.cloud.firestore.AsyncClient` used by the
+async routes (src/services/async_routes): `await document.get()`, `async for snapshot in query.stream()`,
+`async for snapshot in client.get_all(...)`, `await batch.commit()`...
+
+It shares the data of the wrapped MemoryClient, so the async routes and the Flask routes of the same process
+see the same documents. The simulated latency is awaited, so concurrent requests overlap on the event loop.
+"""
+
+
+def _unwrap(value):
+    return value._wrapped if isinstance(value, _AsyncMemoryProxy) else value
+
+
+class _AsyncMemoryProxy:
+    def __init__(self, wrapped, client):
+        self._wrapped = wrapped
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def __eq__(self, other):
+        return self._wrapped == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._wrapped)
+
+
+async def _round_trip(client, call, *args, **kwargs):
+    if client.latency:
+        await asyncio.sleep(client.latency)
+    token = _latency_already_spent.set(True)
+    try:
+        return call(*args, **kwargs)
+    finally:
+        _latency_already_spent.reset(token)
+
+
+class AsyncMemoryClient:
+    def __init__(self, client):
+        self._wrapped = client
+
+    def __getattr__(self, name):
+        # stats, reset_stats, set_latency, write_option...
+        return getattr(self._wrapped, name)
+
+    def collection(self, collection_id):
+        return AsyncMemoryQuery(self._wrapped.collection(collection_id), self._wrapped)
+
+    def batch(self):
+        return AsyncMemoryWriteBatch(self._wrapped.batch(), self._wrapped)
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        references = [_unwrap(reference) for reference in references]
+        snapshots = await _round_trip(self._wrapped, self._wrapped.get_all, references)
+        for snapshot in snapshots:
+            yield AsyncMemorySnapshot(snapshot, self._wrapped)
+
+
+class AsyncMemoryQuery(_AsyncMemoryProxy):
+    """Wraps collection references and queries."""
+    def document(self, document_id=None):
+        return AsyncMemoryDocumentReference(self._wrapped.document(document_id), self._client)
+
+    def where(self, *args, **kwargs):
+        return AsyncMemoryQuery(self._wrapped.where(*args, **kwargs), self._client)
+
+    def order_by(self, *args, **kwargs):
+        return AsyncMemoryQuery(self._wrapped.order_by(*args, **kwargs), self._client)
+
+    def limit(self, count):
+        return AsyncMemoryQuery(self._wrapped.limit(count), self._client)
+
+    def offset(self, num_to_skip):
+        return AsyncMemoryQuery(self._wrapped.offset(num_to_skip), self._client)
+
+    def select(self, field_paths):
+        return AsyncMemoryQuery(self._wrapped.select(field_paths), self._client)
+
+    def start_after(self, document_fields_or_snapshot):
+        return AsyncMemoryQuery(self._wrapped.start_after(_unwrap(document_fields_or_snapshot)), self._client)
+
+    async def stream(self, transaction=None):
+        snapshots = await _round_trip(self._client, self._wrapped.get)
+        for snapshot in snapshots:
+            yield AsyncMemorySnapshot(snapshot, self._client)
+
+    async def get(self, transaction=None):
+        return [snapshot async for snapshot in self.stream()]
+
+
+class AsyncMemoryDocumentReference(_AsyncMemoryProxy):
+    def collection(self, collection_id):
+        return AsyncMemoryQuery(self._wrapped.collection(collection_id), self._client)
+
+    async def get(self, field_paths=None, transaction=None):
+        return AsyncMemorySnapshot(await _round_trip(self._client, self._wrapped.get), self._client)
+
+    async def create(self, document_data):
+        return await _round_trip(self._client, self._wrapped.create, document_data)
+
+    async def set(self, document_data, merge=False):
+        return await _round_trip(self._client, self._wrapped.set, document_data, merge=merge)
+
+    async def update(self, field_updates, option=None):
+        return await _round_trip(self._client, self._wrapped.update, field_updates, option=option)
+
+    async def delete(self, option=None):
+        return await _round_trip(self._client, self._wrapped.delete, option=option)
+
+
+class AsyncMemorySnapshot(_AsyncMemoryProxy):
+    @property
+    def reference(self):
+        return AsyncMemoryDocumentReference(self._wrapped.reference, self._client)
+
+
+class AsyncMemoryWriteBatch(_AsyncMemoryProxy):
+    def create(self, reference, document_data):
+        return self._wrapped.create(_unwrap(reference), document_data)
+
+    def set(self, reference, document_data, merge=False):
+        return self._wrapped.set(_unwrap(reference), document_data, merge=merge)
+
+    def update(self, reference, field_updates, option=None):
+        return self._wrapped.update(_unwrap(reference), field_updates, option=option)
+
+    def delete(self, reference, option=None):
+        return self._wrapped.delete(_unwrap(reference), option=option)
+
+    async def commit(self):
+        return await _round_trip(self._client, self._wrapped.commit)
+
+    def __len__(self):
+        return len(self._wrapped)
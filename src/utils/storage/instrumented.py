@@ -0,0 +1,149 @@
+import time
+from src.utils.metrics import record_datastore
+
+"""
+Wrapper around a storage client (Firestore or the in-memory one) that records documents read, documents
+written, queries issued and time spent into the RequestStats of the current request, see src/utils/metrics.py.
+
+Only the calls that reach the datastore are timed and counted. Everything else is forwarded untouched to the
+wrapped object, and wrapped references are unwrapped before being handed back to the client.
+"""
+
+
+def _unwrap(value):
+    return value._wrapped if isinstance(value, _Proxy) else value
+
+
+class _Proxy:
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def __eq__(self, other):
+        return self._wrapped == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._wrapped)
+
+
+class InstrumentedClient(_Proxy):
+    def collection(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.collection(*args, **kwargs))
+
+    def batch(self):
+        return InstrumentedBatch(self._wrapped.batch())
+
+    def get_all(self, references, *args, **kwargs):
+        references = [_unwrap(reference) for reference in references]
+        started_at = time.perf_counter()
+        snapshots = list(self._wrapped.get_all(references, *args, **kwargs))
+        # Firestore bills a read for every requested document, found or not
+        record_datastore(time.perf_counter() - started_at, reads=max(len(snapshots), 1), queries=1)
+        return iter([InstrumentedSnapshot(snapshot) for snapshot in snapshots])
+
+
+class InstrumentedQuery(_Proxy):
+    """Wraps collection references and queries."""
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._wrapped.document(*args, **kwargs))
+
+    def where(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.order_by(*args, **kwargs))
+
+    def limit(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.limit(*args, **kwargs))
+
+    def offset(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.offset(*args, **kwargs))
+
+    def select(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.select(*args, **kwargs))
+
+    def start_after(self, document_fields_or_snapshot):
+        return InstrumentedQuery(self._wrapped.start_after(_unwrap(document_fields_or_snapshot)))
+
+    def stream(self, *args, **kwargs):
+        # Firestore streams lazily, so the time of every page fetched while iterating is accounted too
+        started_at = time.perf_counter()
+        iterator = iter(self._wrapped.stream(*args, **kwargs))
+        record_datastore(time.perf_counter() - started_at, queries=1)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                snapshot = next(iterator)
+            except StopIteration:
+                record_datastore(time.perf_counter() - started_at)
+                return
+            record_datastore(time.perf_counter() - started_at, reads=1)
+            yield InstrumentedSnapshot(snapshot)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+
+class InstrumentedDocument(_Proxy):
+    def collection(self, *args, **kwargs):
+        return InstrumentedQuery(self._wrapped.collection(*args, **kwargs))
+
+    def get(self, *args, **kwargs):
+        return InstrumentedSnapshot(self._timed(self._wrapped.get, reads=1, args=args, kwargs=kwargs))
+
+    def set(self, *args, **kwargs):
+        return self._timed(self._wrapped.set, writes=1, args=args, kwargs=kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._timed(self._wrapped.create, writes=1, args=args, kwargs=kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._timed(self._wrapped.update, writes=1, args=args, kwargs=kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed(self._wrapped.delete, writes=1, args=args, kwargs=kwargs)
+
+    def _timed(self, call, reads=0, writes=0, args=(), kwargs=None):
+        started_at = time.perf_counter()
+        try:
+            return call(*args, **(kwargs or {}))
+        finally:
+            record_datastore(time.perf_counter() - started_at, reads=reads, writes=writes)
+
+
+class InstrumentedSnapshot(_Proxy):
+    @property
+    def reference(self):
+        return InstrumentedDocument(self._wrapped.reference)
+
+
+class InstrumentedBatch(_Proxy):
+    def __init__(self, wrapped):
+        super().__init__(wrapped)
+        self._write_count = 0
+
+    def create(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.create(_unwrap(reference), *args, **kwargs)
+
+    def set(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.set(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._write_count += 1
+        return self._wrapped.delete(_unwrap(reference), *args, **kwargs)
+
+    def commit(self):
+        started_at = time.perf_counter()
+        try:
+            return self._wrapped.commit()
+        finally:
+            record_datastore(time.perf_counter() - started_at, writes=self._write_count)
+            self._write_count = 0
@@ -0,0 +1,467 @@
+import copy
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1 import transforms
+
+"""
+In-memory stand-in for the Firestore client.
+
+It implements the subset of the `google.cloud.firestore.Client` API used by the routes (collections,
+document get/set/update/create/delete, where/order_by/limit/start_after queries, `get_all`, write batches,
+write preconditions and the Increment/ArrayUnion/ArrayRemove/DELETE_FIELD/SERVER_TIMESTAMP transforms),
+so the app, the benchmarks and local runs work without Firebase credentials.
+
+Every call that would be a network round trip against Firestore is counted in `MemoryClient.stats`, and can be
+slowed down by a simulated network latency (`MemoryClient(latency=...)` or `set_latency`) to benchmark how
+requests behave against a remote datastore. The latency is spent outside of the store lock, so concurrent
+round trips overlap like they would against Firestore.
+"""
+
+DOCUMENT_ID_FIELD = "__name__"
+
+# Set by the async client (async_memory_store.py), which waits for the simulated latency without blocking
+_latency_already_spent = ContextVar("memory_store_latency_already_spent", default=False)
+
+
+class MemoryStoreStats:
+    def __init__(self):
+        self.round_trips = 0
+        self.documents_read = 0
+        self.documents_written = 0
+        self.queries = 0
+
+    def snapshot(self):
+        return {
+            "roundTrips": self.round_trips,
+            "documentsRead": self.documents_read,
+            "documentsWritten": self.documents_written,
+            "queries": self.queries
+        }
+
+
+class MemoryClient:
+    def __init__(self, latency=0):
+        self.latency = latency  # Simulated seconds per round trip
+        self._collections = {}  # {collection path tuple: {document id: (data, create_time, update_time)}}
+        self._lock = threading.RLock()
+        self._last_time_ns = 0
+        self.stats = MemoryStoreStats()
+
+    def collection(self, collection_id):
+        return MemoryCollectionReference(self, (collection_id,))
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self._simulate_latency()
+        with self._lock:
+            self.stats.round_trips += 1
+            snapshots = [reference._snapshot() for reference in references]
+        self.stats.documents_read += sum(1 for snapshot in snapshots if snapshot.exists)
+        return iter(snapshots)
+
+    def write_option(self, **kwargs):
+        if len(kwargs) != 1 or not set(kwargs) <= {"last_update_time", "exists"}:
+            raise TypeError("write_option expects exactly one of last_update_time or exists")
+        return MemoryWriteOption(**kwargs)
+
+    def reset_stats(self):
+        self.stats = MemoryStoreStats()
+
+    def set_latency(self, latency):
+        self.latency = latency
+
+    def _simulate_latency(self):
+        if self.latency and not _latency_already_spent.get():
+            time.sleep(self.latency)
+
+    def _now(self):
+        # Strictly increasing timestamps, like Firestore commit times
+        with self._lock:
+            now_ns = max(time.time_ns(), self._last_time_ns + 1000)
+            self._last_time_ns = now_ns
+        return _datetime_from_ns(now_ns)
+
+    def _stored(self, path):
+        return self._collections.get(path[:-1], {}).get(path[-1])
+
+    def _commit(self, writes):
+        """Apply a list of (operation, reference, data, option) atomically and return the write results."""
+        self._simulate_latency()
+        with self._lock:
+            self.stats.round_trips += 1
+            update_time = self._now()
+
+            # Validate and compute every write against a staged view first, so a failing write leaves no trace
+            staged = {}
+            for operation, reference, data, option in writes:
+                path = reference._path
+                current = staged[path] if path in staged else self._stored(path)
+                if option is not None:
+                    option.check(reference, current)
+                if operation == "create":
+                    if current is not None:
+                        raise AlreadyExists(f"Document already exists: {reference.path}")
+                    staged[path] = (_apply_fields({}, data, update_time), update_time, update_time)
+                elif operation == "set":
+                    document_data, merge = data
+                    create_time = current[1] if current else update_time
+                    base = copy.deepcopy(current[0]) if (current and merge) else {}
+                    staged[path] = (_apply_fields(base, document_data, update_time), create_time, update_time)
+                elif operation == "update":
+                    if current is None:
+                        raise NotFound(f"No document to update: {reference.path}")
+                    fields = _apply_fields(copy.deepcopy(current[0]), data, update_time, dotted=True)
+                    staged[path] = (fields, current[1], update_time)
+                elif operation == "delete":
+                    staged[path] = None
+
+            for path, stored in staged.items():
+                collection = self._collections.setdefault(path[:-1], {})
+                if stored is None:
+                    collection.pop(path[-1], None)
+                else:
+                    collection[path[-1]] = stored
+            self.stats.documents_written += len(writes)
+        return [MemoryWriteResult(update_time) for _ in writes]
+
+    def _children(self, collection_path):
+        """Snapshots of all documents directly inside a collection, ordered by document ID."""
+        with self._lock:
+            collection = self._collections.get(collection_path, {})
+            return [
+                MemoryDocumentSnapshot(MemoryDocumentReference(self, collection_path + (document_id,)), *collection[document_id])
+                for document_id in sorted(collection)
+            ]
+
+
+def _datetime_from_ns(time_ns):
+    seconds, nanos = divmod(time_ns, 10**9)
+    return DatetimeWithNanoseconds.from_timestamp_pb(_Timestamp(seconds, nanos))
+
+
+def _time_key(value):
+    return int(value.timestamp()), getattr(value, "nanosecond", value.microsecond * 1000)
+
+
+class _Timestamp:
+    """Minimal protobuf Timestamp look-alike accepted by DatetimeWithNanoseconds.from_timestamp_pb."""
+    def __init__(self, seconds, nanos):
+        self.seconds = seconds
+        self.nanos = nanos
+
+
+def _apply_fields(document, fields, update_time, dotted=False):
+    """Apply plain values and transforms to a document dict. Update paths with dots address nested maps."""
+    for key, value in fields.items():
+        path = key.split(".") if dotted else [key]
+        parent = document
+        for part in path[:-1]:
+            parent = parent.setdefault(part, {})
+        field = path[-1]
+        if value is transforms.DELETE_FIELD:
+            parent.pop(field, None)
+        elif value is transforms.SERVER_TIMESTAMP:
+            parent[field] = update_time
+        elif isinstance(value, transforms.Increment):
+            parent[field] = parent.get(field, 0) + value.value
+        elif isinstance(value, transforms.ArrayUnion):
+            existing = list(parent.get(field) or [])
+            parent[field] = existing + [item for item in value.values if item not in existing]
+        elif isinstance(value, transforms.ArrayRemove):
+            parent[field] = [item for item in parent.get(field) or [] if item not in value.values]
+        elif isinstance(value, dict) and not dotted:
+            parent[field] = _apply_fields({}, value, update_time)
+        else:
+            parent[field] = copy.deepcopy(value)
+    return document
+
+
+class MemoryWriteOption:
+    def __init__(self, last_update_time=None, exists=None):
+        self._last_update_time = last_update_time
+        self._exists = exists
+
+    def check(self, reference, current):
+        if self._last_update_time is not None:
+            if current is None or _time_key(current[2]) != _time_key(self._last_update_time):
+                raise FailedPrecondition(f"Document {reference.path} was updated after the given update time")
+        if self._exists is not None and (current is not None) != self._exists:
+            raise FailedPrecondition(f"Document {reference.path} existence precondition failed")
+
+
+class MemoryWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = self._data
+        for part in field_path.split("."):
+            value = value[part]
+        return copy.deepcopy(value)
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return "/".join(self._path)
+
+    @property
+    def parent(self):
+        return MemoryCollectionReference(self._client, self._path[:-1])
+
+    def collection(self, collection_id):
+        return MemoryCollectionReference(self._client, self._path + (collection_id,))
+
+    def get(self, field_paths=None, transaction=None):
+        self._client._simulate_latency()
+        with self._client._lock:
+            self._client.stats.round_trips += 1
+            snapshot = self._snapshot()
+        if snapshot.exists:
+            self._client.stats.documents_read += 1
+        return snapshot
+
+    def create(self, document_data):
+        return self._client._commit([("create", self, document_data, None)])[0]
+
+    def set(self, document_data, merge=False):
+        return self._client._commit([("set", self, (document_data, merge), None)])[0]
+
+    def update(self, field_updates, option=None):
+        return self._client._commit([("update", self, field_updates, option)])[0]
+
+    def delete(self, option=None):
+        return self._client._commit([("delete", self, None, option)])[0].update_time
+
+    def _snapshot(self):
+        stored = self._client._stored(self._path)
+        if stored is None:
+            return MemoryDocumentSnapshot(self, None)
+        return MemoryDocumentSnapshot(self, stored[0], stored[1], stored[2])
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other._path == self._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+
+class MemoryQuery:
+    def __init__(self, client, collection_path, filters=(), orders=(), limit=None, offset=0, start_after=None, projection=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._offset = offset
+        self._start_after = start_after
+        self._projection = projection
+
+    def _copy(self, **changes):
+        fields = {
+            "filters": self._filters, "orders": self._orders, "limit": self._limit, "offset": self._offset,
+            "start_after": self._start_after, "projection": self._projection
+        }
+        fields.update(changes)
+        return MemoryQuery(self._client, self._collection_path, **fields)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start_after=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(projection=tuple(field_paths))
+
+    def stream(self, transaction=None):
+        self._client._simulate_latency()
+        with self._client._lock:
+            self._client.stats.round_trips += 1
+            self._client.stats.queries += 1
+            snapshots = self._run()
+        self._client.stats.documents_read += len(snapshots)
+        return iter(snapshots)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def _run(self):
+        snapshots = [snapshot for snapshot in self._client._children(self._collection_path)
+                     if all(_matches(snapshot, *query_filter) for query_filter in self._filters)]
+
+        # Firestore excludes documents missing an ordered field and breaks ties by document ID
+        orders = self._orders
+        for field_path, _ in orders:
+            snapshots = [snapshot for snapshot in snapshots if _field(snapshot, field_path) is not _MISSING]
+        for field_path, direction in reversed(orders):
+            snapshots.sort(key=lambda snapshot: _sort_key(_field(snapshot, field_path)), reverse=direction == "DESCENDING")
+
+        if self._start_after is not None:
+            snapshots = self._after_cursor(snapshots)
+        snapshots = snapshots[self._offset:]
+        if self._limit is not None:
+            snapshots = snapshots[:self._limit]
+        if self._projection is not None:
+            snapshots = [MemoryDocumentSnapshot(
+                snapshot.reference,
+                {field: snapshot._data[field] for field in self._projection if field in snapshot._data},
+                snapshot.create_time, snapshot.update_time
+            ) for snapshot in snapshots]
+        return snapshots
+
+    def _after_cursor(self, snapshots):
+        cursor = self._start_after
+        order_fields = [field_path for field_path, _ in self._orders] or [DOCUMENT_ID_FIELD]
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            cursor_values = [_field(cursor, field_path) for field_path in order_fields]
+        else:
+            cursor_values = [cursor.get(field_path) for field_path in order_fields]
+        for index, snapshot in enumerate(snapshots):
+            values = [_field(snapshot, field_path) for field_path in order_fields]
+            if values == cursor_values:
+                return snapshots[index + 1:]
+        # The cursor document is not part of the results anymore, fall back to comparing the ordered values
+        cursor_key = [_sort_key(value) for value in cursor_values]
+        return [snapshot for snapshot in snapshots
+                if [_sort_key(_field(snapshot, field_path)) for field_path in order_fields] > cursor_key]
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._collection_path[-1]
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._client, self._collection_path + (document_id or uuid.uuid4().hex,))
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        return reference.create(document_data).update_time, reference
+
+
+class MemoryWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference, document_data, None))
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, (document_data, merge), None))
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference, field_updates, option))
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, None, option))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+    def __len__(self):
+        return len(self._writes)
+
+
+_MISSING = object()
+
+
+def _field(snapshot, field_path):
+    if field_path == DOCUMENT_ID_FIELD:
+        return snapshot.id
+    value = snapshot._data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _sort_key(value):
+    # Firestore orders values of different types by type first
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (9, str(value))
+
+
+def _comparable(left, right):
+    return _sort_key(left)[0] == _sort_key(right)[0]
+
+
+_OPERATORS = {
+    "==": lambda field, value: field == value and _comparable(field, value),
+    "!=": lambda field, value: field is not None and field != value,
+    "<": lambda field, value: _comparable(field, value) and field < value,
+    "<=": lambda field, value: _comparable(field, value) and field <= value,
+    ">": lambda field, value: _comparable(field, value) and field > value,
+    ">=": lambda field, value: _comparable(field, value) and field >= value,
+    "in": lambda field, value: field in value,
+    "not-in": lambda field, value: field is not None and field not in value,
+    "array_contains": lambda field, value: isinstance(field, list) and value in field,
+    "array_contains_any": lambda field, value: isinstance(field, list) and any(item in field for item in value),
+}
+
+
+def _matches(snapshot, field_path, op_string, value):
+    field = _field(snapshot, field_path)
+    if field is _MISSING:
+        return False
+    return _OPERATORS[op_string](field, value)
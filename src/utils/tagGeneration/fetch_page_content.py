@@ -1,22 +1,51 @@
+import hashlib
+import json
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import re
+from src.utils.resilience import outbound_call, request_timeout
+from src.utils.metrics import OUTBOUND_PAGE
+from src.utils.singleflight import singleflight
+from src.utils.urls import normalize_url
 
 # Define the constant for the maximum content length
 MAX_CONTENT_LENGTH = 1000
 
-def fetch_page_content(url):
-    """Fetch page title and main content from the given URL using BeautifulSoup and lxml parser."""
-    page_content = create_page_content()
+# Time allowed to download a page, within the deadline of the caller if any (see src/utils/resilience.py)
+PAGE_FETCH_TIMEOUT_SECONDS = 10
 
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers)
+@singleflight("page_fetch", key=lambda url, etag=None, last_modified=None: (normalize_url(url), etag, last_modified))
+def fetch_page_content(url, etag=None, last_modified=None):
+    """
+    Fetch page title and main content from the given URL using BeautifulSoup and lxml parser.
+    Raises if the page could not be downloaded in time, or its host is failing (OutboundCallError).
+    Concurrent fetches of the same page share one download.
+
+    With the `etag` / `last_modified` validators of a previous fetch the request is conditional: an unchanged page
+    answers 304 without a body, returned as empty content with `status` 304. The validators of the page are
+    returned in `etag` and `lastModified`, to revalidate it later (see src/jobs/content_refresh.py).
+    """
     page_content = create_page_content()
-    if response.status_code != 200:
-        return page_content
 
-    soup = BeautifulSoup(response.text, "lxml")
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    with outbound_call(url, PAGE_FETCH_TIMEOUT_SECONDS, OUTBOUND_PAGE) as deadline:
+        response = requests.get(url, headers=headers, timeout=request_timeout(deadline), stream=True)
+        with response:
+            if response.status_code >= 500:
+                response.raise_for_status()
+            page_content["status"] = response.status_code
+            if response.status_code != 200:
+                return page_content
+            page_content["etag"] = response.headers.get("ETag", "")
+            page_content["lastModified"] = response.headers.get("Last-Modified", "")
+            html = read_body(response, deadline)
+
+    soup = BeautifulSoup(html, "lxml")
     page_content["image"] = fetch_relevant_image(url, soup)
     page_content["title"] = fetch_title(soup)
 
@@ -27,15 +56,41 @@ def fetch_page_content(url):
     return page_content
 
 
+def read_body(response, deadline):
+    """
+    Read a streamed response body, giving up at the deadline: the read timeout only bounds each socket read,
+    a page trickling in slowly would otherwise hold the job. Reads return as soon as some data is available.
+    """
+    chunks = []
+    while chunk := response.raw.read1(64 * 1024, decode_content=True):
+        chunks.append(chunk)
+        deadline.check()
+    html = b"".join(chunks)
+    # Decoded like `response.text` when the charset is known, else BeautifulSoup detects it
+    try:
+        return html.decode(response.encoding, errors="replace") if response.encoding else html
+    except LookupError:
+        return html
+
+
 def create_page_content(title="", content="", image=""):
     """Create and return a dictionary representing the page content."""
     return {
         "title": title,
         "content": content,
-        "image": image
+        "image": image,
+        "status": None,  # HTTP status of the page, None if it was not fetched
+        "etag": "",
+        "lastModified": ""
     }
 
 
+def hash_page_content(page_content):
+    """Hash of what is extracted from a page, to tell whether a refetched page actually changed."""
+    extracted = [page_content["title"], page_content["content"], page_content["image"]]
+    return hashlib.sha256(json.dumps(extracted).encode()).hexdigest()
+
+
 def fetch_title(soup):
     """Fetch the title from the meta tags or the <title> tag in the HTML."""
     # Try to get the Open Graph title (og:title)
@@ -66,7 +121,7 @@ def fetch_relevant_image(url, soup):
     # If no Open Graph image, find the first <img> tag with an image src
     img_tag = soup.find("img")
     if img_tag and img_tag.get("src"):
-        return img_tag["src"]
+        return urljoin(url, img_tag["src"])
 
     return None  # No image found
 
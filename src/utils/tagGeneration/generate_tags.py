@@ -1,27 +1,101 @@
+import asyncio
 import os
-from src.utils.tagGeneration.fetch_page_content import fetch_page_content
+import re
+from urllib.parse import urlparse
 from src.models.tag_model import TAG_CREATOR
 import requests
 from dotenv import load_dotenv
+from src.utils.resilience import outbound_call, request_timeout
+from src.utils.singleflight import singleflight, async_singleflight
+from src.utils.urls import normalize_url
 
+PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
+
+# Time allowed to the LLM API, within the deadline of the caller if any (see src/utils/resilience.py)
+TAG_GENERATION_TIMEOUT_SECONDS = 20
+
+def generation_key(tag_count, url, title, content, allUserTags):
+    """Identical generations, coalesced while in flight: same page, same prompt inputs"""
+    user_tags = tuple(sorted((tag["tagName"], tag["creator"]) for tag in allUserTags))
+    return tag_count, normalize_url(url or ""), title, content, user_tags
+
+@singleflight("tag_generation", key=generation_key)
 def generate_tags(tag_count, url, title, content, allUserTags):
+    """
+    Generate tags with the LLM API. Raises if the API fails, times out, or its circuit is open (OutboundCallError);
+    callers can fall back to `generate_local_tags`. Concurrent identical generations share one API call.
+    """
+
+    if not url:
+        return ["Could not get url"]
+
+    # Correct API call using perplexity
+    with outbound_call(PERPLEXITY_API_URL, TAG_GENERATION_TIMEOUT_SECONDS) as deadline:
+        response = requests.post(
+            PERPLEXITY_API_URL,
+            headers=get_request_headers(),
+            json=build_request_body(tag_count, url, title, content, allUserTags),
+            timeout=request_timeout(deadline)
+        )
+        response.raise_for_status()
+
+    return parse_tags(response.json())
+
+@async_singleflight("tag_generation", key=lambda http_client, *args: generation_key(*args))
+async def generate_tags_async(http_client, tag_count, url, title, content, allUserTags):
+    """Same as generate_tags, with an httpx.AsyncClient, for the async routes"""
 
     if not url:
         return ["Could not get url"]
 
+    with outbound_call(PERPLEXITY_API_URL, TAG_GENERATION_TIMEOUT_SECONDS) as deadline:
+        # httpx timeouts bound each phase of the call, wait_for bounds the whole of it
+        response = await asyncio.wait_for(http_client.post(
+            PERPLEXITY_API_URL,
+            headers=get_request_headers(),
+            json=build_request_body(tag_count, url, title, content, allUserTags)
+        ), deadline.remaining())
+        response.raise_for_status()
+
+    return parse_tags(response.json())
+
+def generate_local_tags(tag_count, url, title, content, allUserTags):
+    """
+    Fallback of `generate_tags` when the LLM API is unavailable: the user's existing tags whose words all appear
+    in the url, title or content, completed with the site name.
+    """
+    words = set(re.findall(r"[a-z0-9]+", " ".join([url or "", title or "", content or ""]).lower()))
+    tags = []
+    for tag in allUserTags:
+        tag_words = re.findall(r"[a-z0-9]+", tag["tagName"].lower())
+        if tag_words and all(word in words for word in tag_words):
+            tags.append(tag["tagName"])
+
+    # e.g. "https://www.github.com/..." -> "github"
+    host_labels = [label for label in (urlparse(url or "").hostname or "").split(".") if label != "www"]
+    if len(host_labels) >= 2 and not host_labels[-1].isdigit():
+        tags.append(host_labels[-2])
+
+    return list(dict.fromkeys(tags))[:tag_count]
+
+def build_request_body(tag_count, url, title, content, allUserTags):
     suggested_selected_tag_list, user_tag_list = get_user_and_selected_tags(allUserTags)
     prompt = generate_prompt(tag_count, title, content, user_tag_list, suggested_selected_tag_list, url)
+    return {"model": "sonar", "messages": [{"role": "user", "content": prompt}], "max_tokens": 100}
 
-    # Correct API call using perplexity
-    response = requests.post(
-        "https://api.perplexity.ai/chat/completions",
-        headers={"Authorization": f"Bearer {get_api_key()}", "Content-Type": "application/json"},
-        json={"model": "sonar", "messages": [{"role": "user", "content": prompt}], "max_tokens": 100}
-    )
+def get_request_headers():
+    return {"Authorization": f"Bearer {get_api_key()}", "Content-Type": "application/json"}
 
+def parse_tags(response_body):
     # Parse the response
-    tags = response.json().get("choices", [])[0].get("message", {}).get("content", "").split(",")
-    return [tag.strip() for tag in tags]
+    choices = response_body.get("choices") or []
+    if not choices:
+        raise ValueError("Tag generation response has no choices")
+    tags = ((choices[0].get("message") or {}).get("content") or "").split(",")
+    tags = [tag.strip() for tag in tags if tag.strip()]
+    if not tags:
+        raise ValueError("Tag generation response has no tags")
+    return tags
 
 def get_api_key():
     """Load API key from environment variables or .env file"""
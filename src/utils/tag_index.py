@@ -0,0 +1,138 @@
+"""
+In-memory tag -> bookmark posting index used for multi-tag filtering.
+
+Firestore allows a single `array_contains` per query, so AND/OR/NOT across several tags
+cannot be answered server-side. Instead we stream the user's bookmarks once and build
+a posting list per tag. Each bookmark gets a small integer ordinal (its position in the
+listing order) and every posting list is a bitmap stored in a Python int, so AND / OR / NOT
+are plain `&`, `|` and `& ~` operations regardless of how many tags are involved.
+"""
+
+import threading
+from collections import OrderedDict
+
+MATCH_TYPE_AND = "AND"
+MATCH_TYPE_OR = "OR"
+MATCH_TYPES = (MATCH_TYPE_AND, MATCH_TYPE_OR)
+
+# Number of per-user indexes kept in process memory
+TAG_INDEX_CACHE_SIZE = 128
+
+_tag_index_cache = OrderedDict()
+_tag_index_cache_lock = threading.Lock()
+
+
+class TagIndex:
+    def __init__(self, bookmarks):
+        """
+        Build the index from a list of bookmark dicts.
+
+        Bookmarks are ordered newest first (by createdAt) and that order defines the ordinals,
+        so iterating the set bits of a result bitmap yields bookmarks in listing order.
+        """
+        self.bookmarks = sorted(bookmarks, key=lambda b: b.get("createdAt") or 0, reverse=True)
+        self.all_mask = (1 << len(self.bookmarks)) - 1
+        self.tag_postings = {}
+        self.directory_postings = {}
+        self.favorite_mask = 0
+
+        for ordinal, bookmark in enumerate(self.bookmarks):
+            bit = 1 << ordinal
+            for tag_id in bookmark.get("tags", []):
+                self.tag_postings[tag_id] = self.tag_postings.get(tag_id, 0) | bit
+            directory_id = bookmark.get("directoryId")
+            self.directory_postings[directory_id] = self.directory_postings.get(directory_id, 0) | bit
+            if bookmark.get("isFavorite"):
+                self.favorite_mask |= bit
+
+    def match(self, tag_ids, match_type=MATCH_TYPE_AND, exclude_tag_ids=None, directory_id=None, favorite=None):
+        """
+        Compute the bitmap of bookmarks matching the given tag expression and filters.
+
+        Args:
+            tag_ids (list): Tag IDs to match. An empty list matches every bookmark.
+            match_type (str): "AND" requires all tags, "OR" requires at least one.
+            exclude_tag_ids (list): Tag IDs that must NOT be present on the bookmark.
+            directory_id (str): Restrict to bookmarks in this directory.
+            favorite (bool): Restrict to favorite (True) or non-favorite (False) bookmarks.
+
+        Returns:
+            int: Bitmap of matching bookmark ordinals.
+        """
+        if match_type not in MATCH_TYPES:
+            raise ValueError(f"Invalid match_type: {match_type}. Must be one of {', '.join(MATCH_TYPES)}")
+
+        if not tag_ids:
+            mask = self.all_mask
+        elif match_type == MATCH_TYPE_AND:
+            mask = self.all_mask
+            for tag_id in tag_ids:
+                mask &= self.tag_postings.get(tag_id, 0)
+                if not mask:
+                    break
+        else:
+            mask = 0
+            for tag_id in tag_ids:
+                mask |= self.tag_postings.get(tag_id, 0)
+
+        for tag_id in exclude_tag_ids or []:
+            mask &= ~self.tag_postings.get(tag_id, 0)
+
+        if directory_id is not None:
+            mask &= self.directory_postings.get(directory_id, 0)
+
+        if favorite is True:
+            mask &= self.favorite_mask
+        elif favorite is False:
+            mask &= ~self.favorite_mask
+
+        return mask & self.all_mask
+
+    def page(self, mask, offset=0, limit=None):
+        """
+        Return the bookmarks for the set bits of `mask`, skipping `offset` matches and
+        returning at most `limit` of them, in listing order.
+        """
+        results = []
+        skipped = 0
+        while mask:
+            lowest_bit = mask & -mask
+            mask ^= lowest_bit
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(self.bookmarks[lowest_bit.bit_length() - 1])
+        return results
+
+
+
+def get_cached_tag_index(user_id, data_version, loader):
+    """
+    Return the TagIndex of a user for the given data version, building it with `loader()` on a miss.
+    Entries are keyed by user and replaced as soon as the user's data version moves on.
+    """
+    tag_index = lookup_tag_index(user_id, data_version)
+    if tag_index is None:
+        tag_index = loader()
+        store_tag_index(user_id, data_version, tag_index)
+    return tag_index
+
+
+def lookup_tag_index(user_id, data_version):
+    """Return the cached TagIndex of a user for the given data version, or None."""
+    with _tag_index_cache_lock:
+        entry = _tag_index_cache.get(user_id)
+        if entry and entry[0] == data_version:
+            _tag_index_cache.move_to_end(user_id)
+            return entry[1]
+    return None
+
+
+def store_tag_index(user_id, data_version, tag_index):
+    with _tag_index_cache_lock:
+        _tag_index_cache[user_id] = (data_version, tag_index)
+        _tag_index_cache.move_to_end(user_id)
+        while len(_tag_index_cache) > TAG_INDEX_CACHE_SIZE:
+            _tag_index_cache.popitem(last=False)
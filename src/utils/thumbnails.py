@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import requests
+from urllib.parse import urlparse
+from src.utils.resilience import outbound_call, request_timeout
+from src.utils.metrics import OUTBOUND_IMAGE
+from src.utils.singleflight import singleflight
+from src.utils.urls import normalize_url
+
+"""
+Thumbnails of bookmark images, generated by the enrichment and served by /thumbnail/<imageHash>/<size>.
+
+The image a page points to is downloaded once (at most MAX_IMAGE_BYTES), resized to THUMBNAIL_SIZES and stored
+under the SHA-256 of the original image: the same image bookmarked by many users, or from many pages, is stored
+and processed once. Stored thumbnails never change, so they are served with immutable cache headers.
+
+Thumbnails are stored in the Cloud Storage bucket THUMBNAIL_BUCKET of the Firebase project, required when deployed:
+serverless instances do not share their disk, nor keep it. THUMBNAIL_DIR (local disk) is for a single long-lived
+server or local runs. With neither set no thumbnails are created, rather than storing a `thumbnailHash` that other
+instances could not serve.
+"""
+
+# Name -> largest width and height, in pixels
+THUMBNAIL_SIZES = {"small": 160, "medium": 480}
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+THUMBNAIL_QUALITY = 80
+
+MAX_IMAGE_BYTES = int(os.getenv("THUMBNAIL_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Images decoding to more pixels are not processed (decompression bombs)
+MAX_IMAGE_PIXELS = 40_000_000
+IMAGE_FETCH_TIMEOUT_SECONDS = 10
+
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR")
+THUMBNAIL_BUCKET = os.getenv("THUMBNAIL_BUCKET")
+
+IMAGE_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ThumbnailError(Exception):
+    """The image could not be turned into thumbnails (too large, not an image...)."""
+
+
+class LocalThumbnailStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, image_hash, size):
+        # Fanned out by hash prefix, to keep directories small
+        return os.path.join(self.directory, image_hash[:2], image_hash, f"{size}.{THUMBNAIL_FORMAT.lower()}")
+
+    def exists(self, image_hash, size):
+        return os.path.exists(self.path(image_hash, size))
+
+    def write(self, image_hash, size, data):
+        path = self.path(image_hash, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside then renamed, a concurrent reader never sees a partial file
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def read(self, image_hash, size):
+        try:
+            with open(self.path(image_hash, size), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+
+class BucketThumbnailStore:
+    def __init__(self, bucket_name):
+        from firebase_admin import storage
+        from src.utils.init import init_firebase_app
+        init_firebase_app()
+        self.bucket = storage.bucket(bucket_name)
+
+    def blob(self, image_hash, size):
+        return self.bucket.blob(f"thumbnails/{image_hash}/{size}.{THUMBNAIL_FORMAT.lower()}")
+
+    def exists(self, image_hash, size):
+        return self.blob(image_hash, size).exists()
+
+    def write(self, image_hash, size, data):
+        blob = self.blob(image_hash, size)
+        blob.cache_control = "public, max-age=31536000, immutable"
+        blob.upload_from_string(data, content_type=THUMBNAIL_CONTENT_TYPE)
+
+    def read(self, image_hash, size):
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.blob(image_hash, size).download_as_bytes()
+        except NotFound:
+            return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_thumbnail_store():
+    """The configured thumbnail store, created on first use. None if neither THUMBNAIL_BUCKET nor THUMBNAIL_DIR is set."""
+    global _store
+    if _store is None and (THUMBNAIL_BUCKET or THUMBNAIL_DIR):
+        with _store_lock:
+            if _store is None:
+                _store = BucketThumbnailStore(THUMBNAIL_BUCKET) if THUMBNAIL_BUCKET else LocalThumbnailStore(THUMBNAIL_DIR)
+    return _store
+
+
+def is_valid_thumbnail(image_hash, size):
+    return bool(IMAGE_HASH_PATTERN.match(image_hash or "")) and size in THUMBNAIL_SIZES
+
+
+@singleflight("thumbnail", key=lambda image_url: normalize_url(image_url))
+def create_thumbnails(image_url):
+    """
+    Download the image at `image_url` and store its thumbnails. Returns the hash identifying them, empty if no
+    thumbnail store is configured. Raises ThumbnailError if the image can not be used, or the errors of the
+    download (see resilience.py).
+    """
+    store = get_thumbnail_store()
+    if store is None:
+        return ""
+    if urlparse(image_url).scheme not in ("http", "https"):
+        raise ThumbnailError("Only http(s) images are supported")
+    image = download_image(image_url)
+    image_hash = hashlib.sha256(image).hexdigest()
+
+    missing_sizes = [size for size in THUMBNAIL_SIZES if not store.exists(image_hash, size)]
+    for size, data in resize_image(image, missing_sizes).items():
+        store.write(image_hash, size, data)
+    return image_hash
+
+
+def download_image(image_url):
+    headers = {"User-Agent": "Mozilla/5.0", "Accept": "image/*"}
+    # Unusable images are reported once out of `outbound_call`, they are not failures of the host
+    image, error = None, None
+    with outbound_call(image_url, IMAGE_FETCH_TIMEOUT_SECONDS, OUTBOUND_IMAGE) as deadline:
+        response = requests.get(image_url, headers=headers, timeout=request_timeout(deadline), stream=True)
+        with response:
+            if response.status_code >= 500:
+                response.raise_for_status()
+            if response.status_code != 200:
+                error = f"Image request failed with status {response.status_code}"
+            elif int(response.headers.get("Content-Length") or 0) > MAX_IMAGE_BYTES:
+                error = "Image too large"
+            else:
+                image = read_capped(response, deadline)
+                if image is None:
+                    error = "Image too large"
+    if error:
+        raise ThumbnailError(error)
+    return image
+
+
+def read_capped(response, deadline):
+    """Read a streamed response body, None if it is larger than MAX_IMAGE_BYTES."""
+    chunks = []
+    size = 0
+    while chunk := response.raw.read1(64 * 1024, decode_content=True):
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            return None
+        chunks.append(chunk)
+        deadline.check()
+    return b"".join(chunks)
+
+
+def resize_image(image, sizes):
+    """Return {size: encoded thumbnail} for the given size names."""
+    # Imported on first use, like the other enrichment modules
+    from PIL import Image, ImageOps
+
+    if not sizes:
+        return {}
+    try:
+        source = Image.open(io.BytesIO(image))
+        # Opening only reads the header, check the dimensions before decoding
+        if source.width * source.height > MAX_IMAGE_PIXELS:
+            raise ThumbnailError("Image too large")
+        source.load()
+    except ThumbnailError:
+        raise
+    except Image.DecompressionBombError:
+        raise ThumbnailError("Image too large")
+    except Exception as e:
+        raise ThumbnailError(f"Not a supported image: {str(e)}")
+
+    # Camera pictures are often stored rotated, with the orientation in their EXIF data
+    source = ImageOps.exif_transpose(source)
+    source = source.convert("RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB")
+
+    thumbnails = {}
+    for size in sizes:
+        thumbnail = source.copy()
+        thumbnail.thumbnail((THUMBNAIL_SIZES[size], THUMBNAIL_SIZES[size]), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        thumbnail.save(output, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        thumbnails[size] = output.getvalue()
+    return thumbnails
@@ -0,0 +1,71 @@
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+# Must be set before the app (and with it the global storage client) is imported
+os.environ["STORAGE_BACKEND"] = "memory"
+
+import index
+from src.utils.init import db
+from src.models.bookmark_model import BOOKMARK_COLLECTION, BOOKMARK_MODEL, LINK_STATUS
+from src.models.tag_model import TAG_COLLECTION, TAG_CREATOR
+from src.models.user_model import USER_COLLECTION, USER_MODEL
+
+"""
+Smoke tests of the app on the in-memory storage backend (src/utils/storage/memory_store.py).
+
+Tests share one store: each one writes the data of a new user (`user_id`) and only looks at it.
+Run from the repository root: `pip install pytest && python -m pytest -q`.
+"""
+
+
+def now():
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def add_bookmark(user_id, bookmark_id, **fields):
+    bookmark = BOOKMARK_MODEL.copy()
+    bookmark.update({"bookmarkId": bookmark_id, "userId": user_id, "url": f"https://example.com/{bookmark_id}",
+                     "linkStatus": LINK_STATUS.UNKNOWN.value, "createdAt": now(), "updatedAt": now(), **fields})
+    db.collection(BOOKMARK_COLLECTION).document(bookmark_id).set(bookmark)
+    return bookmark
+
+
+def add_tag(user_id, tag_id, tag_name, created_at=1):
+    tag = {"tagId": tag_id, "tagName": tag_name, "creator": TAG_CREATOR.USER.value, "userId": user_id,
+           "createdAt": created_at, "updatedAt": now(), "isDeleted": False}
+    db.collection(TAG_COLLECTION).document(tag_id).set(tag)
+    return tag
+
+
+def tag_fields(tags):
+    return {"tags": [tag["tagId"] for tag in tags], "tagNames": [tag["tagName"] for tag in tags]}
+
+
+def get_document(collection, doc_id):
+    return db.collection(collection).document(doc_id).get().to_dict()
+
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def client():
+    return index.app.test_client()
+
+
+@pytest.fixture
+def user_id():
+    user_id = f"test-user-{uuid.uuid4()}"
+    user = USER_MODEL.copy()
+    user.update({"userId": user_id, "email": f"{user_id}@example.com", "createdAt": now(), "updatedAt": now()})
+    db.collection(USER_COLLECTION).document(user_id).set(user)
+    return user_id
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+    return {"adminToken": ADMIN_TOKEN}
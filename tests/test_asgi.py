@@ -0,0 +1,33 @@
+import pytest
+from starlette.testclient import TestClient
+
+import index
+from src.utils.asgi import create_asgi_app
+from tests.conftest import add_tag
+
+
+@pytest.fixture(scope="module")
+def asgi_client():
+    with TestClient(create_asgi_app(index.app)) as asgi_client:
+        yield asgi_client
+
+
+def test_async_listing_matches_the_flask_one(client, asgi_client, user_id):
+    add_tag(user_id, f"{user_id}-python", "python")
+
+    flask_response = client.get("/api/tag/all", headers={"userId": user_id})
+    response = asgi_client.get("/api/tag/all", headers={"userId": user_id})
+
+    assert response.status_code == 200
+    assert [tag["tagId"] for tag in response.json()["data"]["tags"]] == \
+        [tag["tagId"] for tag in flask_response.json["data"]["tags"]]
+    assert response.headers["ETag"] == flask_response.headers["ETag"]
+    assert asgi_client.get("/api/tag/all", headers={"userId": user_id, "If-None-Match": response.headers["ETag"]})\
+        .status_code == 304
+
+
+def test_other_routes_fall_back_to_the_flask_app(asgi_client, user_id):
+    response = asgi_client.post("/api/directory/create", json={"name": "Reading"}, headers={"userId": user_id})
+
+    assert response.status_code == 201
+    assert response.json()["data"]["directory"]["name"] == "Reading"
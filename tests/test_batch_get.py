@@ -0,0 +1,43 @@
+from tests.conftest import add_bookmark, add_tag, tag_fields
+
+
+def batch_get(client, user_id, kind, ids):
+    response = client.post(f"/api/{kind}/batch-get", json={f"{kind}Ids": ids}, headers={"userId": user_id})
+    assert response.status_code == 200
+    return response.json["data"]
+
+
+def test_batch_get_bookmarks_in_request_order_with_errors(client, user_id):
+    tag = add_tag(user_id, f"{user_id}-python", "python")
+    add_bookmark(user_id, f"{user_id}-b1", **tag_fields([tag]))
+    add_bookmark(user_id, f"{user_id}-b2")
+    add_bookmark(f"{user_id}-other", f"{user_id}-other-b1")
+    add_bookmark(user_id, f"{user_id}-deleted", isDeleted=True)
+
+    data = batch_get(client, user_id, "bookmark", [f"{user_id}-b2", f"{user_id}-b1", f"{user_id}-other-b1",
+                                                   f"{user_id}-deleted", f"{user_id}-missing"])
+
+    assert [bookmark["bookmarkId"] for bookmark in data["bookmarks"]] == [f"{user_id}-b2", f"{user_id}-b1"]
+    assert data["bookmarks"][1]["tags"] == ["python"]
+    assert {bookmark_id: error["status"] for bookmark_id, error in data["errors"].items()} == {
+        f"{user_id}-other-b1": 403, f"{user_id}-deleted": 404, f"{user_id}-missing": 404}
+
+
+def test_batch_get_tags_and_directories(client, user_id):
+    tag = add_tag(user_id, f"{user_id}-python", "python")
+    response = client.post("/api/directory/create", json={"name": "Reading"}, headers={"userId": user_id})
+    directory_id = response.json["data"]["directory"]["directoryId"]
+
+    data = batch_get(client, user_id, "tag", [tag["tagId"], f"{user_id}-missing"])
+    assert [tag["tagName"] for tag in data["tags"]] == ["python"]
+    assert list(data["errors"]) == [f"{user_id}-missing"]
+
+    data = batch_get(client, user_id, "directory", [directory_id])
+    assert [directory["name"] for directory in data["directories"]] == ["Reading"]
+    assert data["errors"] == {}
+
+
+def test_batch_get_without_ids_is_rejected(client, user_id):
+    response = client.post("/api/bookmark/batch-get", json={"bookmarkIds": []}, headers={"userId": user_id})
+
+    assert response.status_code == 400
@@ -0,0 +1,34 @@
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from tests.conftest import add_bookmark, get_document
+
+
+def test_batch_reports_one_result_per_operation(client, user_id):
+    add_bookmark(user_id, f"{user_id}-b1", isFavorite=False)
+    add_bookmark(user_id, f"{user_id}-b2")
+    add_bookmark(f"{user_id}-other", f"{user_id}-other-b1")
+
+    response = client.post("/api/bookmark/batch", json={"operations": [
+        {"bookmarkId": f"{user_id}-b1", "action": "favorite"},
+        {"bookmarkId": f"{user_id}-b1", "action": "addTags", "tags": ["reading"]},
+        {"bookmarkId": f"{user_id}-b2", "action": "delete"},
+        {"bookmarkId": f"{user_id}-other-b1", "action": "delete"},
+        {"bookmarkId": f"{user_id}-missing", "action": "update", "title": "t"},
+        {"bookmarkId": f"{user_id}-b2", "action": "archive"}
+    ]}, headers={"userId": user_id})
+
+    assert response.status_code == 200
+    results = response.json["data"]["results"]
+    assert [result["status"] for result in results] == [200, 200, 200, 403, 404, 400]
+    assert results[0]["isFavorite"] and results[2]["isDeleted"]
+
+    bookmark = get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")
+    assert bookmark["isFavorite"]
+    assert bookmark["tagNames"] == ["reading"]
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b2")["isDeleted"]
+    assert not get_document(BOOKMARK_COLLECTION, f"{user_id}-other-b1")["isDeleted"]
+
+
+def test_batch_without_operations_is_rejected(client, user_id):
+    response = client.post("/api/bookmark/batch", json={"operations": []}, headers={"userId": user_id})
+
+    assert response.status_code == 400
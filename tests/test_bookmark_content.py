@@ -0,0 +1,35 @@
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.utils.init import db
+from src.utils.routes_util import bookmark_content_ref, update_bookmark_fields
+from tests.conftest import add_bookmark, get_document
+
+
+def get_bookmark(client, user_id, bookmark_id, include_content):
+    response = client.get(f"/api/bookmark/get/{bookmark_id}?includeContent={str(include_content).lower()}",
+                          headers={"userId": user_id})
+    assert response.status_code == 200
+    return response.json["data"]["bookmark"]
+
+
+def test_content_is_kept_out_of_the_bookmark(client, user_id):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1")
+    update_bookmark_fields(db.collection(BOOKMARK_COLLECTION).document(bookmark["bookmarkId"]),
+                           {"title": "Title", "fetchedContent": "Page text", "generatedTags": ["python"]})
+
+    assert "fetchedContent" not in get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])
+    assert "generatedTags" not in get_bookmark(client, user_id, bookmark["bookmarkId"], False)
+    bookmark = get_bookmark(client, user_id, bookmark["bookmarkId"], True)
+    assert bookmark["title"] == "Title"
+    assert bookmark["fetchedContent"] == "Page text"
+    assert bookmark["generatedTags"] == ["python"]
+
+
+def test_migration_moves_the_content_of_legacy_bookmarks(client, user_id, admin_headers):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", fetchedContent="Page text", generatedTags=["python"])
+
+    response = client.post("/api/admin/jobs/migrate-bookmark-content", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert "fetchedContent" not in get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])
+    assert bookmark_content_ref(bookmark["bookmarkId"]).get().to_dict()["generatedTags"] == ["python"]
+    assert get_bookmark(client, user_id, bookmark["bookmarkId"], True)["fetchedContent"] == "Page text"
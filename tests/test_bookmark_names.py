@@ -0,0 +1,46 @@
+import src.services.routes.directory_routes as directory_routes
+import src.services.routes.tag_routes as tag_routes
+from src.jobs.bookmark_names import propagate_directory_rename, propagate_tag_rename
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.utils.init import db
+from tests.conftest import add_bookmark, add_tag, get_document, tag_fields
+
+
+def test_tag_rename_is_written_on_its_bookmarks(client, user_id, monkeypatch):
+    renames = []
+    monkeypatch.setattr(tag_routes, "propagate_tag_rename", lambda *args: renames.append(args))
+    response = client.post("/api/tag/create", json={"tagName": "python"}, headers={"userId": user_id})
+    tag = response.json["data"]["tag"]
+    add_bookmark(user_id, f"{user_id}-b1", **tag_fields([tag, add_tag(user_id, f"{user_id}-flask", "flask")]))
+
+    response = client.post(f"/api/tag/update/{tag['tagId']}", json={"tagName": "Python"}, headers={"userId": user_id})
+    assert response.status_code == 200
+    assert renames == [(user_id, tag["tagId"])]
+    propagate_tag_rename(*renames[0])
+
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["tagNames"] == ["Python", "flask"]
+
+
+def test_directory_rename_is_written_on_its_bookmarks(client, user_id, monkeypatch):
+    renames = []
+    monkeypatch.setattr(directory_routes, "propagate_directory_rename", lambda *args: renames.append(args))
+    response = client.post("/api/directory/create", json={"name": "Reading"}, headers={"userId": user_id})
+    directory_id = response.json["data"]["directory"]["directoryId"]
+    add_bookmark(user_id, f"{user_id}-b1", directoryId=directory_id, directoryName="Reading")
+
+    response = client.post(f"/api/directory/rename/{directory_id}", json={"name": "Later"}, headers={"userId": user_id})
+    assert response.status_code == 200
+    propagate_directory_rename(*renames[0])
+
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["directoryName"] == "Later"
+
+
+def test_backfill_writes_the_names_of_legacy_bookmarks(client, user_id, admin_headers):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", tags=[add_tag(user_id, f"{user_id}-python", "python")["tagId"]])
+    del bookmark["tagNames"], bookmark["directoryName"]
+    db.collection(BOOKMARK_COLLECTION).document(bookmark["bookmarkId"]).set(bookmark)
+
+    response = client.post("/api/admin/jobs/backfill-bookmark-names", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["tagNames"] == ["python"]
@@ -0,0 +1,86 @@
+import pytest
+
+import src.utils.routes_util as routes_util
+import src.utils.tagGeneration.fetch_page_content as fetch_page_content_module
+import src.utils.tagGeneration.generate_tags as generate_tags_module
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.utils.init import db
+from src.utils.routes_util import async_process_bookmark_creation, fetch_bookmark_content
+from tests.conftest import add_bookmark, get_document
+
+
+@pytest.fixture
+def enrichment(monkeypatch):
+    """Canned page and tags for the enrichment. `during` runs while the tags are generated, like a user edit."""
+    during = []
+
+    def fetch_page_content(url):
+        page_content = fetch_page_content_module.create_page_content("Page title", "Page text")
+        page_content["status"] = 200
+        return page_content
+
+    def generate_tags(count, url, title, content, user_tags):
+        for edit in during:
+            edit()
+        return ["python"]
+
+    monkeypatch.setattr(fetch_page_content_module, "fetch_page_content", fetch_page_content)
+    monkeypatch.setattr(generate_tags_module, "generate_tags", generate_tags)
+    return during
+
+
+def update(client, user_id, bookmark_id, body):
+    return client.post(f"/api/bookmark/update/{bookmark_id}", json=body, headers={"userId": user_id})
+
+
+def test_enrichment_fills_an_empty_title(user_id, enrichment):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", title="")
+
+    async_process_bookmark_creation(bookmark["bookmarkId"], bookmark["url"], user_id)
+
+    enriched = get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])
+    assert enriched["title"] == "Page title"
+    assert enriched["tagNames"] == ["python"]
+
+
+def test_title_updated_during_enrichment_is_kept(client, user_id, enrichment):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", title="")
+    enrichment.append(lambda: update(client, user_id, bookmark["bookmarkId"], {"title": "My title"}))
+
+    async_process_bookmark_creation(bookmark["bookmarkId"], bookmark["url"], user_id)
+
+    enriched = get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])
+    assert enriched["title"] == "My title"
+    assert fetch_bookmark_content(bookmark["bookmarkId"], enriched)["generatedTags"] == ["python"]
+
+
+def test_enrichment_is_written_again_after_a_concurrent_write(user_id, enrichment, monkeypatch):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", title="")
+    bookmark_ref = db.collection(BOOKMARK_COLLECTION).document(bookmark["bookmarkId"])
+    update_bookmark_fields = routes_util.update_bookmark_fields
+
+    def racing_update(ref, fields, option=None):
+        # The user sets the title between the read of the enrichment and its write
+        if not bookmark_ref.get().to_dict()["title"]:
+            bookmark_ref.update({"title": "My title"})
+        return update_bookmark_fields(ref, fields, option=option)
+
+    monkeypatch.setattr(routes_util, "update_bookmark_fields", racing_update)
+    async_process_bookmark_creation(bookmark["bookmarkId"], bookmark["url"], user_id)
+
+    enriched = get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])
+    assert enriched["title"] == "My title"
+    assert fetch_bookmark_content(bookmark["bookmarkId"], enriched)["generatedTags"] == ["python"]
+
+
+def test_update_with_a_stale_update_time_is_rejected(client, user_id):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", title="First")
+    response = update(client, user_id, bookmark["bookmarkId"], {"title": "Second"})
+    assert response.status_code == 200
+    update_time = response.json["data"]["updateTime"]
+
+    assert update(client, user_id, bookmark["bookmarkId"], {"notes": "n", "updateTime": update_time}).status_code == 200
+    response = update(client, user_id, bookmark["bookmarkId"], {"title": "Third", "updateTime": update_time})
+
+    assert response.status_code == 412
+    assert get_document(BOOKMARK_COLLECTION, bookmark["bookmarkId"])["title"] == "Second"
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from src.utils.concurrency import run_concurrently
+from src.utils.metrics import RequestStats, _current_stats
+from src.models.user_model import USER_COLLECTION
+from src.utils.init import db
+
+
+def test_calls_run_in_parallel_and_return_in_order():
+    started = threading.Barrier(3, timeout=5)
+
+    def call(value):
+        # Every call waits for the others, so this only returns if they run at the same time
+        started.wait()
+        return value
+
+    assert run_concurrently(*(lambda value=value: call(value) for value in range(3))) == [0, 1, 2]
+
+
+def test_error_of_a_call_is_raised_after_the_others_finish():
+    finished = []
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        run_concurrently(fail, lambda: finished.append(True))
+    assert finished == [True]
+
+
+def test_reads_of_the_calls_are_accounted_to_the_caller(user_id):
+    stats = RequestStats("test", "GET")
+    token = _current_stats.set(stats)
+    try:
+        run_concurrently(*(lambda: db.collection(USER_COLLECTION).document(user_id).get() for _ in range(3)))
+    finally:
+        _current_stats.reset(token)
+
+    assert stats.documents_read == 3
@@ -0,0 +1,29 @@
+def get_directories(client, user_id, etag=None):
+    headers = {"userId": user_id}
+    if etag:
+        headers["If-None-Match"] = etag
+    return client.get("/api/directory/all", headers=headers)
+
+
+def test_unchanged_listing_is_not_modified(client, user_id):
+    response = get_directories(client, user_id)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = get_directories(client, user_id, etag)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.data
+
+
+def test_write_changes_the_etag_of_the_listings(client, user_id):
+    etag = get_directories(client, user_id).headers["ETag"]
+    response = client.post("/api/directory/create", json={"name": "Reading"}, headers={"userId": user_id})
+    assert response.status_code == 201
+
+    response = get_directories(client, user_id, etag)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [directory["name"] for directory in response.json["data"]["directories"]] == ["Reading"]
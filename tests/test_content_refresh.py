@@ -0,0 +1,65 @@
+import pytest
+
+import src.utils.tagGeneration.fetch_page_content as fetch_page_content_module
+import src.utils.tagGeneration.generate_tags as generate_tags_module
+from src.jobs.content_refresh import refresh_bookmark, MIN_REFRESH_INTERVAL_SECONDS
+from src.models.bookmark_model import BOOKMARK_COLLECTION, LINK_STATUS
+from src.utils.init import db
+from src.utils.routes_util import fetch_bookmark_content
+from tests.conftest import add_bookmark, get_document
+
+
+@pytest.fixture
+def page(monkeypatch):
+    """The page answered to the refresh, and the validators it was requested with."""
+    page = {"status": 200, "title": "New title", "requests": []}
+
+    def fetch_page_content(url, etag=None, last_modified=None):
+        page["requests"].append({"etag": etag, "lastModified": last_modified})
+        page_content = fetch_page_content_module.create_page_content(page["title"], "Page text")
+        page_content.update({"status": page["status"], "etag": '"v2"'})
+        return page_content
+
+    monkeypatch.setattr(fetch_page_content_module, "fetch_page_content", fetch_page_content)
+    monkeypatch.setattr(generate_tags_module, "generate_tags", lambda count, url, title, content, user_tags: ["news"])
+    return page
+
+
+def refresh(bookmark_id):
+    return refresh_bookmark(db.collection(BOOKMARK_COLLECTION).document(bookmark_id).get())
+
+
+def test_unmodified_page_is_revalidated_with_its_validators(user_id, page):
+    add_bookmark(user_id, f"{user_id}-b1", contentEtag='"v1"', refreshInterval=MIN_REFRESH_INTERVAL_SECONDS)
+    page["status"] = 304
+
+    assert refresh(f"{user_id}-b1") == "not_modified"
+
+    assert page["requests"] == [{"etag": '"v1"', "lastModified": None}]
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["refreshInterval"] == 2 * MIN_REFRESH_INTERVAL_SECONDS
+
+
+def test_changed_page_keeps_the_user_title(user_id, page):
+    bookmark = add_bookmark(user_id, f"{user_id}-b1", title="My title", contentHash="old")
+
+    assert refresh(f"{user_id}-b1") == "changed"
+
+    refreshed = get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")
+    assert refreshed["title"] == "My title"
+    assert refreshed["tags"] == bookmark["tags"]
+    assert refreshed["contentEtag"] == '"v2"'
+    assert fetch_bookmark_content(f"{user_id}-b1", refreshed)["generatedTags"] == ["news"]
+
+
+def test_gone_page_is_recorded(user_id, page):
+    add_bookmark(user_id, f"{user_id}-b1")
+    page["status"] = 404
+
+    assert refresh(f"{user_id}-b1") == "gone"
+
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["linkStatus"] == LINK_STATUS.GONE.value
+
+
+def test_content_refresh_api_validates_its_limit(client, admin_headers):
+    assert client.post("/api/admin/jobs/content-refresh?limit=1").status_code == 401
+    assert client.post("/api/admin/jobs/content-refresh?limit=-1", headers=admin_headers).status_code == 400
@@ -0,0 +1,63 @@
+import pytest
+
+import src.jobs.directory_tree as directory_tree
+import src.services.routes.directory_routes as directory_routes
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.jobs.directory_tree import move_directory_subtree, repair_directory_paths
+from tests.conftest import add_bookmark, get_document
+
+
+@pytest.fixture
+def tree(client, user_id, monkeypatch):
+    """Directories a > b and c, with a bookmark in b. Moves do not start their background rewrite."""
+    monkeypatch.setattr(directory_routes, "move_directory_in_background", lambda user_id, directory_id: None)
+
+    def create(name, parent_id=None):
+        response = client.post("/api/directory/create", json={"name": name, "parentId": parent_id},
+                               headers={"userId": user_id})
+        assert response.status_code == 201
+        return response.json["data"]["directory"]["directoryId"]
+
+    directories = {"a": create("a")}
+    directories["b"] = create("b", directories["a"])
+    directories["c"] = create("c")
+    add_bookmark(user_id, f"{user_id}-b1", directoryId=directories["b"], directoryName="b",
+                 directoryPath=[directories["a"], directories["b"]])
+    return directories
+
+
+def move(client, user_id, directory_id, parent_id):
+    response = client.post(f"/api/directory/move/{directory_id}", json={"parentId": parent_id},
+                           headers={"userId": user_id})
+    assert response.status_code == 200
+    return response.json["data"]["directory"]
+
+
+def test_move_rewrites_the_paths_of_the_subtree(client, user_id, tree):
+    a, b, c = tree["a"], tree["b"], tree["c"]
+    assert move(client, user_id, a, c)["ancestors"] == [c]
+
+    assert move_directory_subtree(user_id, a) == 1
+
+    assert get_document(DIRECTORY_COLLECTION, b)["ancestors"] == [c, a]
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["directoryPath"] == [c, a, b]
+    assert get_document(DIRECTORY_COLLECTION, a)["pathsDirtyAt"] is None
+
+
+def test_move_into_its_subtree_is_rejected(client, user_id, tree):
+    response = client.post(f"/api/directory/move/{tree['a']}", json={"parentId": tree["b"]},
+                           headers={"userId": user_id})
+    assert response.status_code == 400
+
+
+def test_repair_rewrites_the_paths_of_an_unfinished_move(client, user_id, tree, monkeypatch):
+    a, b, c = tree["a"], tree["b"], tree["c"]
+    assert move(client, user_id, a, c)["pathsDirtyAt"]
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["directoryPath"] == [a, b]
+
+    monkeypatch.setattr(directory_tree, "REPAIR_DELAY_SECONDS", -1)
+    assert repair_directory_paths()["repaired"] >= 1
+
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["directoryPath"] == [c, a, b]
+    assert get_document(DIRECTORY_COLLECTION, a)["pathsDirtyAt"] is None
@@ -0,0 +1,31 @@
+import threading
+
+import src.services.routes.event_routes as event_routes
+from src.utils.events import event_bus
+
+
+def poll(client, user_id, last_event_id, timeout=0):
+    return client.get(f"/api/events/poll?lastEventId={last_event_id}&timeout={timeout}", headers={"userId": user_id})
+
+
+def test_poll_returns_the_events_after_the_last_event_id(client, user_id):
+    last_event_id = event_bus.last_event_id()
+    event_id = event_bus.publish(user_id, "bookmark.enriched", {"bookmarkId": f"{user_id}-b1"})
+
+    response = poll(client, user_id, last_event_id)
+
+    assert response.status_code == 200
+    assert [event["id"] for event in response.json["data"]["events"]] == [event_id]
+    assert response.json["data"]["lastEventId"] == event_id
+    assert not response.json["data"]["resetRequired"]
+
+
+def test_poll_past_the_waiters_limit_is_retried_later(client, user_id, monkeypatch):
+    monkeypatch.setattr(event_routes, "_poll_waiters", threading.BoundedSemaphore(1))
+    event_routes._poll_waiters.acquire()
+
+    response = poll(client, user_id, event_bus.last_event_id(), timeout=1)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(event_routes.EVENT_POLL_RETRY_AFTER_SECONDS)
+
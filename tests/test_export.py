@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+from tests.conftest import add_bookmark, add_tag, tag_fields
+
+
+def export(client, user_id, export_format):
+    response = client.get(f"/api/bookmark/export?format={export_format}", headers={"userId": user_id})
+    assert response.status_code == 200
+    assert "attachment" in response.headers["Content-Disposition"]
+    return response.get_data(as_text=True)
+
+
+def test_export_formats(client, user_id):
+    tag = add_tag(user_id, f"{user_id}-python", "python")
+    response = client.post("/api/directory/create", json={"name": "Reading"}, headers={"userId": user_id})
+    directory_id = response.json["data"]["directory"]["directoryId"]
+    add_bookmark(user_id, f"{user_id}-b1", title="In a folder", directoryId=directory_id, directoryName="Reading",
+                 **tag_fields([tag]))
+    add_bookmark(user_id, f"{user_id}-b2", title="At the top")
+    add_bookmark(user_id, f"{user_id}-b3", title="Deleted", isDeleted=True)
+
+    records = {record["title"]: record for record in map(json.loads, export(client, user_id, "ndjson").splitlines())}
+    assert set(records) == {"In a folder", "At the top"}
+    assert records["In a folder"]["tags"] == ["python"]
+
+    rows = list(csv.DictReader(io.StringIO(export(client, user_id, "csv"))))
+    assert sorted(row["title"] for row in rows) == ["At the top", "In a folder"]
+
+    html = export(client, user_id, "html")
+    assert html.startswith("<!DOCTYPE NETSCAPE-Bookmark-file-1>")
+    assert html.index("<H3") < html.index("In a folder") and ">Reading</H3>" in html
+
+
+def test_export_rejects_an_unknown_format(client, user_id):
+    response = client.get("/api/bookmark/export?format=xml", headers={"userId": user_id})
+
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition, NotFound
+
+from src.utils.storage.memory_store import MemoryClient
+
+
+@pytest.fixture
+def store():
+    return MemoryClient()
+
+
+def test_write_with_a_stale_update_time_fails(store):
+    ref = store.collection("bookmarks").document("b1")
+    ref.set({"title": "First", "tags": ["a"]})
+    snapshot = ref.get()
+    ref.update({"tags": firestore.ArrayUnion(["b"])})
+
+    with pytest.raises(FailedPrecondition):
+        ref.update({"title": "Second"}, option=store.write_option(last_update_time=snapshot.update_time))
+    assert ref.get().to_dict() == {"title": "First", "tags": ["a", "b"]}
+    with pytest.raises(NotFound):
+        store.collection("bookmarks").document("missing").update({"title": "t"})
+
+
+def test_failed_batch_writes_nothing(store):
+    store.collection("bookmarks").document("b1").set({"title": "First"})
+    batch = store.batch()
+    batch.update(store.collection("bookmarks").document("b1"), {"title": "Second"})
+    batch.update(store.collection("bookmarks").document("missing"), {"title": "t"})
+
+    with pytest.raises(NotFound):
+        batch.commit()
+    assert store.collection("bookmarks").document("b1").get().to_dict() == {"title": "First"}
+
+
+def test_queries_filter_order_and_page(store):
+    for number in range(5):
+        store.collection("bookmarks").document(f"b{number}").set({"userId": "u1" if number % 2 else "u2", "rank": -number})
+
+    query = store.collection("bookmarks").where("userId", "==", "u2").order_by("rank")
+
+    assert [snapshot.id for snapshot in query.stream()] == ["b4", "b2", "b0"]
+    assert [snapshot.id for snapshot in query.limit(1).start_after({"rank": -4}).stream()] == ["b2"]
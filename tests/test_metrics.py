@@ -0,0 +1,24 @@
+import re
+
+from tests.conftest import ADMIN_TOKEN
+
+
+def test_response_carries_the_datastore_cost_of_the_request(client, user_id):
+    response = client.get("/api/tag/all", headers={"userId": user_id})
+
+    assert response.status_code == 200
+    reads = re.search(r"reads=(\d+) writes=(\d+) queries=(\d+)", response.headers["Server-Timing"])
+    # The user document read by authorize_user and the tag query
+    assert int(reads.group(1)) >= 1 and int(reads.group(3)) >= 1
+
+
+def test_metrics_are_served_to_admins_only(client, user_id, admin_headers):
+    client.get("/api/tag/all", headers={"userId": user_id})
+
+    assert client.get("/api/metrics").status_code == 401
+    response = client.get("/api/metrics", headers={"Authorization": f"Bearer {ADMIN_TOKEN}"})
+
+    assert response.status_code == 200
+    metrics = response.get_data(as_text=True)
+    assert re.search(r'bookmarkai_requests_total\{[^}]*route="/api/tag/all"', metrics)
+    assert "bookmarkai_datastore_documents_read_total" in metrics
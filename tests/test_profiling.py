@@ -0,0 +1,31 @@
+import pstats
+
+from src.utils.concurrency import run_concurrently
+from src.utils.profiling import _ActiveProfile, get_profile_path, PROFILE_ID_HEADER
+
+
+def profiled_call():
+    return sum(range(1000))
+
+
+def test_profile_includes_the_fan_out_calls():
+    active = _ActiveProfile.start("test")
+    assert active is not None
+    run_concurrently(profiled_call, profiled_call, profiled_call)
+    profile_id = active.stop()
+
+    stats = pstats.Stats(get_profile_path(profile_id)).stats
+    calls = sum(primitive_calls for (_, _, function), (primitive_calls, *_) in stats.items() if function == "profiled_call")
+    assert calls == 3
+
+
+def test_profiled_request_returns_its_profile(client, user_id, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin-token")
+
+    response = client.get("/api/bookmark/all", headers={"userId": user_id, "X-Profile": "test-admin-token"})
+
+    assert response.status_code == 200
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    response = client.get(f"/api/admin/profiles/{profile_id}?format=text", headers={"adminToken": "test-admin-token"})
+    assert response.status_code == 200
+    assert "function calls" in response.get_data(as_text=True)
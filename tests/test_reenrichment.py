@@ -0,0 +1,49 @@
+import src.utils.tagGeneration.generate_tags as generate_tags_module
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.utils.routes_util import fetch_bookmark_content
+from tests.conftest import add_bookmark, get_document
+
+
+def start_job(client, admin_headers, user_id):
+    response = client.post("/api/admin/jobs/reenrichment", json={"filter": {"userId": user_id}, "refetch": False},
+                           headers=admin_headers)
+    assert response.status_code == 201
+    return response.json["data"]
+
+
+def test_job_regenerates_the_tags_of_the_matching_bookmarks(client, user_id, admin_headers, monkeypatch):
+    monkeypatch.setattr(generate_tags_module, "generate_tags", lambda count, url, title, content, user_tags: ["python"])
+    add_bookmark(user_id, f"{user_id}-b1")
+    add_bookmark(user_id, f"{user_id}-b2")
+    add_bookmark(user_id, f"{user_id}-deleted", isDeleted=True)
+    job = start_job(client, admin_headers, user_id)
+    assert job["total"] == 2
+
+    response = client.post("/api/admin/jobs/reenrichment/run", headers=admin_headers)
+    assert response.status_code == 200
+
+    response = client.get(f"/api/admin/jobs/reenrichment/{job['jobId']}", headers=admin_headers)
+    assert response.status_code == 200
+    progress = response.json["data"]
+    assert progress["status"] == "completed"
+    assert progress["processed"] == 2
+    assert progress["outcomes"] == {"updated": 2}
+    bookmark = get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")
+    assert fetch_bookmark_content(f"{user_id}-b1", bookmark)["generatedTags"] == ["python"]
+
+
+def test_cancelled_job_is_not_run(client, user_id, admin_headers):
+    job = start_job(client, admin_headers, user_id)
+
+    response = client.post(f"/api/admin/jobs/reenrichment/{job['jobId']}/cancel", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json["data"]["status"] == "cancelled"
+
+    assert client.post(f"/api/admin/jobs/reenrichment/{job['jobId']}/cancel", headers=admin_headers).status_code == 409
+    assert client.get("/api/admin/jobs/reenrichment/missing-job", headers=admin_headers).status_code == 404
+
+
+def test_job_with_an_unknown_filter_is_rejected(client, admin_headers):
+    response = client.post("/api/admin/jobs/reenrichment", json={"filter": {"title": "x"}}, headers=admin_headers)
+
+    assert response.status_code == 400
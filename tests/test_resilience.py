@@ -0,0 +1,37 @@
+import uuid
+
+import pytest
+
+from src.utils.resilience import outbound_call, deadline_scope, CircuitOpenError, DeadlineExceeded, \
+    CIRCUIT_FAILURE_THRESHOLD
+
+
+def fail_call(url):
+    with pytest.raises(ConnectionError):
+        with outbound_call(url, 1):
+            raise ConnectionError("refused")
+
+
+def test_circuit_opens_after_repeated_failures_of_a_host():
+    url = f"https://{uuid.uuid4()}.example.com/page"
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        fail_call(url)
+
+    with pytest.raises(CircuitOpenError):
+        with outbound_call(url, 1):
+            pass
+    # Other hosts are not affected
+    with outbound_call(f"https://{uuid.uuid4()}.example.com/page", 1):
+        pass
+
+
+def test_call_timeout_is_bounded_by_the_enclosing_deadline():
+    url = f"https://{uuid.uuid4()}.example.com/page"
+    with deadline_scope(0.5):
+        with outbound_call(url, 10) as deadline:
+            assert deadline.remaining() <= 0.5
+
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            with outbound_call(url, 10):
+                pass
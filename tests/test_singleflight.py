@@ -0,0 +1,47 @@
+import threading
+import time
+import uuid
+
+from src.utils.metrics import SINGLEFLIGHT_SHARED
+from src.utils.singleflight import SingleFlight
+
+
+def wait_for_shared_calls(name, count):
+    for _ in range(500):
+        if SINGLEFLIGHT_SHARED._values.get((name,), 0) >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{count} calls of {name} never waited for the in-flight one")
+
+
+def test_identical_calls_in_flight_share_one_result():
+    flight = SingleFlight(f"test-{uuid.uuid4()}")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(True)
+        release.wait(5)
+        return {"value": len(calls)}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(3)]
+    threads[0].start()
+    for thread in threads[1:]:
+        thread.start()
+    wait_for_shared_calls(flight.name, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [True]
+    assert results == [{"value": 1}] * 3
+    # Waiting callers get their own copy
+    assert len({id(result) for result in results}) == 3
+
+
+def test_calls_after_the_in_flight_one_run_again():
+    flight = SingleFlight(f"test-{uuid.uuid4()}")
+
+    assert [flight.do("key", lambda: len(str(uuid.uuid4()))) for _ in range(2)] == [36, 36]
+    assert SINGLEFLIGHT_SHARED._values.get((flight.name,), 0) == 0
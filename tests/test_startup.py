@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.startup_benchmark import LAZY_MODULES
+
+CHILD_SCRIPT = f"""
+import sys
+import index
+import src.utils.init as init
+print([name for name in {LAZY_MODULES!r} if name in sys.modules], init._db_client is None)
+"""
+
+
+def test_import_leaves_the_storage_client_and_heavy_modules_for_first_use():
+    # A fresh interpreter, the tests have already loaded them in this one
+    output = subprocess.run([sys.executable, "-c", CHILD_SCRIPT], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, STORAGE_BACKEND="memory")).stdout
+
+    assert output.strip() == "[] True"
@@ -0,0 +1,51 @@
+from src.models.directory_model import DIRECTORY_COLLECTION
+from src.utils.init import db
+from tests.conftest import add_bookmark, now
+
+
+def sync(client, user_id, since=None):
+    response = client.get("/api/sync" + (f"?since={since}" if since is not None else ""), headers={"userId": user_id})
+    assert response.status_code == 200
+    return response.json["data"]
+
+
+def test_delta_sync_returns_the_changes_since_the_token(client, user_id):
+    add_bookmark(user_id, f"{user_id}-old", updatedAt=now() - 100)
+    add_bookmark(user_id, f"{user_id}-new")
+    add_bookmark(user_id, f"{user_id}-deleted", isDeleted=True)
+
+    assert {bookmark["bookmarkId"] for bookmark in sync(client, user_id)["bookmarks"]} == \
+        {f"{user_id}-old", f"{user_id}-new", f"{user_id}-deleted"}
+
+    data = sync(client, user_id, now() - 50)
+    assert {bookmark["bookmarkId"] for bookmark in data["bookmarks"]} == {f"{user_id}-new", f"{user_id}-deleted"}
+    assert not data["resetRequired"]
+    assert int(data["token"]) <= now()
+
+
+def test_expired_token_gets_a_full_sync(client, user_id):
+    add_bookmark(user_id, f"{user_id}-old", updatedAt=100)
+
+    data = sync(client, user_id, 100)
+
+    assert data["resetRequired"]
+    assert [bookmark["bookmarkId"] for bookmark in data["bookmarks"]] == [f"{user_id}-old"]
+
+
+def test_invalid_token_is_rejected(client, user_id):
+    response = client.get("/api/sync?since=yesterday", headers={"userId": user_id})
+
+    assert response.status_code == 400
+
+
+def test_backfill_stamps_the_documents_without_updated_at(client, user_id, admin_headers):
+    directory_id = f"{user_id}-legacy"
+    db.collection(DIRECTORY_COLLECTION).document(directory_id).set({"directoryId": directory_id, "userId": user_id,
+                                                                    "name": "Legacy", "updatedAt": ""})
+    assert sync(client, user_id, now() - 50)["directories"] == []
+
+    response = client.post(f"/api/admin/jobs/backfill-updated-at?collection={DIRECTORY_COLLECTION}",
+                           headers=admin_headers)
+
+    assert response.status_code == 200
+    assert [directory["directoryId"] for directory in sync(client, user_id, now() - 50)["directories"]] == [directory_id]
@@ -0,0 +1,27 @@
+from tests.conftest import add_bookmark, add_tag, tag_fields
+
+
+def filter_by_tags(client, user_id, query):
+    response = client.get(f"/api/bookmark/filter-by-tags?{query}", headers={"userId": user_id})
+    assert response.status_code == 200
+    return sorted(bookmark["bookmarkId"] for bookmark in response.json["data"]["bookmarks"])
+
+
+def test_filter_by_tags_combines_tags(client, user_id):
+    python = add_tag(user_id, f"{user_id}-python", "python")
+    flask = add_tag(user_id, f"{user_id}-flask", "flask")
+    add_bookmark(user_id, f"{user_id}-b1", **tag_fields([python, flask]))
+    add_bookmark(user_id, f"{user_id}-b2", **tag_fields([python]))
+    add_bookmark(user_id, f"{user_id}-b3", **tag_fields([flask]))
+    add_bookmark(user_id, f"{user_id}-b4", isDeleted=True, **tag_fields([python]))
+    tags = f"tags={python['tagId']},{flask['tagId']}"
+
+    assert filter_by_tags(client, user_id, f"match_type=AND&{tags}") == [f"{user_id}-b1"]
+    assert filter_by_tags(client, user_id, f"match_type=OR&{tags}") == [f"{user_id}-b1", f"{user_id}-b2", f"{user_id}-b3"]
+    assert filter_by_tags(client, user_id, f"tags={python['tagId']}&exclude={flask['tagId']}") == [f"{user_id}-b2"]
+
+
+def test_filter_by_tags_rejects_an_unknown_match_type(client, user_id):
+    response = client.get("/api/bookmark/filter-by-tags?match_type=XOR&tags=t1", headers={"userId": user_id})
+
+    assert response.status_code == 400
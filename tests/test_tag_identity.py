@@ -0,0 +1,38 @@
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.utils.routes_util import get_tag_id
+from src.jobs.tag_identity import migrate_user_tags
+from tests.conftest import add_bookmark, add_tag, get_document, now, tag_fields
+
+
+def test_tag_id_ignores_case_and_spacing(user_id):
+    assert get_tag_id(user_id, "Machine  Learning") == get_tag_id(user_id, " machine learning ")
+    assert get_tag_id(user_id, "ML") != get_tag_id(user_id, "AI")
+    assert get_tag_id(user_id, "ML") != get_tag_id(f"{user_id}-other", "ML")
+
+
+def test_migration_merges_legacy_tags_of_the_same_name(user_id):
+    oldest = add_tag(user_id, f"{user_id}-legacy-1", "ML", created_at=1)
+    duplicate = add_tag(user_id, f"{user_id}-legacy-2", "ml ", created_at=2)
+    add_bookmark(user_id, f"{user_id}-b1", **tag_fields([oldest, duplicate]))
+
+    assert migrate_user_tags(user_id, now()) == (2, 1)
+
+    tag_id = get_tag_id(user_id, "ML")
+    assert get_document(TAG_COLLECTION, tag_id)["tagName"] == "ML"
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["tags"] == [tag_id]
+    assert all(get_document(TAG_COLLECTION, tag["tagId"])["isDeleted"] for tag in (oldest, duplicate))
+    # Run again, nothing left to move
+    assert migrate_user_tags(user_id, now()) == (0, 0)
+
+
+def test_create_returns_the_tag_of_the_same_normalized_name(client, user_id):
+    response = client.post("/api/tag/create", json={"tagName": "Machine Learning"}, headers={"userId": user_id})
+    assert response.status_code == 201
+    tag = response.json["data"]["tag"]
+    assert tag["tagId"] == get_tag_id(user_id, "Machine Learning")
+
+    response = client.post("/api/tag/create", json={"tagName": " machine  learning"}, headers={"userId": user_id})
+
+    assert response.status_code == 200
+    assert response.json["data"]["tag"]["tagId"] == tag["tagId"]
@@ -0,0 +1,50 @@
+import threading
+
+import src.jobs.tag_identity as tag_identity
+import src.services.routes.tag_routes as tag_routes
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.tag_model import TAG_COLLECTION
+from src.utils.routes_util import get_tag_id
+from tests.conftest import add_bookmark, add_tag, get_document, tag_fields
+
+
+def test_merge_moves_bookmarks_and_deletes_source_tags(client, user_id):
+    source = add_tag(user_id, get_tag_id(user_id, "py"), "py")
+    target = add_tag(user_id, get_tag_id(user_id, "python"), "python")
+    add_bookmark(user_id, f"{user_id}-b1", **tag_fields([source]))
+    add_bookmark(user_id, f"{user_id}-b2", **tag_fields([source, target]))
+
+    response = client.post("/api/tag/merge", json={"sourceTagIds": [source["tagId"]], "targetTagId": target["tagId"]},
+                           headers={"userId": user_id})
+
+    assert response.status_code == 200
+    for bookmark_id in (f"{user_id}-b1", f"{user_id}-b2"):
+        bookmark = get_document(BOOKMARK_COLLECTION, bookmark_id)
+        assert bookmark["tags"] == [target["tagId"]]
+        assert bookmark["tagNames"] == ["python"]
+    assert get_document(TAG_COLLECTION, source["tagId"])["isDeleted"]
+
+
+def test_merge_larger_than_the_limit_continues_in_the_background(client, user_id, monkeypatch):
+    source = add_tag(user_id, get_tag_id(user_id, "py"), "py")
+    target = add_tag(user_id, get_tag_id(user_id, "python"), "python")
+    for number in range(3):
+        add_bookmark(user_id, f"{user_id}-b{number}", **tag_fields([source]))
+    merged = threading.Event()
+
+    def merge_tags_in_background(*args):
+        tag_identity.merge_tags_in_background(*args)
+        merged.set()
+
+    monkeypatch.setattr(tag_routes, "MERGE_SYNC_BOOKMARKS", 1)
+    monkeypatch.setattr(tag_routes, "merge_tags_in_background", merge_tags_in_background)
+
+    response = client.post("/api/tag/merge", json={"sourceTagIds": [source["tagId"]], "targetTagId": target["tagId"]},
+                           headers={"userId": user_id})
+
+    assert response.status_code == 202
+    assert response.json["data"]["inBackground"]
+    # The background merge finds every bookmark, not only the probed ones
+    assert merged.wait(5)
+    for number in range(3):
+        assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b{number}")["tags"] == [target["tagId"]]
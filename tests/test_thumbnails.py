@@ -0,0 +1,36 @@
+import io
+
+import pytest
+from PIL import Image
+
+import src.utils.thumbnails as thumbnails
+from src.utils.thumbnails import LocalThumbnailStore, create_thumbnails
+
+
+@pytest.fixture
+def thumbnail_store(tmp_path, monkeypatch):
+    """A local thumbnail store, with downloads answering a 1000x500 PNG."""
+    image = io.BytesIO()
+    Image.new("RGB", (1000, 500), "blue").save(image, "PNG")
+    monkeypatch.setattr(thumbnails, "_store", LocalThumbnailStore(str(tmp_path)))
+    monkeypatch.setattr(thumbnails, "download_image", lambda image_url: image.getvalue())
+    return thumbnails._store
+
+
+def test_thumbnails_are_served_by_image_hash(client, thumbnail_store):
+    image_hash = create_thumbnails("https://example.com/image.png")
+
+    response = client.get(f"/api/thumbnail/{image_hash}/small")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert Image.open(io.BytesIO(response.data)).size == (160, 80)
+    assert client.get(f"/api/thumbnail/{image_hash}/small", headers={"If-None-Match": response.headers["ETag"]})\
+        .status_code == 304
+
+
+def test_unknown_thumbnails_are_rejected(client, thumbnail_store):
+    assert client.get(f"/api/thumbnail/{'0' * 64}/small").status_code == 404
+    assert client.get(f"/api/thumbnail/{'0' * 64}/huge").status_code == 400
+    assert client.get("/api/thumbnail/not-a-hash/small").status_code == 400
@@ -0,0 +1,70 @@
+from src.models.bookmark_model import BOOKMARK_COLLECTION
+from src.models.directory_model import DIRECTORY_COLLECTION, DEFAULT_DIRECTORY_NAME_AND_ID
+from src.jobs.trash_purge import purge_expired_tombstones, TOMBSTONE_RETENTION_SECONDS
+from tests.conftest import add_bookmark, get_document, now
+
+
+def create_directory(client, user_id, name):
+    response = client.post("/api/directory/create", json={"name": name}, headers={"userId": user_id})
+    assert response.status_code == 201
+    return response.json["data"]["directory"]
+
+
+def test_restore_directory_brings_back_its_bookmarks(client, user_id):
+    directory = create_directory(client, user_id, "Reading")
+    bookmark_id = f"{user_id}-b1"
+    add_bookmark(user_id, bookmark_id, directoryId=directory["directoryId"], directoryName="Reading",
+                 directoryPath=[directory["directoryId"]])
+
+    response = client.delete(f"/api/directory/delete/{directory['directoryId']}", json={"moveBookmarks": False},
+                             headers={"userId": user_id})
+    assert response.status_code == 200
+    assert get_document(BOOKMARK_COLLECTION, bookmark_id)["isDeleted"]
+
+    response = client.post("/api/trash/restore", json={"directoryIds": [directory["directoryId"]]},
+                           headers={"userId": user_id})
+
+    assert response.status_code == 200
+    assert response.json["data"]["bookmarkIds"] == [bookmark_id]
+    bookmark = get_document(BOOKMARK_COLLECTION, bookmark_id)
+    assert not bookmark["isDeleted"]
+    assert bookmark["directoryId"] == directory["directoryId"]
+    assert not get_document(DIRECTORY_COLLECTION, directory["directoryId"])["isDeleted"]
+
+
+def test_restore_reports_what_is_not_in_the_trash(client, user_id):
+    add_bookmark(user_id, f"{user_id}-live")
+
+    response = client.post("/api/trash/restore", json={"bookmarkIds": [f"{user_id}-live", f"{user_id}-missing"]},
+                           headers={"userId": user_id})
+
+    assert response.status_code == 200
+    assert response.json["data"]["bookmarkIds"] == []
+    assert set(response.json["data"]["errors"]) == {f"{user_id}-live", f"{user_id}-missing"}
+
+
+def test_purge_deletes_expired_tombstones_only(user_id):
+    expired_at = now() - TOMBSTONE_RETENTION_SECONDS - 60
+    add_bookmark(user_id, f"{user_id}-expired", isDeleted=True, deletedAt=expired_at, updatedAt=expired_at)
+    add_bookmark(user_id, f"{user_id}-recent", isDeleted=True, deletedAt=now())
+    add_bookmark(user_id, f"{user_id}-live", updatedAt=expired_at)
+
+    purged = purge_expired_tombstones()
+
+    assert purged[BOOKMARK_COLLECTION] >= 1
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-expired") is None
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-recent") is not None
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-live") is not None
+
+
+def test_delete_directory_moves_only_the_bookmarks_of_the_user(client, user_id):
+    directory = create_directory(client, user_id, "Reading")
+    add_bookmark(user_id, f"{user_id}-b1", directoryId=directory["directoryId"], directoryName="Reading")
+    add_bookmark(f"{user_id}-other", f"{user_id}-other-b1", directoryId=directory["directoryId"])
+
+    response = client.delete(f"/api/directory/delete/{directory['directoryId']}", json={"moveBookmarks": True},
+                             headers={"userId": user_id})
+
+    assert response.status_code == 200
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-b1")["directoryId"] == DEFAULT_DIRECTORY_NAME_AND_ID
+    assert get_document(BOOKMARK_COLLECTION, f"{user_id}-other-b1")["directoryId"] == directory["directoryId"]